@@ -0,0 +1,256 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, fields, replace
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+from metrics import route_template
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Admission limits for one route, optionally only when a query
+    parameter is present (e.g. `search` on the product listing).
+
+    Rates are tokens per second and 0 disables a limit. A request waits at
+    most `queue_budget` seconds for one of `concurrency` slots, behind at
+    most `queue_size` others; otherwise it is shed with 503.
+    """
+
+    name: str
+    method: str
+    route: str
+    query_param: Optional[str] = None
+    concurrency: int = 0
+    queue_size: int = 0
+    queue_budget: float = 0.5
+    user_rate: float = 0.0
+    user_burst: float = 0.0
+    ip_rate: float = 0.0
+    ip_burst: float = 0.0
+
+
+# Browse and search are bounded so they cannot take the MongoDB connections
+# that carts and checkout need; cart routes are not limited at all.
+DEFAULT_RULES = (
+    Rule("search", "GET", "/api/products", query_param="search", concurrency=16, queue_size=64,
+         queue_budget=0.25, user_rate=2, user_burst=10, ip_rate=10, ip_burst=40),
+    Rule("products", "GET", "/api/products", concurrency=64, queue_size=256,
+         queue_budget=0.5, user_rate=20, user_burst=60, ip_rate=50, ip_burst=200),
+    Rule("facets", "GET", "/api/products/facets", concurrency=16, queue_size=64,
+         queue_budget=0.25, user_rate=5, user_burst=20, ip_rate=20, ip_burst=80),
+    Rule("create_review", "POST", "/api/reviews", concurrency=8, queue_size=32,
+         queue_budget=1.0, user_rate=0.2, user_burst=3, ip_rate=1, ip_burst=10),
+    # userId is client-supplied and rotatable, so checkout is also bounded per address
+    Rule("create_order", "POST", "/api/orders", user_rate=1, user_burst=5, ip_rate=1, ip_burst=10),
+    Rule("import", "POST", "/api/products/import", concurrency=1),
+)
+
+
+def load_rules(environ: Mapping[str, str] = os.environ) -> List[Rule]:
+    """DEFAULT_RULES with overrides from ADMISSION_RULES.
+
+    ADMISSION_RULES is a JSON object of rule name -> fields, e.g.
+    {"search": {"concurrency": 8}}; unknown names define new rules and
+    then need method and route.
+    """
+    overrides = json.loads(environ.get('ADMISSION_RULES', '{}'))
+    known = {field.name for field in fields(Rule)}
+    rules = []
+    for rule in DEFAULT_RULES:
+        changes = overrides.pop(rule.name, {})
+        unknown = set(changes) - known
+        if unknown:
+            raise ValueError(f"ADMISSION_RULES[{rule.name!r}] has unknown fields: {', '.join(sorted(unknown))}")
+        rules.append(replace(rule, **changes))
+    for name, spec in overrides.items():
+        rules.append(Rule(name=name, **spec))
+    return rules
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class RouteLimiter:
+    """Token buckets and a bounded FIFO of requests waiting for a slot."""
+
+    def __init__(self, rule: Rule, max_buckets: int = 100000):
+        self.rule = rule
+        self.max_buckets = max_buckets
+        # Least recently used first; an evicted bucket was idle, hence full
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    def _take(self, kind: str, key: str, rate: float, burst: float, now: float) -> float:
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = self._buckets[(kind, key)] = TokenBucket(burst, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end((kind, key))
+        return bucket.take(rate, burst, now)
+
+    def check_rate(self, user: Optional[str], ip: Optional[str]) -> float:
+        """0 if within the user's and the IP's rates, else seconds to wait."""
+        rule = self.rule
+        now = time.monotonic()
+        wait = 0.0
+        if rule.user_rate and user:
+            wait = self._take("user", user, rule.user_rate, rule.user_burst, now)
+        if not wait and rule.ip_rate and ip:
+            wait = self._take("ip", ip, rule.ip_rate, rule.ip_burst, now)
+        if wait:
+            self.rate_limited += 1
+        return wait
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False if the request should be shed instead."""
+        rule = self.rule
+        if not rule.concurrency or self.active < rule.concurrency:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= rule.queue_size:
+            self.shed += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            # release() hands its slot over by resolving the future
+            await asyncio.wait_for(waiter, rule.queue_budget)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        self.admitted += 1
+        return True
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "concurrency": self.rule.concurrency,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rateLimited": self.rate_limited,
+            "shed": self.shed,
+        }
+
+
+def _query_params(scope) -> Dict[str, List[str]]:
+    return parse_qs(scope.get("query_string", b"").decode("latin-1"))
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying each limiter's rule before a request is handled.
+
+    Over a rate: 429 with Retry-After until the next token. No slot within
+    the queue budget: 503 with Retry-After. The user is the `userId` query
+    parameter the API already uses; the IP is the peer address, or the
+    first X-Forwarded-For hop when `trust_forwarded` is set. Behind a proxy
+    the peer is the proxy itself, so without `trust_forwarded` all clients
+    share its IP buckets.
+    """
+
+    def __init__(self, app, limiters: Sequence[RouteLimiter], trust_forwarded: bool = False):
+        self.app = app
+        self.trust_forwarded = trust_forwarded
+        self.limiters = list(limiters)
+        self._by_route: Dict[Tuple[str, str], List[RouteLimiter]] = {}
+        for limiter in self.limiters:
+            self._by_route.setdefault((limiter.rule.method, limiter.rule.route), []).append(limiter)
+        # Rules with a query condition take precedence over the plain one
+        for candidates in self._by_route.values():
+            candidates.sort(key=lambda limiter: limiter.rule.query_param is None)
+
+    def _client_ip(self, scope) -> Optional[str]:
+        if self.trust_forwarded:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        candidates = self._by_route.get((scope["method"], route_template(scope)))
+        if not candidates:
+            await self.app(scope, receive, send)
+            return
+
+        params = _query_params(scope)
+        limiter = next(
+            (c for c in candidates if c.rule.query_param is None or params.get(c.rule.query_param)), None
+        )
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        user = (params.get("userId") or [None])[0]
+        wait = limiter.check_rate(user, self._client_ip(scope))
+        if wait:
+            response = JSONResponse(
+                {"detail": "Too many requests"}, status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            await response(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "Server busy, retry shortly"}, status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(limiter.rule.queue_budget)))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Concurrent checkout load test: proves POST /api/orders never oversells.
+
+Seeds one product with a small stock, fires many simultaneous single-unit
+checkouts from distinct users at a running server, then checks that exactly
+`stock` orders succeeded, the rest were rejected with 409, and the product's
+stock ended at zero. Needs MongoDB running as a replica set (transactions).
+
+    uvicorn server:app --port 8001 &
+    python benchmarks/checkout_oversell.py --base-url http://localhost:8001/api \\
+        --stock 50 --buyers 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+SHIPPING = {
+    "fullName": "Load Test",
+    "address": "1 Test Street",
+    "city": "Testville",
+    "state": "TS",
+    "zipCode": "00000",
+    "phone": "000",
+}
+
+
+async def checkout(http: httpx.AsyncClient, product_id: str, buyer: int) -> int:
+    response = await http.post(
+        "/orders",
+        params={"userId": f"loadtest-user-{buyer}"},
+        json={"items": [{"productId": product_id, "quantity": 1}], "shippingAddress": SHIPPING},
+    )
+    return response.status_code
+
+
+async def run(args) -> int:
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db_name]
+    product_id = f"loadtest-{uuid.uuid4()}"
+    await db.products.insert_one({
+        "id": product_id,
+        "name": "Load test product",
+        "description": "Seeded by checkout_oversell.py",
+        "price": 9.99,
+        "category": "LoadTest",
+        "image": "",
+        "rating": 0.0,
+        "reviewCount": 0,
+        "stock": args.stock,
+    })
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as http:
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(checkout(http, product_id, i) for i in range(args.buyers)))
+            elapsed = time.perf_counter() - started
+
+        counts = Counter(statuses)
+        product = await db.products.find_one({"id": product_id})
+        orders = await db.orders.count_documents({"items.productId": product_id})
+
+        print(f"{args.buyers} checkouts in {elapsed:.2f}s ({args.buyers / elapsed:.0f} req/s)")
+        print(f"  status codes : {dict(counts)}")
+        print(f"  orders       : {orders} (stock was {args.stock})")
+        print(f"  final stock  : {product['stock']}")
+
+        expected_ok = min(args.stock, args.buyers)
+        ok = (
+            counts[200] == expected_ok
+            and orders == expected_ok
+            and product["stock"] == args.stock - expected_ok
+            and counts[200] + counts[409] == args.buyers
+        )
+        print("PASS" if ok else "FAIL: stock was oversold or requests failed")
+        return 0 if ok else 1
+    finally:
+        await db.orders.delete_many({"items.productId": product_id})
+        await db.carts.delete_many({"userId": {"$regex": "^loadtest-user-"}})
+        await db.products.delete_one({"id": product_id})
+        client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent checkout oversell test")
+    parser.add_argument("--base-url", default="http://localhost:8001/api")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME", "test_database"))
+    parser.add_argument("--stock", type=int, default=50)
+    parser.add_argument("--buyers", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
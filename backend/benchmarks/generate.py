@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic data generator for load testing.
+
+Writes products, reviews, carts and orders straight into MongoDB in unordered
+batches, streaming so that 10M documents never sit in memory at once. The same
+seed always produces the same data. Product rating aggregates are consistent
+with the generated reviews.
+
+    python benchmarks/generate.py --products 100000 --reviews-per-product 20 \\
+        --users 50000 --orders-per-user 3 --seed 42 --drop
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+from indexes import ensure_indexes  # noqa: E402
+from ratings import STARS, recompute_rating_aggregates  # noqa: E402
+
+CATEGORIES = ["Electronics", "Fashion", "Home", "Kitchen", "Sports", "Accessories", "Books", "Toys", "Beauty", "Garden"]
+ADJECTIVES = ["premium", "wireless", "smart", "classic", "modern", "portable", "ergonomic", "compact", "deluxe", "eco"]
+NOUNS = [
+    "laptop", "earbuds", "watch", "shirt", "shoes", "jacket", "sofa", "lamp", "blender", "mat",
+    "dumbbell", "backpack", "sunglasses", "kettle", "speaker", "camera", "chair", "desk", "bottle", "tent",
+]
+# Search terms the load driver uses; all of them occur in generated products
+SEARCH_TERMS = NOUNS + [f"{a} {n}" for a in ADJECTIVES[:3] for n in NOUNS[:5]]
+
+EPOCH = datetime(2024, 1, 1)
+
+
+def user_id(n: int) -> str:
+    return f"user-{n}"
+
+
+def make_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def product_id(seed: int, i: int) -> str:
+    # Derived from the index so no id list has to be kept in memory
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{seed}:product:{i}"))
+
+
+def generate_products(seed: int, count: int) -> Iterator[Dict]:
+    rng = random.Random(f"{seed}:products")
+    for i in range(count):
+        pid = product_id(seed, i)
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        yield {
+            "id": pid,
+            "name": f"{adjective.title()} {noun.title()} {i}",
+            "description": f"A {adjective} {noun} built for everyday use. Model {rng.randrange(1000, 9999)}.",
+            "price": round(rng.uniform(5, 2000), 2),
+            "category": rng.choice(CATEGORIES),
+            "image": f"https://images.example.com/{pid}.jpeg",
+            "rating": 0.0,
+            "reviewCount": 0,
+            "ratingSum": 0,
+            "ratingHistogram": {star: 0 for star in STARS},
+            "stock": rng.randrange(0, 500),
+            "createdAt": EPOCH + timedelta(seconds=i * 37),
+        }
+
+
+def generate_reviews(seed: int, products: int, per_product: int, users: int) -> Iterator[Dict]:
+    rng = random.Random(f"{seed}:reviews")
+    for i in range(products):
+        for j in range(rng.randrange(0, 2 * per_product + 1) if per_product else 0):
+            yield {
+                "id": make_uuid(rng),
+                "productId": product_id(seed, i),
+                "userId": user_id(rng.randrange(users)),
+                "userName": "Load Tester",
+                "rating": rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 4])[0],
+                "comment": "Generated review",
+                "createdAt": EPOCH + timedelta(minutes=j * 13 + rng.randrange(60)),
+            }
+
+
+def generate_carts(seed: int, products: int, users: int) -> Iterator[Dict]:
+    rng = random.Random(f"{seed}:carts")
+    for n in range(users):
+        picked = rng.sample(range(products), k=min(products, rng.randrange(0, 6)))
+        yield {
+            "id": make_uuid(rng),
+            "userId": user_id(n),
+            "items": [{"productId": product_id(seed, i), "quantity": rng.randrange(1, 4)} for i in picked],
+            "updatedAt": EPOCH,
+        }
+
+
+def generate_orders(seed: int, products: Dict[str, Dict], users: int, per_user: int) -> Iterator[Dict]:
+    rng = random.Random(f"{seed}:orders")
+    ids = list(products)
+    for n in range(users):
+        for k in range(rng.randrange(0, 2 * per_user + 1) if per_user else 0):
+            lines = []
+            for pid in rng.sample(ids, k=min(len(ids), rng.randrange(1, 5))):
+                product = products[pid]
+                lines.append({
+                    "productId": pid,
+                    "name": product["name"],
+                    "price": product["price"],
+                    "quantity": rng.randrange(1, 3),
+                    "image": product["image"],
+                })
+            yield {
+                "id": make_uuid(rng),
+                "userId": user_id(n),
+                "items": lines,
+                "total": round(sum(line["price"] * line["quantity"] for line in lines), 2),
+                "status": rng.choice(["confirmed", "shipped", "delivered"]),
+                "shippingAddress": {"fullName": f"User {n}", "address": "1 Main St", "city": "Springfield",
+                                    "state": "SP", "zipCode": "00000", "phone": "000"},
+                "createdAt": EPOCH + timedelta(hours=k * 11 + n % 97),
+            }
+
+
+async def insert_stream(collection, docs: Iterator[Dict], batch_size: int) -> int:
+    total = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            total += len(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        total += len(batch)
+    return total
+
+
+async def run(args) -> int:
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db_name]
+    try:
+        if args.drop:
+            for name in ("products", "reviews", "carts", "orders", "meta"):
+                await db[name].drop()
+        await ensure_indexes(db)
+
+        started = time.perf_counter()
+        counts = {"products": await insert_stream(
+            db.products, generate_products(args.seed, args.products), args.batch_size
+        )}
+        counts["reviews"] = await insert_stream(
+            db.reviews, generate_reviews(args.seed, args.products, args.reviews_per_product, args.users), args.batch_size
+        )
+        # Same aggregate create_review maintains, computed once for all reviews
+        await recompute_rating_aggregates(db)
+        counts["carts"] = await insert_stream(db.carts, generate_carts(args.seed, args.products, args.users), args.batch_size)
+
+        # Orders embed name/price/image, so they need a (sampled) product lookup
+        sample = {}
+        order_ids = [product_id(args.seed, i) for i in range(min(args.products, args.order_catalog))]
+        async for product in db.products.find(
+            {"id": {"$in": order_ids}}, {"_id": 0, "id": 1, "name": 1, "price": 1, "image": 1}
+        ):
+            sample[product["id"]] = product
+        counts["orders"] = await insert_stream(
+            db.orders, generate_orders(args.seed, sample, args.users, args.orders_per_user), args.batch_size
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        print(f"Generated {total} documents in {elapsed:.1f}s ({total / elapsed:.0f} docs/s): {counts}")
+        return 0
+    finally:
+        client.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Seeded synthetic data generator")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME", "test_database"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--reviews-per-product", type=int, default=10, help="mean; actual count is uniform in [0, 2x]")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--orders-per-user", type=int, default=2, help="mean; actual count is uniform in [0, 2x]")
+    parser.add_argument("--order-catalog", type=int, default=5000, help="products that orders are drawn from")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--drop", action="store_true", help="drop existing collections first")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Async load driver for the API with realistic endpoint mixes.
+
+Virtual users pick a scenario (browse, search, cart churn, checkout) by
+weight and run it until the duration is up. Latency is recorded per route
+template; the report gives p50/p95/p99 and RPS per route and is saved as JSON
+so runs can be compared:
+
+    python benchmarks/generate.py --products 100000 --drop
+    uvicorn server:app --port 8001 --workers 4 &
+    python benchmarks/loadtest.py --base-url http://localhost:8001/api \\
+        --users 200 --duration 60 --mix browse=60,search=20,cart=15,checkout=5 \\
+        --output results/run.json --compare results/baseline.json
+
+Admission control (admission.py) rate-limits per client IP, and every
+virtual user shares the driver's address, so a full-speed run mostly
+measures 429s. Responses with 429 or 503 are counted as `rejected`, apart
+from errors and outside the latency percentiles. To measure raw capacity
+start the server with ADMISSION_CONTROL=0; to exercise the limits as
+many clients would, start it with TRUST_FORWARDED_FOR=1 and pass
+--client-ips so each virtual user sends its own X-Forwarded-For.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate import SEARCH_TERMS, user_id  # noqa: E402
+
+SORTS = ["createdAt", "price", "rating"]
+SHIPPING = {
+    "fullName": "Load Test",
+    "address": "1 Test Street",
+    "city": "Testville",
+    "state": "TS",
+    "zipCode": "00000",
+    "phone": "000",
+}
+
+
+# Turned away by admission control rather than failed
+REJECTED_STATUSES = {429, 503}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    def record(self, route: str, seconds: float, status: Optional[int]) -> None:
+        self.statuses[route][status if status is not None else "error"] += 1
+        if status in REJECTED_STATUSES:
+            # Fast refusals would otherwise pass for fast successes
+            self.rejected[route] += 1
+            return
+        self.latencies[route].append(seconds)
+        if status is None or status >= 500:
+            self.errors[route] += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Session:
+    """One virtual user: an HTTP client plus the state its scenarios share."""
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        recorder: Recorder,
+        catalog: Dict,
+        rng: random.Random,
+        user: str,
+        client_ip: Optional[str] = None,
+    ):
+        self.http = http
+        self.recorder = recorder
+        self.catalog = catalog
+        self.rng = rng
+        self.user = user
+        self.headers = {"X-Forwarded-For": client_ip} if client_ip else None
+
+    async def call(self, method: str, route: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(route, time.perf_counter() - started, None)
+            return None
+        self.recorder.record(route, time.perf_counter() - started, response.status_code)
+        return response
+
+    def product(self) -> str:
+        return self.rng.choice(self.catalog["products"])
+
+
+async def browse(s: Session) -> None:
+    params = {"sort": s.rng.choice(SORTS), "limit": 20}
+    if s.rng.random() < 0.5 and s.catalog["categories"]:
+        params["category"] = s.rng.choice(s.catalog["categories"])
+    response = await s.call("GET", "GET /products", "/products", params=params)
+    # Some users keep scrolling
+    for _ in range(s.rng.choice([0, 0, 1, 2])):
+        cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+        if not cursor:
+            break
+        response = await s.call("GET", "GET /products?cursor", "/products", params={**params, "cursor": cursor})
+    await s.call("GET", "GET /products/facets", "/products/facets", params={"category": params.get("category")} if "category" in params else None)
+    product_id = s.product()
+    await s.call("GET", "GET /products/{id}", f"/products/{product_id}")
+    await s.call("GET", "GET /reviews/{id}", f"/reviews/{product_id}")
+    await s.call("GET", "GET /reviews/{id}/summary", f"/reviews/{product_id}/summary")
+
+
+async def search(s: Session) -> None:
+    term = s.rng.choice(SEARCH_TERMS)
+    # Search-as-you-type: a couple of prefixes, then the full term
+    for end in sorted({max(2, len(term) // 2), len(term)}):
+        await s.call("GET", "GET /products?search", "/products", params={"search": term[:end], "sort": "relevance"})
+
+
+async def cart(s: Session) -> None:
+    params = {"userId": s.user}
+    product_id = s.product()
+    await s.call("POST", "POST /cart/add", "/cart/add", params=params, json={"productId": product_id, "quantity": 1})
+    await s.call("POST", "POST /cart/update", "/cart/update", params=params,
+                 json={"productId": product_id, "quantity": s.rng.randrange(0, 4)})
+    await s.call("GET", "GET /cart/view", "/cart/view", params=params)
+    if s.rng.random() < 0.3:
+        await s.call("DELETE", "DELETE /cart/remove/{id}", f"/cart/remove/{product_id}", params=params)
+
+
+async def checkout(s: Session) -> None:
+    params = {"userId": s.user}
+    items = [{"productId": s.product(), "quantity": 1} for _ in range(s.rng.randrange(1, 4))]
+    for item in items:
+        await s.call("POST", "POST /cart/add", "/cart/add", params=params, json=item)
+    await s.call("GET", "GET /cart/view", "/cart/view", params=params)
+    await s.call("POST", "POST /orders", "/orders", params=params, json={"items": items, "shippingAddress": SHIPPING})
+    await s.call("GET", "GET /orders", "/orders", params=params)
+
+
+SCENARIOS = {"browse": browse, "search": search, "cart": cart, "checkout": checkout}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def load_catalog(http: httpx.AsyncClient, pages: int) -> Dict:
+    categories = (await http.get("/categories")).json()["categories"]
+    products = []
+    params = {"limit": 100}
+    for _ in range(pages):
+        response = await http.get("/products", params=params)
+        products.extend(product["id"] for product in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+    if not products:
+        raise SystemExit("No products found; run benchmarks/generate.py or POST /api/init-data first")
+    return {"categories": categories, "products": products}
+
+
+async def run(args) -> Dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as http:
+        catalog = await load_catalog(http, args.catalog_pages)
+        names, weights = zip(*args.mix.items())
+        deadline = time.perf_counter() + args.duration
+
+        async def virtual_user(n: int) -> None:
+            rng = random.Random(f"{args.seed}:{n}")
+            client_ip = f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}" if n < args.client_ips else None
+            session = Session(http, recorder, catalog, rng, user_id(rng.randrange(args.user_pool)), client_ip)
+            while time.perf_counter() < deadline:
+                await SCENARIOS[rng.choices(names, weights)[0]](session)
+                if args.think_time:
+                    await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(n) for n in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    for route in sorted(recorder.statuses):
+        # Latencies of admitted requests only
+        samples = sorted(recorder.latencies[route])
+        count = len(samples) + recorder.rejected[route]
+        routes[route] = {
+            "count": count,
+            "rps": round(count / elapsed, 1),
+            "p50": round(percentile(samples, 50) * 1000, 2),
+            "p95": round(percentile(samples, 95) * 1000, 2),
+            "p99": round(percentile(samples, 99) * 1000, 2),
+            "max": round(samples[-1] * 1000, 2) if samples else 0.0,
+            "errors": recorder.errors[route],
+            "rejected": recorder.rejected[route],
+            "statuses": {str(k): v for k, v in recorder.statuses[route].items()},
+        }
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "meta": {
+            "startedAt": datetime.utcnow().isoformat(),
+            "baseUrl": args.base_url,
+            "users": args.users,
+            "duration": round(elapsed, 2),
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "total": {
+            "count": total,
+            "rps": round(total / elapsed, 1),
+            "errors": sum(recorder.errors.values()),
+            "rejected": sum(recorder.rejected.values()),
+        },
+        "routes": routes,
+    }
+
+
+def print_report(result: Dict) -> None:
+    print(f"{'route':32} {'count':>8} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7} {'rejected':>9}")
+    for route, r in result["routes"].items():
+        print(
+            f"{route:32} {r['count']:>8} {r['rps']:>8} {r['p50']:>8} {r['p95']:>8} {r['p99']:>8} "
+            f"{r['errors']:>7} {r.get('rejected', 0):>9}"
+        )
+    t = result["total"]
+    print(
+        f"{'TOTAL':32} {t['count']:>8} {t['rps']:>8} {'':>8} {'':>8} {'':>8} "
+        f"{t['errors']:>7} {t.get('rejected', 0):>9}  (latencies in ms, admitted requests only)"
+    )
+    if t.get("rejected"):
+        print(f"\n{t['rejected']} requests were refused with 429/503 by admission control; "
+              "see the module docstring for running without it", file=sys.stderr)
+
+
+def compare(result: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print per-route p95/p99 deltas; False if any regressed beyond `threshold`."""
+    ok = True
+    print(f"\n{'route':32} {'p95 base':>9} {'p95 now':>9} {'p99 base':>9} {'p99 now':>9}")
+    for route, now in result["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if not base:
+            continue
+        flags = []
+        for key in ("p95", "p99"):
+            if base[key] and now[key] > base[key] * (1 + threshold):
+                flags.append(key)
+        ok = ok and not flags
+        marker = f"  REGRESSED ({', '.join(flags)})" if flags else ""
+        print(f"{route:32} {base['p95']:>9} {now['p95']:>9} {base['p99']:>9} {now['p99']:>9}{marker}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="API load driver")
+    parser.add_argument("--base-url", default="http://localhost:8001/api")
+    parser.add_argument("--users", type=int, default=50, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("browse=60,search=20,cart=15,checkout=5"))
+    parser.add_argument("--user-pool", type=int, default=5000, help="distinct userIds (match generate.py --users)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between scenarios, seconds")
+    parser.add_argument("--catalog-pages", type=int, default=20, help="pages of 100 product ids to sample")
+    parser.add_argument("--client-ips", type=int, default=0,
+                        help="give this many virtual users their own X-Forwarded-For (server: TRUST_FORWARDED_FOR=1)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="write the JSON result here")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=0.2, help="allowed p95/p99 increase")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2))
+        print(f"\nSaved results to {args.output}")
+    if args.compare:
+        if not compare(result, json.loads(args.compare.read_text()), args.regression_threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size-bounded LRU cache with a per-entry TTL.
+
+    Not thread-safe; it is meant to be used from the single asyncio event loop
+    that serves requests.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class _Entry:
+    __slots__ = ("value", "version", "size", "loaded_at")
+
+    def __init__(self, value: Any, version: Any, size: int, loaded_at: float):
+        self.value = value
+        self.version = version
+        self.size = size
+        self.loaded_at = loaded_at
+
+
+# Rough per-entry bookkeeping cost on top of the value itself
+_ENTRY_OVERHEAD = 256
+
+
+class QueryCache:
+    """Query results keyed by normalized query, bounded by total size in bytes.
+
+    Each entry remembers the data version it was computed at. It is fresh
+    while that version is current and it is younger than `ttl`. A stale
+    entry is still served, while one background refresh runs, until it is
+    `ttl + stale_ttl` old (same version) or `stale_ttl` old (older
+    version); refreshes of one key start at most every
+    `min_refresh_interval` seconds. Concurrent misses on a key share one
+    load, so a herd on a cold key costs a single query.
+
+    `sizeof(value)` gives an entry's size. Like LRUCache, it is meant for a
+    single event loop.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float = 30.0,
+        stale_ttl: float = 5.0,
+        min_refresh_interval: float = 0.25,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Tuple[Hashable, Any], asyncio.Future] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.load_errors = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: Hashable, version: Any, load: Callable[[], Awaitable[Any]]) -> Tuple[Any, Any]:
+        """Return (value, version it was computed at), calling `load` on a miss."""
+        entry = self._data.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.loaded_at
+            current = entry.version == version
+            if current and age < self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry.value, entry.version
+            if age < (self.ttl if current else 0.0) + self.stale_ttl:
+                self._data.move_to_end(key)
+                self.stale_hits += 1
+                if age >= self.min_refresh_interval and (key, version) not in self._inflight:
+                    self.refreshes += 1
+                    self._load(key, version, load)
+                return entry.value, entry.version
+
+        self.misses += 1
+        flight = self._inflight.get((key, version))
+        if flight is None:
+            flight = self._load(key, version, load)
+        else:
+            self.coalesced += 1
+        # A caller that goes away does not cancel the load the others wait for
+        value = await asyncio.shield(flight)
+        return value, version
+
+    def _load(self, key: Hashable, version: Any, load: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        flight = asyncio.ensure_future(self._run(key, version, load))
+        flight.add_done_callback(self._retrieve)
+        self._inflight[(key, version)] = flight
+        return flight
+
+    async def _run(self, key: Hashable, version: Any, load: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        try:
+            value = await load()
+        except Exception:
+            self.load_errors += 1
+            raise
+        finally:
+            self._inflight.pop((key, version), None)
+        existing = self._data.get(key)
+        # A slower load of an older version must not replace a newer result
+        if existing is None or existing.loaded_at < started:
+            self._store(key, version, value)
+        return value
+
+    def _retrieve(self, flight: asyncio.Future) -> None:
+        # Background refreshes have no caller to see their error; on failure
+        # the stale entry simply stays until it ages out
+        if not flight.cancelled():
+            flight.exception()
+
+    def _store(self, key: Hashable, version: Any, value: Any) -> None:
+        size = self.sizeof(value) + _ENTRY_OVERHEAD
+        self.invalidate(key)
+        if size > self.max_bytes:
+            return
+        self._data[key] = _Entry(value, version, size, time.monotonic())
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.bytes -= evicted.size
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "staleHits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "loadErrors": self.load_errors,
+            "evictions": self.evictions,
+            "hitRatio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from facets import count_facets
+from pagination import SortKey, decode_cursor, sort_key
+from repositories import Page, ProductRepository, make_page
+
+
+logger = logging.getLogger(__name__)
+
+SORT_FIELDS = ("createdAt", "price", "rating")
+
+# Sorts after every product id, for inclusive upper bounds
+_MAX_ID = "\U0010ffff"
+
+
+class InMemoryCatalog(ProductRepository):
+    """Whole catalog held in process memory; listings need no I/O.
+
+    For the whole catalog and for each category there is one ascending array
+    of sort keys per sort field. A page in descending order is a bisect to
+    the cursor followed by a backwards walk; a price range is a bisect on
+    the price array. Writes are applied incrementally through refresh(ids).
+
+    Until load() has succeeded, and whenever the catalog is larger than
+    `max_products`, every call is delegated to `fallback`.
+    """
+
+    def __init__(
+        self,
+        fallback: ProductRepository,
+        collection,
+        list_fields: Iterable[str],
+        max_products: int = 200000,
+    ):
+        self.fallback = fallback
+        self.collection = collection
+        self.list_fields = tuple(list_fields)
+        self.max_products = max_products
+        self.loaded = False
+        self._products: Dict[str, Dict[str, Any]] = {}
+        # MongoDB _id -> product id; delete events carry only the _id
+        self._object_ids: Dict[Any, str] = {}
+        self._views: Dict[str, Dict[str, Any]] = {}
+        self._sorted: Dict[Optional[str], Dict[str, List[SortKey]]] = {}
+        self._reload: Optional[asyncio.Future] = None
+        self._next_reload: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    # Loading and incremental refresh
+
+    async def load(self) -> None:
+        count = await self.collection.estimated_document_count()
+        if count > self.max_products:
+            logger.warning(
+                "Catalog has %d products (limit %d); serving product reads from MongoDB", count, self.max_products
+            )
+            self.loaded = False
+            return
+        products = {}
+        object_ids = {}
+        async for doc in self.collection.find({}):
+            object_ids[doc.pop("_id")] = doc["id"]
+            products[doc["id"]] = doc
+        self._build(products)
+        self._object_ids = object_ids
+        self.loaded = True
+        logger.info("In-memory catalog loaded %d products", len(products))
+
+    def load_documents(self, products: Iterable[Dict[str, Any]]) -> None:
+        """Load from documents instead of MongoDB, e.g. fixtures in tests."""
+        self._build({product["id"]: product for product in products})
+        self.loaded = True
+
+    def _build(self, products: Dict[str, Dict[str, Any]]) -> None:
+        arrays: Dict[Optional[str], Dict[str, List[SortKey]]] = {}
+        for product in products.values():
+            for scope in (None, product.get("category")):
+                scoped = arrays.setdefault(scope, {field: [] for field in SORT_FIELDS})
+                for field in SORT_FIELDS:
+                    scoped[field].append(sort_key(product, field))
+        for scoped in arrays.values():
+            for keys in scoped.values():
+                keys.sort()
+        arrays.setdefault(None, {field: [] for field in SORT_FIELDS})
+        # Swapped in together, with no await in between
+        self._products = products
+        self._views = {pid: self._view(product) for pid, product in products.items()}
+        self._sorted = arrays
+
+    def _view(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        # Shares the values with the full document
+        return {field: product[field] for field in self.list_fields if field in product}
+
+    async def refresh(self, product_ids: Optional[Sequence[str]] = None) -> None:
+        if product_ids is None:
+            # Waited for, so callers bump the catalog version only once the
+            # snapshot matches it
+            await asyncio.shield(self.reload())
+            return
+        if not self.loaded or not product_ids:
+            return
+        ids = list(product_ids)
+        found = {}
+        async for doc in self.collection.find({"id": {"$in": ids}}):
+            self._object_ids[doc.pop("_id")] = doc["id"]
+            found[doc["id"]] = doc
+        for product_id in ids:
+            if product_id in found:
+                self.upsert(found[product_id])
+            else:
+                self.remove(product_id)
+
+    def apply(self, documents, deleted=()):
+        if not self.loaded:
+            return self.fallback.apply(documents, deleted)
+        for doc in documents:
+            product = dict(doc)
+            object_id = product.pop("_id", None)
+            if object_id is not None:
+                self._object_ids[object_id] = product["id"]
+            self.upsert(product)
+        removed = []
+        for object_id in deleted:
+            product_id = self._object_ids.pop(object_id, None)
+            if product_id is not None:
+                self.remove(product_id)
+                removed.append(product_id)
+        return removed
+
+    def reload(self) -> "asyncio.Future[None]":
+        """Full reload, done when it has finished.
+
+        A reload already running may have read the collection before the
+        caller's write, so the caller gets the next one, which starts after
+        it; every call made in the meantime shares that next reload.
+        """
+        if self._next_reload is None:
+            self._next_reload = asyncio.ensure_future(self._reload_after(self._reload))
+        return self._next_reload
+
+    async def _reload_after(self, previous: Optional[asyncio.Future]) -> None:
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        self._reload, self._next_reload = self._next_reload, None
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("In-memory catalog reload failed; keeping the previous snapshot")
+
+    def upsert(self, product: Dict[str, Any]) -> None:
+        self.remove(product["id"])
+        self._products[product["id"]] = product
+        self._views[product["id"]] = self._view(product)
+        for scope in (None, product.get("category")):
+            scoped = self._sorted.setdefault(scope, {field: [] for field in SORT_FIELDS})
+            for field in SORT_FIELDS:
+                insort(scoped[field], sort_key(product, field))
+
+    def remove(self, product_id: str) -> None:
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        del self._views[product_id]
+        for scope in (None, product.get("category")):
+            scoped = self._sorted.get(scope)
+            if scoped is None:
+                continue
+            for field in SORT_FIELDS:
+                keys = scoped[field]
+                key = sort_key(product, field)
+                index = bisect_left(keys, key)
+                if index < len(keys) and keys[index] == key:
+                    del keys[index]
+            if scope is not None and not scoped[SORT_FIELDS[0]]:
+                del self._sorted[scope]
+
+    # Queries
+
+    def _in_price(self, product: Dict[str, Any], min_price: Optional[float], max_price: Optional[float]) -> bool:
+        price = product.get("price")
+        if min_price is not None and (price is None or price < min_price):
+            return False
+        if max_price is not None and (price is None or price > max_price):
+            return False
+        return True
+
+    def _price_range(self, keys: List[SortKey], min_price, max_price) -> Tuple[int, int]:
+        low = bisect_left(keys, (True, min_price, "")) if min_price is not None else bisect_left(keys, (True,))
+        high = bisect_right(keys, (True, max_price, _MAX_ID)) if max_price is not None else len(keys)
+        return low, high
+
+    def _rank(self, product_ids: Iterable[str], sort_field: str, after: Optional[SortKey], limit: int) -> List[Dict[str, Any]]:
+        keys = sorted((sort_key(self._products[pid], sort_field) for pid in product_ids), reverse=True)
+        if after is not None:
+            keys = [key for key in keys if key < after]
+        return [self._views[key[2]] for key in keys[:limit]]
+
+    def _select(self, category, min_price, max_price, ids, sort_field, after, limit) -> List[Dict[str, Any]]:
+        if ids is not None:
+            candidates = (
+                pid for pid in dict.fromkeys(ids)
+                if pid in self._products
+                and (not category or self._products[pid].get("category") == category)
+                and self._in_price(self._products[pid], min_price, max_price)
+            )
+            return self._rank(candidates, sort_field, after, limit)
+
+        scoped = self._sorted.get(category or None)
+        if scoped is None:
+            return []
+        priced = min_price is not None or max_price is not None
+        keys = scoped[sort_field]
+        if priced and sort_field != "price":
+            # A narrow price range is cheaper to rank than to filter while walking
+            low, high = self._price_range(scoped["price"], min_price, max_price)
+            if high - low <= max(limit * 8, len(keys) // 8):
+                return self._rank((key[2] for key in scoped["price"][low:high]), sort_field, after, limit)
+
+        low, high = 0, len(keys)
+        if sort_field == "price" and priced:
+            low, high = self._price_range(keys, min_price, max_price)
+        if after is not None:
+            high = min(high, bisect_left(keys, after))
+        out = []
+        for index in range(high - 1, low - 1, -1):
+            product = self._products[keys[index][2]]
+            if priced and not self._in_price(product, min_price, max_price):
+                continue
+            out.append(self._views[product["id"]])
+            if len(out) == limit:
+                break
+        return out
+
+    async def find(self, *, category=None, min_price=None, max_price=None, ids=None,
+                   sort_field="createdAt", cursor=None, limit=20) -> Page:
+        if not self.loaded:
+            return await self.fallback.find(
+                category=category, min_price=min_price, max_price=max_price, ids=ids,
+                sort_field=sort_field, cursor=cursor, limit=limit,
+            )
+        after = None
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_field)
+            after = (value is not None, value, last_id)
+        docs = self._select(category, min_price, max_price, ids, sort_field, after, limit + 1)
+        return make_page(docs, sort_field, limit)
+
+    async def list_by_ids(self, product_ids):
+        if not self.loaded:
+            return await self.fallback.list_by_ids(product_ids)
+        return {pid: self._views[pid] for pid in product_ids if pid in self._views}
+
+    async def get(self, product_id):
+        if not self.loaded:
+            return await self.fallback.get(product_id)
+        return self._products.get(product_id)
+
+    async def get_many(self, product_ids):
+        if not self.loaded:
+            return await self.fallback.get_many(product_ids)
+        return {pid: self._products[pid] for pid in product_ids if pid in self._products}
+
+    async def categories(self):
+        if not self.loaded:
+            return await self.fallback.categories()
+        return sorted(scope for scope in self._sorted if scope is not None)
+
+    async def facets(self, ids=None, category=None, min_price=None, max_price=None):
+        if not self.loaded:
+            return await self.fallback.facets(ids, category, min_price, max_price)
+        if ids is None:
+            products = self._products.values()
+        else:
+            products = (self._products[pid] for pid in ids if pid in self._products)
+        return count_facets(products, category, min_price, max_price)
+
+    async def count(self):
+        if not self.loaded:
+            return await self.fallback.count()
+        return len(self._products)
+
+    async def scan(self, fields):
+        if not self.loaded:
+            async for doc in self.fallback.scan(fields):
+                yield doc
+            return
+        for product in list(self._products.values()):
+            yield product
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bson import Timestamp
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("products", "reviews", "orders")
+
+# Server error codes
+CHANGE_STREAMS_UNSUPPORTED = 40573  # standalone mongod
+_RESUME_POINT_LOST = {280, 286}  # ChangeStreamFatalError, ChangeStreamHistoryLost
+
+# Operations after which the stream no longer describes the collections
+_RESET_OPERATIONS = {"drop", "rename", "dropDatabase", "invalidate"}
+
+
+@dataclass(frozen=True)
+class ProductsChanged:
+    """Products inserted, updated or replaced, and products deleted.
+
+    `documents` are the current versions, including `_id`; `deleted` holds
+    the `_id` of each deleted product, the only field a delete event has.
+    """
+
+    documents: Tuple[Dict[str, Any], ...]
+    deleted: Tuple[Any, ...] = ()
+    at: Optional[Timestamp] = None
+
+    @property
+    def ids(self) -> List[str]:
+        return [doc["id"] for doc in self.documents]
+
+
+@dataclass(frozen=True)
+class ReviewsChanged:
+    # Deleted reviews carry no productId and are not listed
+    product_ids: Tuple[str, ...]
+    at: Optional[Timestamp] = None
+
+
+@dataclass(frozen=True)
+class OrdersChanged:
+    orders: Tuple[Dict[str, Any], ...]
+    at: Optional[Timestamp] = None
+
+
+@dataclass(frozen=True)
+class FeedReset:
+    """Changes may have been missed; drop everything derived from the collections."""
+
+    reason: str
+    at: Optional[Timestamp] = None
+
+
+class ChangeFeed:
+    """Tails one change stream over products, reviews and orders and
+    publishes typed events to in-process subscribers.
+
+    Every worker runs its own feed, so a write made anywhere (another worker,
+    an import, a script in the shell) reaches each process as soon as the
+    stream delivers it. Changes arriving within `flush_ms` of each other are
+    published together, one event per type. The resume token of the last
+    published change is saved in db.meta at most every `save_interval`
+    seconds; after a restart or a lost connection the feed resumes from it,
+    so nothing written in between is missed.
+
+    All workers share one saved token under `token_id`. That is safe: a
+    worker reads it in prepare(), before loading what the feed keeps fresh,
+    so whichever worker saved it, resuming from it can only replay changes
+    the load already saw, and replaying them is idempotent.
+
+    Change streams need a replica set; a single-node one will do. On a
+    standalone server the feed logs once and stops, `active` stays False and
+    callers keep their polling fallback.
+    """
+
+    def __init__(
+        self,
+        db,
+        collections: Sequence[str] = WATCHED_COLLECTIONS,
+        token_id: str = "changefeed",
+        flush_ms: float = 10.0,
+        max_batch: int = 500,
+        save_interval: float = 1.0,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 30.0,
+    ):
+        self.db = db
+        self.collections = tuple(collections)
+        self.token_id = token_id
+        self.flush_seconds = flush_ms / 1000
+        self.max_batch = max_batch
+        self.save_interval = save_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.active = False
+        self._subscribers: Dict[type, List[Callable[[Any], Any]]] = defaultdict(list)
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._start_at: Optional[Timestamp] = None
+        self._invalidated = False
+        self._saved_at = 0.0
+        self._pending: List[Dict[str, Any]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.changes = 0
+        self.events = 0
+        self.restarts = 0
+        self.lag_seconds = 0.0
+
+    def subscribe(self, event_type: type, callback: Callable[[Any], Any]) -> None:
+        """Call `callback(event)` for every published `event_type`; it may be a coroutine."""
+        self._subscribers[event_type].append(callback)
+
+    async def publish(self, event) -> None:
+        self.events += 1
+        for callback in list(self._subscribers[type(event)]):
+            try:
+                outcome = callback(event)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+            except Exception:
+                logger.exception("Subscriber %r failed on %s", callback, type(event).__name__)
+
+    # Lifecycle
+
+    async def prepare(self) -> None:
+        """Fix the point the feed starts from.
+
+        Call before loading whatever the feed keeps fresh: writes made while
+        loading are then delivered instead of lost.
+        """
+        doc = await self.db.meta.find_one({"_id": self.token_id})
+        if doc and doc.get("token"):
+            self._resume_token = doc["token"]
+            return
+        reply = await self.db.command("ping")
+        self._start_at = reply.get("operationTime")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.active = False
+        if self._resume_token is not None:
+            await self._save_token()
+
+    async def run(self) -> None:
+        delay = self.retry_delay
+        while True:
+            try:
+                await self._consume()
+                delay = self.retry_delay
+                continue
+            except OperationFailure as exc:
+                if exc.code == CHANGE_STREAMS_UNSUPPORTED:
+                    self.active = False
+                    logger.warning("Change streams need a replica set; change feed disabled: %s", exc)
+                    return
+                if exc.code in _RESUME_POINT_LOST and (self._resume_token or self._start_at):
+                    logger.warning("Change feed resume point lost, starting from now: %s", exc)
+                    self._resume_token = self._start_at = None
+                    await self.publish(FeedReset("resume point lost"))
+                    continue
+                logger.warning("Change feed failed, retrying in %.0fs: %s", delay, exc)
+            except PyMongoError as exc:
+                logger.warning("Change feed failed, retrying in %.0fs: %s", delay, exc)
+            self.active = False
+            self.restarts += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    async def _consume(self) -> None:
+        pipeline = [{"$match": {"$or": [
+            {"ns.coll": {"$in": list(self.collections)}},
+            {"operationType": {"$in": ["dropDatabase", "invalidate"]}},
+        ]}}]
+        options: Dict[str, Any] = {"full_document": "updateLookup"}
+        if self._resume_token is not None:
+            # Only startAfter may follow an invalidate event
+            options["start_after" if self._invalidated else "resume_after"] = self._resume_token
+        elif self._start_at is not None:
+            options["start_at_operation_time"] = self._start_at
+        try:
+            async with self.db.watch(pipeline, **options) as stream:
+                self.active = True
+                self._invalidated = False
+                async for change in stream:
+                    self._pending.append(change)
+                    if self._flusher is None or self._flusher.done():
+                        self._flusher = asyncio.ensure_future(self._flush_soon())
+                    if len(self._pending) >= self.max_batch:
+                        # Backpressure: stop reading until subscribers catch up
+                        await asyncio.shield(self._flusher)
+                    if change["operationType"] == "invalidate":
+                        self._invalidated = True
+                        break
+        finally:
+            # Publish what was read; anything after it is read again on resume
+            if self._flusher is not None:
+                await asyncio.shield(self._flusher)
+
+    async def _flush_soon(self) -> None:
+        # One flusher at a time keeps events in stream order
+        while self._pending:
+            await asyncio.sleep(self.flush_seconds)
+            batch, self._pending = self._pending, []
+            await self._publish_batch(batch)
+
+    # Translation
+
+    async def _publish_batch(self, changes: List[Dict[str, Any]]) -> None:
+        products: Dict[Any, Dict[str, Any]] = {}
+        deleted: Dict[Any, None] = {}
+        reviews: Dict[str, None] = {}
+        orders: Dict[Any, Dict[str, Any]] = {}
+        reset = None
+        for change in changes:
+            operation = change["operationType"]
+            collection = (change.get("ns") or {}).get("coll")
+            if operation in _RESET_OPERATIONS:
+                reset = f"{operation} on {collection or self.db.name}"
+                continue
+            key = (change.get("documentKey") or {}).get("_id")
+            doc = change.get("fullDocument")
+            if collection == "products":
+                if operation == "delete":
+                    products.pop(key, None)
+                    deleted[key] = None
+                elif doc is not None:
+                    # None when deleted before the lookup; its delete follows
+                    deleted.pop(key, None)
+                    products[key] = doc
+            elif collection == "reviews":
+                if doc is not None and doc.get("productId"):
+                    reviews[doc["productId"]] = None
+            elif collection == "orders" and doc is not None:
+                orders[key] = doc
+
+        at = changes[-1].get("clusterTime")
+        if products or deleted:
+            await self.publish(ProductsChanged(tuple(products.values()), tuple(deleted), at))
+        if reviews:
+            await self.publish(ReviewsChanged(tuple(reviews), at))
+        if orders:
+            await self.publish(OrdersChanged(tuple(orders.values()), at))
+        if reset:
+            await self.publish(FeedReset(reset, at))
+
+        self.changes += len(changes)
+        if isinstance(at, Timestamp):
+            self.lag_seconds = max(0.0, time.time() - at.time)
+        self._resume_token = changes[-1]["_id"]
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            await self._save_token()
+
+    async def _save_token(self) -> None:
+        self._saved_at = time.monotonic()
+        try:
+            await self.db.meta.update_one(
+                {"_id": self.token_id},
+                {"$set": {"token": self._resume_token, "savedAt": datetime.utcnow()}},
+                upsert=True,
+            )
+        except PyMongoError as exc:
+            logger.warning("Could not save the change feed resume token: %s", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": int(self.active),
+            "changes": self.changes,
+            "events": self.events,
+            "restarts": self.restarts,
+            "lagSeconds": round(self.lag_seconds, 3),
+        }
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import UpdateOne
+
+
+class CheckoutError(Exception):
+    def __init__(self, message: str, product_ids: List[str]):
+        super().__init__(message)
+        self.product_ids = product_ids
+
+
+class UnknownProducts(CheckoutError):
+    pass
+
+
+class InsufficientStock(CheckoutError):
+    pass
+
+
+def merge_lines(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Collapse client order lines into {productId: quantity}."""
+    quantities: Dict[str, int] = {}
+    for item in items:
+        product_id = item.get("productId")
+        try:
+            quantity = int(item.get("quantity", 0))
+        except (TypeError, ValueError):
+            quantity = 0
+        if not product_id or quantity <= 0:
+            raise ValueError("Each item needs a productId and a positive quantity")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+async def place_order(client, db, order: Dict[str, Any], quantities: Dict[str, int]) -> Dict[str, Any]:
+    """Price, reserve stock for and persist an order in one transaction.
+
+    `order` carries userId, shippingAddress and the other Order fields; items
+    and total are filled in from the catalog here, never from the client.
+    The round trips are constant in the number of lines: one $in read, one
+    bulk_write of conditional stock decrements, the order insert, the cart
+    clear and the commit. Any line that cannot be reserved aborts the whole
+    transaction, so stock is never oversold.
+    """
+    product_ids = list(quantities)
+
+    async def run(session):
+        products = {
+            product["id"]: product
+            async for product in db.products.find(
+                {"id": {"$in": product_ids}},
+                {"_id": 0, "id": 1, "name": 1, "price": 1, "image": 1, "stock": 1},
+                session=session,
+            )
+        }
+        unknown = [pid for pid in product_ids if pid not in products]
+        if unknown:
+            raise UnknownProducts("Products not found", unknown)
+
+        reservations = [
+            UpdateOne({"id": pid, "stock": {"$gte": qty}}, {"$inc": {"stock": -qty}})
+            for pid, qty in quantities.items()
+        ]
+        result = await db.products.bulk_write(reservations, ordered=False, session=session)
+        if result.modified_count != len(reservations):
+            short = [pid for pid, qty in quantities.items() if products[pid].get("stock", 0) < qty]
+            raise InsufficientStock("Insufficient stock", short or product_ids)
+
+        items = [
+            {
+                "productId": pid,
+                "name": products[pid]["name"],
+                "price": products[pid]["price"],
+                "quantity": qty,
+                "image": products[pid]["image"],
+            }
+            for pid, qty in quantities.items()
+        ]
+        placed = {
+            **order,
+            "items": items,
+            "total": round(sum(item["price"] * item["quantity"] for item in items), 2),
+        }
+        await db.orders.insert_one(dict(placed), session=session)
+        await db.carts.update_one(
+            {"userId": order["userId"]},
+            {"$set": {"items": [], "updatedAt": datetime.utcnow()}},
+            session=session,
+        )
+        return placed
+
+    async with await client.start_session() as session:
+        # The commit carries the write concern; operations inside may not
+        return await session.with_transaction(run, write_concern=db.write_concern)
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping
+
+from pymongo import WriteConcern, monitoring
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Server-side lower bound for maxStalenessSeconds
+MIN_MAX_STALENESS = 90
+
+
+def _int(environ: Mapping[str, str], name: str, default: int) -> int:
+    return int(environ.get(name, default))
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """MongoDB connection settings, read from the environment.
+
+    Review lists may go to secondaries that lag the primary by at most
+    `catalog_max_staleness` seconds, in a causally consistent session after
+    their version is read from the primary; carts and orders always use
+    the primary with `write_concern`.
+    """
+
+    url: str
+    name: str
+    app_name: str = "ecommerce-api"
+    min_pool_size: int = 10
+    max_pool_size: int = 100
+    max_idle_time_ms: int = 60000
+    wait_queue_timeout_ms: int = 2000
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 5000
+    catalog_read_preference: str = "secondaryPreferred"
+    catalog_max_staleness: int = MIN_MAX_STALENESS
+    write_concern: str = "majority"
+    write_timeout_ms: int = 5000
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "DatabaseSettings":
+        settings = cls(
+            url=environ['MONGO_URL'],
+            name=environ['DB_NAME'],
+            app_name=environ.get('MONGO_APP_NAME', cls.app_name),
+            min_pool_size=_int(environ, 'MONGO_MIN_POOL_SIZE', cls.min_pool_size),
+            max_pool_size=_int(environ, 'MONGO_MAX_POOL_SIZE', cls.max_pool_size),
+            max_idle_time_ms=_int(environ, 'MONGO_MAX_IDLE_TIME_MS', cls.max_idle_time_ms),
+            wait_queue_timeout_ms=_int(environ, 'MONGO_WAIT_QUEUE_TIMEOUT_MS', cls.wait_queue_timeout_ms),
+            server_selection_timeout_ms=_int(
+                environ, 'MONGO_SERVER_SELECTION_TIMEOUT_MS', cls.server_selection_timeout_ms
+            ),
+            connect_timeout_ms=_int(environ, 'MONGO_CONNECT_TIMEOUT_MS', cls.connect_timeout_ms),
+            catalog_read_preference=environ.get('MONGO_CATALOG_READ_PREFERENCE', cls.catalog_read_preference),
+            catalog_max_staleness=_int(environ, 'MONGO_CATALOG_MAX_STALENESS_S', cls.catalog_max_staleness),
+            write_concern=environ.get('MONGO_WRITE_CONCERN', cls.write_concern),
+            write_timeout_ms=_int(environ, 'MONGO_WRITE_TIMEOUT_MS', cls.write_timeout_ms),
+        )
+        settings.validate()
+        return settings
+
+    def validate(self) -> None:
+        if self.catalog_read_preference not in READ_PREFERENCES:
+            raise ValueError(
+                f"MONGO_CATALOG_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}, "
+                f"got {self.catalog_read_preference!r}"
+            )
+        if self.catalog_max_staleness != -1 and self.catalog_max_staleness < MIN_MAX_STALENESS:
+            raise ValueError(
+                f"MONGO_CATALOG_MAX_STALENESS_S must be -1 (unbounded) or at least {MIN_MAX_STALENESS}"
+            )
+        if not 0 <= self.min_pool_size <= self.max_pool_size:
+            raise ValueError("MONGO_MIN_POOL_SIZE must be between 0 and MONGO_MAX_POOL_SIZE")
+
+    def client_options(self) -> Dict[str, Any]:
+        return {
+            "appname": self.app_name,
+            "minPoolSize": self.min_pool_size,
+            "maxPoolSize": self.max_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+        }
+
+    def catalog_options(self) -> Dict[str, Any]:
+        mode = READ_PREFERENCES[self.catalog_read_preference]
+        if mode is Primary:
+            return {"read_preference": Primary()}
+        return {"read_preference": mode(max_staleness=self.catalog_max_staleness)}
+
+    def checkout_options(self) -> Dict[str, Any]:
+        w: Any = int(self.write_concern) if self.write_concern.isdigit() else self.write_concern
+        return {
+            "read_preference": Primary(),
+            "write_concern": WriteConcern(w=w, wtimeout=self.write_timeout_ms),
+        }
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters per server, for saturation alerts.
+
+    `waiting` above zero means requests are queueing for a connection; a
+    growing `checkoutTimeouts` means maxPoolSize or waitQueueTimeoutMS is too
+    small for the load.
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open: Dict[Any, int] = defaultdict(int)
+        self.checked_out: Dict[Any, int] = defaultdict(int)
+        self.waiting: Dict[Any, int] = defaultdict(int)
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_errors = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.pool_clears = 0
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event) -> None:
+        with self._lock:
+            for counts in (self.open, self.checked_out, self.waiting):
+                counts.pop(event.address, None)
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.open[event.address] += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.open[event.address] -= 1
+
+    def connection_check_out_started(self, event) -> None:
+        # Started and finished are published on the same thread
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting[event.address] += 1
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.waiting[event.address] -= 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.checkout_timeouts += 1
+            else:
+                self.checkout_errors += 1
+
+    def connection_checked_out(self, event) -> None:
+        waited = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.waiting[event.address] -= 1
+            self.checked_out[event.address] += 1
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.checked_out[event.address] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            busiest = max(self.checked_out.values(), default=0)
+            return {
+                "open": sum(self.open.values()),
+                "checkedOut": sum(self.checked_out.values()),
+                "waiting": sum(self.waiting.values()),
+                "maxPoolSize": self.max_pool_size,
+                # Of the busiest server's pool; each server has its own
+                "utilization": round(busiest / self.max_pool_size, 4) if self.max_pool_size else 0.0,
+                "checkouts": self.checkouts,
+                "checkoutTimeouts": self.checkout_timeouts,
+                "checkoutErrors": self.checkout_errors,
+                "avgWaitSeconds": round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0.0,
+                "maxWaitSeconds": round(self.max_wait_seconds, 6),
+                "clears": self.pool_clears,
+            }
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+from bson import Timestamp
+from pymongo import ReturnDocument
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class CatalogVersion:
+    """Monotonic catalog version shared by all workers through MongoDB.
+
+    Every write to products or reviews bumps the counter; conditional GETs
+    derive their ETag from it instead of running the query. The value is
+    re-read at most every `refresh_interval` seconds, so a write made by
+    another worker is visible after that delay at the latest.
+
+    Each bump also appends the written product ids (null for "anything") to
+    a change log capped at `log_size` entries. When a foreign write is
+    noticed, `on_change` is called with the ids written since this worker's
+    version, or None if they are no longer known; it may be a coroutine.
+
+    Writes that do not go through the API (scripts, other services) do not
+    bump the counter. The change feed reports them through record_change(),
+    which keeps the cluster time of the latest catalog change in the same
+    document; key() combines both, so every worker derives the same ETag
+    for the same content, including right after a restart.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 1.0,
+        on_change: Optional[Callable[[Optional[List[str]]], Any]] = None,
+        log_size: int = 1000,
+    ):
+        self.refresh_interval = refresh_interval
+        self.on_change = on_change
+        self.log_size = log_size
+        self._value: Optional[int] = None
+        self._changed_at: Optional[Timestamp] = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+
+    async def get(self, db) -> int:
+        if self._value is None or time.monotonic() - self._fetched_at >= self.refresh_interval:
+            if self._refreshing and self._value is not None:
+                # Another request is re-reading it, and waits for `on_change`
+                # before publishing a new value; until then the old version
+                # still describes what this worker serves
+                return self._value
+            self._refreshing = True
+            try:
+                doc = await db.meta.find_one({"_id": "catalog"}, {"version": 1, "changedAt": 1})
+                value = doc["version"] if doc else 0
+                if self._value is not None and value != self._value:
+                    await self._changed_elsewhere(db, self._value, value)
+                self.set(value, doc.get("changedAt") if doc else None)
+            finally:
+                self._refreshing = False
+        return self._value
+
+    async def key(self, db) -> str:
+        """The version plus the time of the latest change seen by any worker."""
+        version = await self.get(db)
+        return f"{version}:{self._changed_at}"
+
+    def set(self, value: int, changed_at: Optional[Timestamp] = None) -> None:
+        self._value = value
+        if changed_at is not None and (self._changed_at is None or changed_at > self._changed_at):
+            self._changed_at = changed_at
+        self._fetched_at = time.monotonic()
+
+    async def record_change(self, db, at: Optional[Timestamp]) -> None:
+        """Record a catalog change delivered by the change feed at cluster time `at`.
+
+        Every worker's feed delivers the same change; $max makes all but the
+        first of their writes no-ops.
+        """
+        if at is None or (self._changed_at is not None and at <= self._changed_at):
+            return
+        await db.meta.update_one({"_id": "catalog"}, {"$max": {"changedAt": at}}, upsert=True)
+        self._changed_at = at
+
+    async def bump(self, db, product_ids: Sequence[str] = ()) -> int:
+        doc = await db.meta.find_one_and_update(
+            {"_id": "catalog"},
+            {
+                "$inc": {"version": 1},
+                # Entry i from the end of the log belongs to version - i
+                "$push": {"changes": {"$each": [list(product_ids) or None], "$slice": -self.log_size}},
+            },
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        # Skipped versions mean another worker wrote in the meantime
+        if self._value is not None and doc["version"] != self._value + 1:
+            await self._changed_elsewhere(db, self._value, doc["version"] - 1)
+        self.set(doc["version"])
+        return self._value
+
+    async def changed_ids(self, db, since: int, until: int) -> Optional[List[str]]:
+        """Product ids written in versions since+1..until, None if unknown."""
+        if until <= since:
+            return []
+        doc = await db.meta.find_one({"_id": "catalog"})
+        if not doc:
+            return None
+        changes = doc.get("changes", [])
+        start = len(changes) - 1 - (doc["version"] - (since + 1))
+        end = len(changes) - 1 - (doc["version"] - until)
+        if start < 0 or end >= len(changes):
+            return None
+        ids: List[str] = []
+        for entry in changes[start:end + 1]:
+            if entry is None:
+                return None
+            ids.extend(entry)
+        return list(dict.fromkeys(ids))
+
+    async def _changed_elsewhere(self, db, since: int, until: int) -> None:
+        if not self.on_change:
+            return
+        outcome = self.on_change(await self.changed_ids(db, since, until))
+        if asyncio.iscoroutine(outcome):
+            await outcome
+
+
+def make_etag(version: Any, request: Request) -> str:
+    # Same version + same URL -> same body. The encoding the client accepts is
+    # part of the key because GZipMiddleware may change the representation.
+    accepts_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    key = f"{version}:{request.url.path}?{sorted(request.query_params.multi_items())}:{accepts_gzip}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the request's If-None-Match matches `etag`."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    # If-None-Match uses the weak comparison function
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
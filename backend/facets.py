@@ -0,0 +1,124 @@
+import bisect
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+
+PRICE_BOUNDARIES = [0, 25, 50, 100, 250, 500, 1000]
+RATING_BOUNDARIES = [0, 1, 2, 3, 4, 5]
+
+
+def _price_match(min_price: Optional[float], max_price: Optional[float]) -> Dict[str, Any]:
+    if min_price is None and max_price is None:
+        return {}
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    return {"price": price}
+
+
+def _category_match(category: Optional[str]) -> Dict[str, Any]:
+    return {"category": category} if category else {}
+
+
+def _bucket(field: str, boundaries: List[float]) -> Dict[str, Any]:
+    # The last boundary is open-ended; documents at or above it land in the
+    # default bucket, which is labelled with that boundary.
+    return {
+        "$bucket": {
+            "groupBy": {"$ifNull": [f"${field}", 0]},
+            "boundaries": boundaries,
+            "default": boundaries[-1],
+            "output": {"count": {"$sum": 1}},
+        }
+    }
+
+
+def facet_pipeline(
+    base_match: Dict[str, Any],
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """Single $facet aggregation computing category, price and rating counts.
+
+    Each facet applies every filter except its own, so the client can show how
+    many products it would get by changing just that filter.
+    """
+    category_match = _category_match(category)
+    price_match = _price_match(min_price, max_price)
+    all_filters = {**category_match, **price_match}
+    return [
+        {"$match": base_match},
+        {"$project": {"_id": 0, "category": 1, "price": 1, "rating": 1}},
+        {
+            "$facet": {
+                "categories": [
+                    {"$match": price_match},
+                    {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}},
+                ],
+                "price": [{"$match": category_match}, _bucket("price", PRICE_BOUNDARIES)],
+                "rating": [{"$match": all_filters}, _bucket("rating", RATING_BOUNDARIES)],
+                "total": [{"$match": all_filters}, {"$count": "count"}],
+            }
+        },
+    ]
+
+
+def _format_buckets(rows: List[Dict[str, Any]], boundaries: List[float]) -> List[Dict[str, Any]]:
+    counts = {row["_id"]: row["count"] for row in rows}
+    buckets = []
+    for low, high in zip(boundaries, boundaries[1:] + [None]):
+        buckets.append({"min": low, "max": high, "count": counts.get(low, 0)})
+    return buckets
+
+
+def format_facets(result: Dict[str, Any]) -> Dict[str, Any]:
+    total = result.get("total") or [{"count": 0}]
+    return {
+        "total": total[0]["count"],
+        "categories": [{"value": row["_id"], "count": row["count"]} for row in result.get("categories", [])],
+        "price": _format_buckets(result.get("price", []), PRICE_BOUNDARIES),
+        "rating": _format_buckets(result.get("rating", []), RATING_BOUNDARIES),
+    }
+
+
+def _bucket_of(value: Optional[float], boundaries: List[float]) -> float:
+    value = value if value is not None else 0
+    if value < boundaries[0] or value >= boundaries[-1]:
+        return boundaries[-1]
+    return boundaries[bisect.bisect_right(boundaries, value) - 1]
+
+
+def count_facets(
+    products: Iterable[Dict[str, Any]],
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> Dict[str, Any]:
+    """In-process equivalent of facet_pipeline() followed by format_facets()."""
+    categories: Counter = Counter()
+    prices: Counter = Counter()
+    ratings: Counter = Counter()
+    total = 0
+    for product in products:
+        price = product.get("price")
+        in_category = not category or product.get("category") == category
+        in_price = (min_price is None or (price is not None and price >= min_price)) and (
+            max_price is None or (price is not None and price <= max_price)
+        )
+        if in_price:
+            categories[product.get("category")] += 1
+        if in_category:
+            prices[_bucket_of(price, PRICE_BOUNDARIES)] += 1
+        if in_category and in_price:
+            ratings[_bucket_of(product.get("rating"), RATING_BOUNDARIES)] += 1
+            total += 1
+    return format_facets({
+        "total": [{"count": total}],
+        "categories": [{"_id": k, "count": v} for k, v in sorted(categories.items(), key=lambda kv: str(kv[0]))],
+        "price": [{"_id": k, "count": v} for k, v in prices.items()],
+        "rating": [{"_id": k, "count": v} for k, v in ratings.items()],
+    })
@@ -0,0 +1,331 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# Variant widths in pixels; requests snap up to the next one so the number
+# of variants per image stays small
+WIDTHS = (160, 320, 640, 1080)
+
+# format -> (Pillow encoder, media type, save options)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Part of every variant name; bump to re-encode everything
+ENCODER_VERSION = "1"
+
+
+class OriginError(Exception):
+    """The source image could not be fetched or decoded."""
+
+
+class SourceNotAllowed(OriginError):
+    pass
+
+
+class ImageOrigin:
+    """Where source images come from."""
+
+    async def fetch(self, url: str) -> bytes:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpOrigin(ImageOrigin):
+    """Fetches over HTTP(S) from `allowed_hosts` only, so the endpoint cannot
+    be used to reach arbitrary servers. Redirects are followed here, up to
+    `max_redirects`, checking every hop against the allowlist."""
+
+    def __init__(
+        self,
+        allowed_hosts: Iterable[str],
+        timeout: float = 10.0,
+        max_bytes: int = 20 * 1024 * 1024,
+        max_redirects: int = 5,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self._client = httpx.AsyncClient(timeout=timeout, follow_redirects=False, transport=transport)
+
+    def allows(self, url: str) -> bool:
+        parts = urlsplit(url)
+        return parts.scheme in ("http", "https") and (parts.hostname or "").lower() in self.allowed_hosts
+
+    async def fetch(self, url: str) -> bytes:
+        for _ in range(self.max_redirects + 1):
+            if not self.allows(url):
+                raise SourceNotAllowed(f"Host not allowed: {urlsplit(url).hostname}")
+            try:
+                async with self._client.stream("GET", url) as response:
+                    if response.is_redirect:
+                        url = urljoin(url, response.headers["location"])
+                        continue
+                    if response.status_code != 200:
+                        raise OriginError(f"Origin returned {response.status_code}")
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) > self.max_bytes:
+                            raise OriginError(f"Image larger than {self.max_bytes} bytes")
+                    return bytes(body)
+            except httpx.HTTPError as exc:
+                raise OriginError(str(exc)) from exc
+        raise OriginError(f"More than {self.max_redirects} redirects")
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class FileOrigin(ImageOrigin):
+    """Serves the last path segment of the URL from `root`, e.g. fixtures in tests."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    async def fetch(self, url: str) -> bytes:
+        name = Path(urlsplit(url).path).name
+        path = self.root / name
+        if not name or not path.is_file():
+            raise OriginError(f"No such image: {name}")
+        return await asyncio.to_thread(path.read_bytes)
+
+
+def snap_width(width: int) -> int:
+    for candidate in WIDTHS:
+        if width <= candidate:
+            return candidate
+    return WIDTHS[-1]
+
+
+def render_variant(source: bytes, width: int, fmt: str) -> bytes:
+    """Resize to `width` (never upscaling) and encode; CPU bound."""
+    encoder, _, options = FORMATS[fmt]
+    # Pillow decodes lazily, so a broken source can fail anywhere up to save()
+    try:
+        image = Image.open(io.BytesIO(source))
+        # JPEG sources decode at a reduced scale directly, much cheaper than
+        # decoding the full-resolution original and then shrinking it
+        image.draft("RGB", (width, width * 4))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        if encoder == "JPEG":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.mode or "transparency" in image.info else "RGB")
+        out = io.BytesIO()
+        image.save(out, encoder, **options)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise OriginError(f"Not a usable image: {exc}") from exc
+    return out.getvalue()
+
+
+class VariantCache:
+    """Content-addressed on-disk store of encoded variants.
+
+    A variant is named after the digest of its source image's bytes, so the
+    same image under different URLs is encoded once and a name never
+    changes meaning, which is what makes immutable caching safe. Small
+    ref files map a source URL to that digest. Variants and refs together
+    are kept under `max_bytes`, counted in whole filesystem blocks so that
+    many tiny refs cannot outgrow it, by evicting the least recently used.
+    An evicted ref only costs a new origin fetch; the variants it pointed
+    to are found again by digest.
+
+    Methods do blocking file I/O; call them from a worker thread. The
+    index is guarded by a lock, so several threads may use it at once.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, block_size: int = 4096):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[Path, int]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def _cost(self, size: int) -> int:
+        return max(1, -(-size // self.block_size)) * self.block_size
+
+    def load(self) -> None:
+        """Index what is already on disk, oldest access first."""
+        (self.root / "refs").mkdir(parents=True, exist_ok=True)
+        (self.root / "variants").mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in [*(self.root / "refs").glob("*"), *(self.root / "variants").glob("*/*")]:
+            if path.name.startswith(".tmp-"):
+                # Left behind by a write that was interrupted
+                path.unlink(missing_ok=True)
+                continue
+            stat = path.stat()
+            found.append((stat.st_mtime, path, self._cost(stat.st_size)))
+        found.sort()
+        with self._lock:
+            self._files = OrderedDict((path, cost) for _, path, cost in found)
+            self.bytes = sum(self._files.values())
+            self._evict()
+
+    def _ref_path(self, url: str) -> Path:
+        return self.root / "refs" / hashlib.sha256(url.encode()).hexdigest()
+
+    def source_digest(self, url: str) -> Optional[str]:
+        path = self._ref_path(url)
+        try:
+            digest = path.read_text().strip()
+        except FileNotFoundError:
+            self._forget(path)
+            return None
+        self.get(path)
+        return digest or None
+
+    def set_source_digest(self, url: str, digest: str) -> None:
+        self.put(self._ref_path(url), digest.encode())
+
+    def variant_path(self, digest: str, width: int, fmt: str) -> Path:
+        return self.root / "variants" / digest[:2] / f"{digest}-{width}-v{ENCODER_VERSION}.{fmt}"
+
+    def get(self, path: Path) -> bool:
+        try:
+            # Access time survives restarts through the mtime
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(path)
+            return False
+        with self._lock:
+            if path in self._files:
+                self._files.move_to_end(path)
+                return True
+        # Written by another worker sharing the directory
+        self._add(path, path.stat().st_size)
+        return True
+
+    def put(self, path: Path, data: bytes) -> None:
+        _write_atomic(path, data)
+        self._add(path, len(data))
+
+    def _add(self, path: Path, size: int) -> None:
+        cost = self._cost(size)
+        with self._lock:
+            self.bytes += cost - self._files.pop(path, 0)
+            self._files[path] = cost
+            self._evict()
+
+    def _forget(self, path: Path) -> None:
+        with self._lock:
+            self.bytes -= self._files.pop(path, 0)
+
+    def _evict(self) -> None:
+        # Called with the lock held
+        while self.bytes > self.max_bytes and len(self._files) > 1:
+            path, cost = self._files.popitem(last=False)
+            self.bytes -= cost
+            self.evictions += 1
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class ImageVariants:
+    """Resized, re-encoded product images backed by VariantCache.
+
+    Concurrent requests for a variant that is not cached yet share one
+    origin fetch and one encode. Encoding, at most `max_concurrent_renders`
+    at a time, and cache file I/O run in worker threads, so neither blocks
+    the event loop.
+    """
+
+    def __init__(self, origin: ImageOrigin, cache: VariantCache, max_concurrent_renders: int = 2):
+        self.origin = origin
+        self.cache = cache
+        self._renders = asyncio.Semaphore(max_concurrent_renders)
+        self._inflight: Dict[Tuple[str, int, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.origin_fetches = 0
+        self.failures = 0
+
+    async def variant(self, url: str, width: int, fmt: str) -> Path:
+        """Path of the `fmt` variant of `url` at the allowed width >= `width`."""
+        width = snap_width(width)
+        digest = await asyncio.to_thread(self.cache.source_digest, url)
+        if digest is not None:
+            path = self.cache.variant_path(digest, width, fmt)
+            if await asyncio.to_thread(self.cache.get, path):
+                self.hits += 1
+                return path
+        self.misses += 1
+        key = (url, width, fmt)
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = self._inflight[key] = asyncio.ensure_future(self._build(url, width, fmt))
+            flight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(flight)
+
+    async def _build(self, url: str, width: int, fmt: str) -> Path:
+        try:
+            self.origin_fetches += 1
+            source = await self.origin.fetch(url)
+            digest = hashlib.sha256(source).hexdigest()
+            await asyncio.to_thread(self.cache.set_source_digest, url, digest)
+            path = self.cache.variant_path(digest, width, fmt)
+            if await asyncio.to_thread(self.cache.get, path):
+                return path
+            async with self._renders:
+                data = await asyncio.to_thread(render_variant, source, width, fmt)
+            await asyncio.to_thread(self.cache.put, path, data)
+            return path
+        except Exception:
+            self.failures += 1
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "originFetches": self.origin_fetches,
+            "failures": self.failures,
+            "cacheBytes": self.cache.bytes,
+            "cacheMaxBytes": self.cache.max_bytes,
+            "cacheFiles": len(self.cache),
+            "evictions": self.cache.evictions,
+        }
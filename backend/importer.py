@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+DUPLICATE_KEY = 11000
+
+# (row number, parsed record or None, parse error or None, raw text)
+Row = Tuple[int, Optional[Dict[str, Any]], Optional[str], str]
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    inserted: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    started: float = field(default_factory=time.monotonic)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed or (time.monotonic() - self.started)
+        return self.rows / elapsed if elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats = asdict(self)
+        del stats["started"]
+        stats["elapsed"] = round(self.elapsed, 3)
+        stats["rowsPerSecond"] = round(self.rows_per_second, 1)
+        return stats
+
+
+# Readers: byte chunks -> lines -> records, never holding more than a chunk
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_file_chunks(path: Path) -> AsyncIterator[bytes]:
+    with open(path, "rb") as fp:
+        while True:
+            chunk = await asyncio.to_thread(fp.read, CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Row]:
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row, None, f"Invalid JSON: {exc}", line
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "Expected a JSON object", line
+            continue
+        yield row, record, None, line
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[Row]:
+    header: Optional[List[str]] = None
+    row = 0
+    buffered = ""
+    async for line in lines:
+        buffered += line
+        # A quoted field may span lines; wait until the quotes balance
+        if buffered.count('"') % 2:
+            continue
+        raw, buffered = buffered, ""
+        if not raw.strip():
+            continue
+        values = next(csv.reader([raw]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, None, f"Expected {len(header)} columns, got {len(values)}", raw
+            continue
+        # Empty cells mean "not provided" so model defaults apply
+        yield row, {k: v for k, v in zip(header, values) if v != ""}, None, raw
+    if buffered.strip():
+        yield row + 1, None, "Unterminated quoted field", buffered
+
+
+PARSERS = {"ndjson": parse_ndjson, "csv": parse_csv}
+
+
+class Checkpoint:
+    """Highest row number below which every row has been committed.
+
+    Stored in the `imports` collection so an interrupted import, from the CLI
+    or the endpoint, resumes by re-sending the same input with the same id.
+    A finished import is not resumed: running the same id again starts over.
+    """
+
+    def __init__(self, db, import_id: str):
+        self.collection = db.imports
+        self.import_id = import_id
+
+    async def load(self) -> int:
+        doc = await self.collection.find_one({"_id": self.import_id})
+        if not doc:
+            return 0
+        if doc.get("done"):
+            await self.collection.delete_one({"_id": self.import_id})
+            return 0
+        return doc["committedRows"]
+
+    async def save(self, committed: int, stats: ImportStats, done: bool = False) -> None:
+        await self.collection.update_one(
+            {"_id": self.import_id},
+            {"$set": {"committedRows": committed, "done": done, "stats": stats.as_dict()}},
+            upsert=True,
+        )
+
+
+def _upsert(product: Dict[str, Any], provided: set) -> UpdateOne:
+    # Columns present in the input overwrite; defaults only fill new products
+    values = {k: v for k, v in product.items() if k != "id"}
+    set_fields = {k: v for k, v in values.items() if k in provided}
+    on_insert = {k: v for k, v in values.items() if k not in provided}
+    update = {"$set": set_fields}
+    if on_insert:
+        update["$setOnInsert"] = on_insert
+    return UpdateOne({"id": product["id"]}, update, upsert=True)
+
+
+async def import_products(
+    db,
+    rows: AsyncIterator[Row],
+    model,
+    *,
+    mode: str = "upsert",
+    batch_size: int = 1000,
+    writers: int = 4,
+    import_id: Optional[str] = None,
+    rejects: Optional[TextIO] = None,
+    on_batch: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    progress_interval: float = 5.0,
+) -> ImportStats:
+    """Validate rows against `model` and write them in unordered batches.
+
+    The reader hands batches to `writers` concurrent writer tasks through a
+    bounded queue, so reading blocks (backpressure) whenever MongoDB falls
+    behind. mode="insert" uses insert_many and counts duplicate ids; rows
+    without an `id` get a fresh one. mode="upsert" uses bulk_write keyed on
+    `id` and rejects rows without one, since a generated id would turn every
+    re-run into new products. Rejected rows are written to `rejects` as
+    NDJSON with their row number and the reason.
+
+    `on_batch` is called with the products each batch wrote, leaving out
+    duplicates and failed inserts. In upsert mode these are the validated
+    rows, with defaults for columns the input did not provide; the stored
+    product keeps its existing values for those.
+
+    With an `import_id`, rows up to the last committed batch are skipped on a
+    re-run. Replaying the uncommitted tail (or the whole file) is idempotent
+    for upserts, and for inserts only of rows that carry their own `id`.
+    """
+    if mode not in ("insert", "upsert"):
+        raise ValueError(f"Unknown import mode: {mode}")
+
+    stats = ImportStats()
+    checkpoint = Checkpoint(db, import_id) if import_id else None
+    resume_after = await checkpoint.load() if checkpoint else 0
+    queue: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+    completed: Dict[int, int] = {}  # batch number -> last row in it
+    state = {"next_batch": 0, "committed": resume_after, "failure": None}
+
+    def reject(row: int, reason: str, raw: Any) -> None:
+        stats.rejected += 1
+        if rejects is not None:
+            rejects.write(json.dumps({"row": row, "error": reason, "raw": raw}, default=str) + "\n")
+
+    async def write(
+        products: List[Dict[str, Any]], provided: List[set], row_numbers: List[int]
+    ) -> List[Dict[str, Any]]:
+        # Returns the products the write applied
+        if mode == "insert":
+            try:
+                result = await db.products.insert_many([dict(p) for p in products], ordered=False)
+                stats.inserted += len(result.inserted_ids)
+            except BulkWriteError as exc:
+                errors = exc.details.get("writeErrors", [])
+                stats.inserted += exc.details.get("nInserted", 0)
+                for error in errors:
+                    if error.get("code") == DUPLICATE_KEY:
+                        stats.duplicates += 1
+                    else:
+                        reject(row_numbers[error["index"]], error.get("errmsg", "write error"), products[error["index"]])
+                failed = {error["index"] for error in errors}
+                return [p for index, p in enumerate(products) if index not in failed]
+        else:
+            result = await db.products.bulk_write(
+                [_upsert(p, fields) for p, fields in zip(products, provided)], ordered=False
+            )
+            stats.inserted += result.upserted_count
+            stats.updated += result.modified_count
+        return products
+
+    async def writer() -> None:
+        while True:
+            batch = await queue.get()
+            try:
+                if batch is None:
+                    return
+                if state["failure"] is not None:
+                    continue  # drain so the reader never blocks
+                number, last_row, products, provided, row_numbers = batch
+                if products:
+                    applied = await write(products, provided, row_numbers)
+                    if on_batch is not None and applied:
+                        outcome = on_batch(applied)
+                        if asyncio.iscoroutine(outcome):
+                            await outcome
+                completed[number] = last_row
+                await advance()
+            except Exception as exc:  # surfaced by the reader loop
+                state["failure"] = state["failure"] or exc
+            finally:
+                queue.task_done()
+
+    async def advance() -> None:
+        # Batches finish out of order; only checkpoint a contiguous prefix
+        moved = False
+        while state["next_batch"] in completed:
+            state["committed"] = completed.pop(state["next_batch"])
+            state["next_batch"] += 1
+            moved = True
+        if moved and checkpoint:
+            await checkpoint.save(state["committed"], stats)
+
+    tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+    products: List[Dict[str, Any]] = []
+    provided: List[set] = []
+    row_numbers: List[int] = []
+    batch_number = 0
+    last_row = resume_after
+    last_report = time.monotonic()
+
+    async def flush() -> None:
+        nonlocal products, provided, row_numbers, batch_number
+        await queue.put((batch_number, last_row, products, provided, row_numbers))
+        batch_number += 1
+        products, provided, row_numbers = [], [], []
+
+    try:
+        async for row, record, error, raw in rows:
+            if state["failure"] is not None:
+                break
+            if row <= resume_after:
+                stats.skipped += 1
+                continue
+            stats.rows += 1
+            last_row = row
+            if error is not None:
+                reject(row, error, raw)
+            elif mode == "upsert" and not record.get("id"):
+                reject(row, "id: required in upsert mode", record)
+            else:
+                try:
+                    product = model(**record)
+                except ValidationError as exc:
+                    reject(row, "; ".join(
+                        f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()
+                    ), record)
+                else:
+                    products.append(product.dict())
+                    provided.append(product.model_fields_set)
+                    row_numbers.append(row)
+            if stats.rows % batch_size == 0:
+                await flush()
+            if time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                logger.info("Import progress: %d rows, %.0f rows/s", stats.rows, stats.rows_per_second)
+        if state["failure"] is None and stats.rows % batch_size:
+            await flush()
+    finally:
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+
+    stats.elapsed = time.monotonic() - stats.started
+    if state["failure"] is not None:
+        raise state["failure"]
+    if checkpoint:
+        await checkpoint.save(state["committed"], stats, done=True)
+    logger.info("Import finished: %s", stats.as_dict())
+    return stats
+
+
+def default_import_id(path: Path) -> str:
+    # An edited file gets a new id, so it is imported in full instead of
+    # resuming after the rows committed from its previous contents
+    stat = path.stat()
+    return f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+async def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Stream an NDJSON or CSV product catalog into MongoDB")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=sorted(PARSERS), help="defaults to the file extension")
+    parser.add_argument("--mode", choices=["upsert", "insert"], default="upsert")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--import-id", help="resume key; defaults to the input path, size and mtime")
+    parser.add_argument("--rejects", type=Path, help="defaults to <path>.rejects.ndjson")
+    args = parser.parse_args(argv)
+
+    from models import Product
+    from server import client, db
+
+    fmt = args.format or ("csv" if args.path.suffix.lower() == ".csv" else "ndjson")
+    rejects_path = args.rejects or args.path.with_name(args.path.name + ".rejects.ndjson")
+    rows = PARSERS[fmt](iter_lines(iter_file_chunks(args.path)))
+    try:
+        with open(rejects_path, "a") as rejects:
+            stats = await import_products(
+                db,
+                rows,
+                Product,
+                mode=args.mode,
+                batch_size=args.batch_size,
+                writers=args.writers,
+                import_id=args.import_id or default_import_id(args.path),
+                rejects=rejects,
+            )
+    finally:
+        client.close()
+    print(json.dumps(stats.as_dict(), indent=2))
+    if stats.rejected:
+        print(f"Rejected rows written to {rejects_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+
+# Index registry, one entry per collection. Every query shape issued by the
+# router in server.py must be served by one of these (see QUERY_SHAPES below).
+INDEXES: Dict[str, List[IndexModel]] = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("createdAt", DESCENDING), ("id", DESCENDING)], name="createdAt_id"),
+        IndexModel([("price", DESCENDING), ("id", DESCENDING)], name="price_id"),
+        IndexModel([("rating", DESCENDING), ("id", DESCENDING)], name="rating_id"),
+        IndexModel([("category", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)], name="category_createdAt_id"),
+        IndexModel([("category", ASCENDING), ("price", DESCENDING), ("id", DESCENDING)], name="category_price_id"),
+        IndexModel([("category", ASCENDING), ("rating", DESCENDING), ("id", DESCENDING)], name="category_rating_id"),
+    ],
+    "reviews": [
+        IndexModel([("productId", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)], name="productId_createdAt_id"),
+        IndexModel([("productId", ASCENDING), ("rating", DESCENDING), ("id", DESCENDING)], name="productId_rating_id"),
+    ],
+    "carts": [
+        IndexModel([("userId", ASCENDING)], name="userId_unique", unique=True),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("userId", ASCENDING), ("createdAt", DESCENDING), ("id", DESCENDING)], name="userId_createdAt_id"),
+    ],
+}
+
+
+@dataclass
+class QueryShape:
+    name: str
+    collection: str
+    command: str = "find"
+    filter: Dict[str, Any] = field(default_factory=dict)
+    sort: Optional[List[Tuple[str, int]]] = None
+    key: Optional[str] = None
+
+
+# Representative instances of every query the router issues. Values are
+# placeholders; only the shape matters to the planner.
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("get_products", "products", sort=[("createdAt", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_products:price", "products", sort=[("price", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_products:rating", "products", sort=[("rating", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_products:category", "products", filter={"category": "x"}, sort=[("createdAt", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_products:category:price", "products", filter={"category": "x"}, sort=[("price", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_products:category:rating", "products", filter={"category": "x"}, sort=[("rating", DESCENDING), ("id", DESCENDING)]),
+    QueryShape(
+        "get_products:category:price_range",
+        "products",
+        filter={"category": "x", "price": {"$gte": 0, "$lte": 1}},
+        sort=[("price", DESCENDING), ("id", DESCENDING)],
+    ),
+    QueryShape(
+        "get_products:search",
+        "products",
+        filter={"id": {"$in": ["x", "y"]}},
+        sort=[("createdAt", DESCENDING), ("id", DESCENDING)],
+    ),
+    QueryShape("get_product", "products", filter={"id": "x"}),
+    QueryShape("get_categories", "products", command="distinct", key="category"),
+    QueryShape("get_reviews", "reviews", filter={"productId": "x"}, sort=[("createdAt", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_reviews:rating", "reviews", filter={"productId": "x"}, sort=[("rating", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_cart", "carts", filter={"userId": "x"}),
+    QueryShape("get_orders", "orders", filter={"userId": "x"}, sort=[("createdAt", DESCENDING), ("id", DESCENDING)]),
+    QueryShape("get_order", "orders", filter={"id": "x", "userId": "x"}),
+]
+
+
+class CollectionScanError(RuntimeError):
+    pass
+
+
+async def ensure_indexes(db) -> None:
+    for collection, models in INDEXES.items():
+        try:
+            names = await db[collection].create_indexes(models)
+            logger.info("Indexes on %s: %s", collection, ", ".join(names))
+        except OperationFailure as exc:
+            # Typically a unique index over existing duplicates; keep serving
+            # and let the self-check report the missing index.
+            logger.error("Failed to create indexes on %s: %s", collection, exc)
+
+
+def _explain_command(shape: QueryShape) -> Dict[str, Any]:
+    if shape.command == "distinct":
+        inner = {"distinct": shape.collection, "key": shape.key, "query": shape.filter}
+    else:
+        inner = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            inner["sort"] = dict(shape.sort)
+    return {"explain": inner, "verbosity": "queryPlanner"}
+
+
+def plan_stages(plan: Any) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+async def verify_query_plans(db) -> Dict[str, List[str]]:
+    """Explain every registered query shape and raise on any COLLSCAN."""
+    plans = {}
+    offenders = []
+    for shape in QUERY_SHAPES:
+        explain = await db.command(_explain_command(shape))
+        stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        plans[shape.name] = stages
+        if "COLLSCAN" in stages:
+            offenders.append(f"{shape.name} ({shape.collection}): {' <- '.join(stages)}")
+    if offenders:
+        raise CollectionScanError("Query shapes without a supporting index:\n  " + "\n  ".join(offenders))
+    return plans
+
+
+async def _main(argv: List[str]) -> int:
+    from server import client, db
+
+    try:
+        await ensure_indexes(db)
+        if "--check" in argv:
+            try:
+                plans = await verify_query_plans(db)
+            except CollectionScanError as exc:
+                print(exc, file=sys.stderr)
+                return 1
+            for name, stages in plans.items():
+                print(f"{name}: {' <- '.join(stages)}")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,267 @@
+import bisect
+import contextvars
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label used for DB commands issued outside any request (startup, CLIs)
+NO_ROUTE = "background"
+UNMATCHED_ROUTE = "unmatched"
+
+
+class _RequestScope:
+    __slots__ = ("route", "db_seconds", "db_commands")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.db_seconds = 0.0
+        self.db_commands = 0
+
+
+# Set by the middleware; Motor copies the context into its executor threads,
+# so command events can be attributed to the route that issued them
+_current_request: contextvars.ContextVar[Optional[_RequestScope]] = contextvars.ContextVar(
+    "metrics_request", default=None
+)
+
+
+def current_route() -> str:
+    request = _current_request.get()
+    return request.route if request else NO_ROUTE
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """In-process registry rendered in the Prometheus text format.
+
+    HTTP samples come from MetricsMiddleware on the event loop; MongoDB
+    samples come from CommandMetrics on Motor's executor threads, hence the
+    lock. Route labels are path templates, never raw paths, so cardinality
+    stays bounded.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.request_db: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.commands: Dict[Tuple[str, str, str], Histogram] = {}
+        self.command_docs: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.command_failures: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.sources: List[Tuple[str, Any, Dict[str, str]]] = []
+
+    def register_stats(self, prefix: str, source, **labels: str) -> None:
+        """Export the numeric values of `source.stats()` as gauges.
+
+        Keys are snake_cased, so LRUCache's hitRatio under prefix "cache"
+        becomes cache_hit_ratio.
+        """
+        self.sources.append((prefix, source, labels))
+
+    def _histogram(self, series: Dict, key: Tuple) -> Histogram:
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, db_seconds: float) -> None:
+        with self._lock:
+            self._histogram(self.requests, (method, route)).observe(seconds)
+            self._histogram(self.request_db, (method, route)).observe(db_seconds)
+            self.responses[(method, route, str(status))] += 1
+
+    def observe_command(self, command: str, collection: str, seconds: float, documents: int, failed: bool) -> None:
+        request = _current_request.get()
+        key = (request.route if request else NO_ROUTE, command, collection)
+        with self._lock:
+            self._histogram(self.commands, key).observe(seconds)
+            self.command_docs[key] += documents
+            if failed:
+                self.command_failures[key] += 1
+            if request is not None:
+                request.db_seconds += seconds
+                request.db_commands += 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            _render_histograms(
+                lines, "http_request_duration_seconds", "HTTP request latency by route template",
+                ("method", "route"), self.requests,
+            )
+            _render_histograms(
+                lines, "http_request_db_seconds", "Time spent in MongoDB commands per HTTP request",
+                ("method", "route"), self.request_db,
+            )
+            _render_samples(
+                lines, "http_responses_total", "counter", "HTTP responses by status code",
+                ("method", "route", "status"), self.responses,
+            )
+            _render_samples(
+                lines, "http_requests_in_flight", "gauge", "Requests currently being served",
+                ("route",), {(route,): value for route, value in self.in_flight.items()},
+            )
+            _render_histograms(
+                lines, "mongodb_command_duration_seconds", "MongoDB command latency",
+                ("route", "command", "collection"), self.commands,
+            )
+            _render_samples(
+                lines, "mongodb_command_documents_total", "counter", "Documents returned or written by MongoDB commands",
+                ("route", "command", "collection"), self.command_docs,
+            )
+            _render_samples(
+                lines, "mongodb_command_failures_total", "counter", "Failed MongoDB commands",
+                ("route", "command", "collection"), self.command_failures,
+            )
+        for prefix, source, labels in self.sources:
+            label_text = _labels(tuple(labels), tuple(labels.values())) if labels else ""
+            for key, value in source.stats().items():
+                if isinstance(value, (int, float)):
+                    metric = f"{prefix}_" + re.sub(r"(?<!^)(?=[A-Z])", "_", key).lower()
+                    lines.append(f"{metric}{label_text} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histograms(lines, name, help_text, label_names, series: Dict[Tuple, Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(series.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_labels(label_names, key, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_labels(label_names, key, le)} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(label_names, key)} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{_labels(label_names, key)} {histogram.count}")
+
+
+def _render_samples(lines, name, kind, help_text, label_names, series: Dict[Tuple, int]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for key, value in sorted(series.items()):
+        lines.append(f"{name}{_labels(label_names, key)} {value}")
+
+
+def route_template(scope) -> str:
+    # Same first-match rule as the router, resolved up front so the in-flight
+    # gauge can be labelled before the request is handled
+    app = scope.get("app")
+    partial = None
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", UNMATCHED_ROUTE)
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: latency, status and in-flight count per route."""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request = _RequestScope(route_template(scope))
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _current_request.set(request)
+        self.metrics.in_flight[request.route] += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight[request.route] -= 1
+            _current_request.reset(token)
+            self.metrics.observe_request(method, request.route, status, elapsed, request.db_seconds)
+
+
+def _reply_documents(reply) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "values" in reply:  # distinct
+        return len(reply["values"])
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """pymongo listener feeding per-command timings into `metrics`.
+
+    Pass it to the client with `event_listeners=[CommandMetrics(metrics)]`.
+    """
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._collections: Dict[Tuple, str] = {}
+
+    def started(self, event) -> None:
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = (
+            collection if isinstance(collection, str) else ""
+        )
+
+    def succeeded(self, event) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.metrics.observe_command(
+            event.command_name, collection, event.duration_micros / 1e6, _reply_documents(event.reply), False
+        )
+
+    def failed(self, event) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        self.metrics.observe_command(event.command_name, collection, event.duration_micros / 1e6, 0, True)
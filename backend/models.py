@@ -0,0 +1,78 @@
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+# API models; kept apart from server so tools and benchmarks can import them
+# without connecting to MongoDB
+
+class Product(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    description: str
+    price: float
+    category: str
+    image: str
+    rating: float = 0.0
+    reviewCount: int = 0
+    stock: int = 100
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+class Review(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    productId: str
+    userId: str = "mock-user"
+    userName: str = "Guest User"
+    rating: int
+    comment: str
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+class ReviewSummary(BaseModel):
+    productId: str
+    average: float
+    count: int
+    histogram: Dict[str, int]
+
+class ReviewCreate(BaseModel):
+    productId: str
+    rating: int = Field(..., ge=1, le=5)
+    comment: str
+
+class CartItem(BaseModel):
+    productId: str
+    quantity: int
+
+class Cart(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    userId: str = "mock-user"
+    items: List[CartItem] = []
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+class AddToCartRequest(BaseModel):
+    productId: str
+    quantity: int = 1
+
+class Order(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    userId: str = "mock-user"
+    items: List[dict]
+    total: float
+    status: str = "pending"
+    shippingAddress: dict
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+class OrderSummary(BaseModel):
+    id: str
+    status: str
+    total: float
+    itemCount: int
+    createdAt: datetime
+
+class OrderCreate(BaseModel):
+    items: List[dict]
+    # Ignored: the total is computed from catalog prices at checkout
+    total: Optional[float] = None
+    shippingAddress: dict
+
@@ -0,0 +1,96 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# (has value, value, id): ascending order matches MongoDB's, where null sorts
+# before any value and ties are broken by id
+SortKey = Tuple[bool, Any, str]
+
+
+def sort_key(product: Dict[str, Any], field: str) -> SortKey:
+    value = product.get(field)
+    return (value is not None, value, product["id"])
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(sort_field: str, doc: Dict[str, Any]) -> str:
+    """Opaque cursor for the page following `doc` in (sort_field, id) order."""
+    payload = [sort_field, _encode_value(doc.get(sort_field)), doc["id"]]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        field, value, last_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if field != sort_field:
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    return _decode_value(value), last_id
+
+
+def keyset_filter(sort_field: str, cursor: Optional[str], descending: bool = True) -> Dict[str, Any]:
+    """Range predicate selecting documents strictly after the cursor position.
+
+    Pages are ordered by (sort_field, id), so with a matching compound index
+    each page is a bounded index scan regardless of depth. Null and missing
+    values sort below every other value, as in MongoDB and sort_key(); range
+    operators never match them, so they get their own branch.
+    """
+    if not cursor:
+        return {}
+    value, last_id = decode_cursor(cursor, sort_field)
+    op = "$lt" if descending else "$gt"
+    same_value = {sort_field: value, "id": {op: last_id}}
+    if value is None:
+        # Descending, only nulls remain; ascending, every value is still ahead
+        return same_value if descending else {"$or": [{sort_field: {"$ne": None}}, same_value]}
+    branches = [{sort_field: {op: value}}, same_value]
+    if descending:
+        branches.append({sort_field: None})
+    return {"$or": branches}
+
+
+def merge_filters(query: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+    if not extra:
+        return query
+    if not query:
+        return extra
+    return {"$and": [query, extra]}
+
+
+def page_in_memory(
+    docs: Iterable[Dict[str, Any]], sort_field: str, cursor: Optional[str], limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of `docs` in descending (sort_field, id) order, with the same
+    cursors as the database paths; for result sets that are already in memory."""
+    keyed = ((sort_key(doc, sort_field), doc) for doc in docs)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_field)
+        after = (value is not None, value, last_id)
+        keyed = (item for item in keyed if item[0] < after)
+    page = [doc for _, doc in heapq.nlargest(limit + 1, keyed, key=lambda item: item[0])]
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(sort_field, page[-1])
+    return page, None
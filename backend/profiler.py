@@ -0,0 +1,254 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import monitoring
+
+from indexes import plan_stages
+from metrics import current_route
+
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Session, transaction and routing fields the driver adds; explain rejects them
+_DRIVER_FIELDS = {
+    "lsid", "$db", "$clusterTime", "txnNumber", "autocommit", "startTransaction",
+    "$readPreference", "readConcern", "writeConcern", "cursor", "batchSize", "singleBatch",
+}
+
+
+def normalize_shape(value: Any) -> Any:
+    """Replace literals with "?" so queries differing only in values group together."""
+    if isinstance(value, dict):
+        return {key: normalize_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        # Keep pipelines and $and/$or structure; collapse value lists like $in
+        if value and all(isinstance(item, dict) for item in value):
+            return [normalize_shape(item) for item in value]
+        return "?"
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    shape: Dict[str, Any] = {}
+    if command_name == "find":
+        shape["filter"] = normalize_shape(command.get("filter", {}))
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+    elif command_name == "aggregate":
+        shape["pipeline"] = normalize_shape(command.get("pipeline", []))
+    elif command_name in ("count", "distinct"):
+        shape["query"] = normalize_shape(command.get("query", {}))
+        if command_name == "distinct":
+            shape["key"] = command.get("key")
+    elif command_name == "findAndModify":
+        shape["query"] = normalize_shape(command.get("query", {}))
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+    else:  # update, delete: one shape per statement list
+        statements = command.get("updates") or command.get("deletes") or []
+        shape["q"] = [normalize_shape(statement.get("q", {})) for statement in statements[:1]]
+    return shape
+
+
+def _find_key(doc: Any, key: str) -> Any:
+    # Explain output nests differently for find vs aggregate and per engine
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        values = doc.values()
+    elif isinstance(doc, list):
+        values = doc
+    else:
+        return None
+    for value in values:
+        found = _find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    stats = _find_key(explain, "executionStats") or {}
+    stages = plan_stages(_find_key(explain, "winningPlan") or {})
+    examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    return {
+        "plan": " <- ".join(stages),
+        "collectionScan": "COLLSCAN" in stages,
+        "docsExamined": examined,
+        "keysExamined": stats.get("totalKeysExamined", 0),
+        "nReturned": returned,
+        "examinedPerReturned": round(examined / returned, 1) if returned else float(examined),
+        "executionTimeMillis": stats.get("executionTimeMillis"),
+        "explainedAt": datetime.utcnow().isoformat(),
+    }
+
+
+class _Shape:
+    __slots__ = ("command", "collection", "shape", "count", "total_ms", "max_ms", "last_seen",
+                 "routes", "explain", "explained_at", "explaining")
+
+    def __init__(self, command: str, collection: str, shape: Dict[str, Any]):
+        self.command = command
+        self.collection = collection
+        self.shape = shape
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_seen = 0.0
+        self.routes: Set[str] = set()
+        self.explain: Optional[Dict[str, Any]] = None
+        self.explained_at = 0.0
+        self.explaining = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "command": self.command,
+            "collection": self.collection,
+            "shape": self.shape,
+            "count": self.count,
+            "totalMs": round(self.total_ms, 1),
+            "avgMs": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "maxMs": round(self.max_ms, 1),
+            "lastSeen": datetime.utcfromtimestamp(self.last_seen).isoformat() if self.last_seen else None,
+            "routes": sorted(self.routes),
+            "explain": self.explain,
+        }
+
+
+class SlowQueryProfiler(monitoring.CommandListener):
+    """Groups MongoDB commands slower than `threshold_ms` by normalized shape
+    and captures an executionStats explain for each shape in the background.
+
+    A command under the threshold costs one dict insert and one pop. Explains
+    are rate limited per shape (`explain_interval` seconds), globally
+    (`max_explains_per_minute`) and run one at a time; the number of tracked
+    shapes is capped at `max_shapes`, evicting the cheapest.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = 100.0,
+        explain_interval: float = 600.0,
+        max_explains_per_minute: int = 10,
+        max_shapes: int = 200,
+    ):
+        self.threshold_micros = threshold_ms * 1000
+        self.explain_interval = explain_interval
+        self.max_explains_per_minute = max_explains_per_minute
+        self.max_shapes = max_shapes
+        self.shapes: Dict[str, _Shape] = {}
+        self._commands: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._explain_times: List[float] = []
+        self._explain_lock: Optional[asyncio.Lock] = None
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, client, loop: asyncio.AbstractEventLoop) -> None:
+        """Enable explains; without this, slow shapes are only counted."""
+        self._client = client
+        self._loop = loop
+        self._explain_lock = asyncio.Lock()
+
+    # CommandListener: runs on Motor's executor threads
+
+    def started(self, event) -> None:
+        if event.command_name in EXPLAINABLE and self.threshold_micros > 0:
+            self._commands[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event) -> None:
+        started = self._commands.pop((event.connection_id, event.request_id), None)
+        if started is not None and event.duration_micros >= self.threshold_micros:
+            self._record(event.command_name, started, event.duration_micros / 1000)
+
+    def failed(self, event) -> None:
+        self._commands.pop((event.connection_id, event.request_id), None)
+
+    def _record(self, command_name: str, started: tuple, duration_ms: float) -> None:
+        database, command = started
+        collection = command.get(command_name)
+        collection = collection if isinstance(collection, str) else ""
+        shape = command_shape(command_name, command)
+        key = json.dumps([command_name, collection, shape], sort_keys=True, default=str)
+        now = time.time()
+        with self._lock:
+            entry = self.shapes.get(key)
+            if entry is None:
+                if len(self.shapes) >= self.max_shapes:
+                    cheapest = min(self.shapes, key=lambda k: self.shapes[k].total_ms)
+                    del self.shapes[cheapest]
+                entry = self.shapes[key] = _Shape(command_name, collection, shape)
+            entry.count += 1
+            entry.total_ms += duration_ms
+            entry.max_ms = max(entry.max_ms, duration_ms)
+            entry.last_seen = now
+            entry.routes.add(current_route())
+            explain = self._should_explain(entry, now)
+        if explain and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._spawn_explain, entry, database, command_name, command)
+
+    def _should_explain(self, entry: _Shape, now: float) -> bool:
+        if entry.explaining or now - entry.explained_at < self.explain_interval:
+            return False
+        self._explain_times = [t for t in self._explain_times if now - t < 60]
+        if len(self._explain_times) >= self.max_explains_per_minute:
+            return False
+        self._explain_times.append(now)
+        entry.explaining = True
+        return True
+
+    # Explains: run on the event loop, never on the request path
+
+    def _spawn_explain(self, entry: _Shape, database: str, command_name: str, command: Dict[str, Any]) -> None:
+        asyncio.ensure_future(self._explain(entry, database, command_name, command))
+
+    async def _explain(self, entry: _Shape, database: str, command_name: str, command: Dict[str, Any]) -> None:
+        inner = {key: value for key, value in command.items() if key not in _DRIVER_FIELDS}
+        if command_name == "aggregate" and any("$out" in stage or "$merge" in stage for stage in inner["pipeline"]):
+            entry.explaining = False
+            return
+        try:
+            async with self._explain_lock:
+                explain = await self._client[database].command(
+                    {"explain": inner, "verbosity": "executionStats"}
+                )
+            summary = summarize_explain(explain)
+        except Exception as exc:
+            logger.warning("Explain failed for slow %s on %s: %s", command_name, entry.collection, exc)
+            summary = {"error": str(exc), "explainedAt": datetime.utcnow().isoformat()}
+        with self._lock:
+            entry.explain = summary
+            entry.explained_at = time.time()
+            entry.explaining = False
+        if summary.get("collectionScan"):
+            logger.warning(
+                "Slow %s on %s is a collection scan (%s docs examined for %s returned): %s",
+                command_name, entry.collection, summary["docsExamined"], summary["nReturned"],
+                json.dumps(entry.shape, default=str),
+            )
+
+    def report(self, limit: int = 20, sort: str = "totalMs") -> List[Dict[str, Any]]:
+        """Worst query shapes first.
+
+        `sort` is totalMs (time spent over the threshold), count, maxMs, avgMs
+        or examinedPerReturned (from the captured explain).
+        """
+        with self._lock:
+            entries = [entry.as_dict() for entry in self.shapes.values()]
+        if sort == "examinedPerReturned":
+            key = lambda e: (e["explain"] or {}).get("examinedPerReturned") or 0  # noqa: E731
+        else:
+            key = lambda e: e[sort]  # noqa: E731
+        return sorted(entries, key=key, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.shapes.clear()
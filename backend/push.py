@@ -0,0 +1,263 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import orjson
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from changes import OrdersChanged, ProductsChanged
+
+
+logger = logging.getLogger(__name__)
+
+# Close codes
+POLICY_VIOLATION = 1008
+TRY_AGAIN_LATER = 1013
+
+ORDER_FIELDS = ("id", "status", "total", "createdAt")
+
+_PING = orjson.dumps({"type": "ping"}).decode()
+
+Topic = Tuple[str, str]
+
+
+def _encode(message: Dict[str, Any]) -> str:
+    return orjson.dumps(message).decode()
+
+
+def order_message(order: Dict[str, Any]) -> str:
+    # Same shape as GET /api/orders list entries
+    summary = {field: order.get(field) for field in ORDER_FIELDS}
+    summary["itemCount"] = len(order.get("items") or ())
+    return _encode({"type": "order", "order": summary})
+
+
+class _Connection:
+    __slots__ = ("websocket", "topics", "outbox", "sender", "closing")
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.topics: Set[Topic] = set()
+        # Pending messages keyed by what they describe; a newer state of the
+        # same order or product replaces the queued one
+        self.outbox: Dict[Hashable, str] = {}
+        self.sender: Optional[asyncio.Task] = None
+        self.closing = False
+
+
+class PushHub:
+    """WebSocket fan-out of order status and watched-product changes.
+
+    A connection is subscribed to its user's orders and to up to
+    `max_watched` products it asks for with {"type": "watch", "productIds":
+    [...]}. Messages are serialized once per change and queued on each
+    subscribed connection; a connection has a sender task only while its
+    queue is not empty, so idle connections cost one receive coroutine.
+
+    Backpressure: queued messages for the same order or product coalesce,
+    so a slow client gets the latest state instead of every step. A client
+    with more than `max_pending` distinct messages queued, or one that does
+    not take a message within `send_timeout` seconds, is disconnected with
+    1013 and is expected to reconnect and refetch.
+
+    Changes come from the ChangeFeed, so every worker pushes writes made by
+    any worker.
+    """
+
+    def __init__(
+        self,
+        snapshot: Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]],
+        low_stock: int = 5,
+        max_watched: int = 100,
+        max_pending: int = 64,
+        send_timeout: float = 10.0,
+        heartbeat_interval: float = 25.0,
+    ):
+        self.snapshot = snapshot
+        self.low_stock = low_stock
+        self.max_watched = max_watched
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self._connections: Set[_Connection] = set()
+        self._topics: Dict[Topic, Set[_Connection]] = {}
+        # (price, stock) last pushed per watched product, to send only changes
+        self._products: Dict[str, Tuple[Any, Any]] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+        self.slow_closes = 0
+
+    def start(self) -> None:
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.ensure_future(self._beat())
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for connection in list(self._connections):
+            await self._close(connection, 1001)
+
+    # Connections
+
+    async def serve(self, websocket: WebSocket, user_id: str) -> None:
+        await websocket.accept()
+        connection = _Connection(websocket)
+        self._connections.add(connection)
+        self._join(connection, ("orders", user_id))
+        try:
+            while True:
+                try:
+                    message = await websocket.receive_json()
+                except ValueError:
+                    await self._close(connection, POLICY_VIOLATION)
+                    return
+                await self._handle(connection, message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._drop(connection)
+
+    async def _handle(self, connection: _Connection, message: Any) -> None:
+        if not isinstance(message, dict):
+            return
+        kind = message.get("type")
+        product_ids = [pid for pid in message.get("productIds") or () if isinstance(pid, str)]
+        if kind == "watch":
+            watched = sum(1 for topic in connection.topics if topic[0] == "product")
+            new = [pid for pid in dict.fromkeys(product_ids) if ("product", pid) not in connection.topics]
+            new = new[:max(0, self.max_watched - watched)]
+            for pid in new:
+                self._join(connection, ("product", pid))
+            if new:
+                # Current state first, so the client needs no separate fetch
+                for pid, product in (await self.snapshot(new)).items():
+                    self._products.setdefault(pid, (product.get("price"), product.get("stock")))
+                    self._enqueue(connection, ("product", pid), self._product_message(product))
+        elif kind == "unwatch":
+            for pid in product_ids:
+                self._leave(connection, ("product", pid))
+
+    def _join(self, connection: _Connection, topic: Topic) -> None:
+        connection.topics.add(topic)
+        self._topics.setdefault(topic, set()).add(connection)
+
+    def _leave(self, connection: _Connection, topic: Topic) -> None:
+        connection.topics.discard(topic)
+        subscribers = self._topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(connection)
+        if not subscribers:
+            del self._topics[topic]
+            if topic[0] == "product":
+                self._products.pop(topic[1], None)
+
+    def _drop(self, connection: _Connection) -> None:
+        self._connections.discard(connection)
+        for topic in list(connection.topics):
+            self._leave(connection, topic)
+        connection.outbox.clear()
+        if connection.sender is not None and not connection.sender.done():
+            connection.sender.cancel()
+
+    async def _close(self, connection: _Connection, code: int) -> None:
+        connection.closing = True
+        try:
+            await connection.websocket.close(code)
+        except Exception:
+            pass
+        self._drop(connection)
+
+    def _evict(self, connection: _Connection) -> None:
+        if connection.closing:
+            return
+        connection.closing = True
+        self.slow_closes += 1
+        logger.debug("Closing push connection that is not keeping up")
+        asyncio.ensure_future(self._close(connection, TRY_AGAIN_LATER))
+
+    # Sending
+
+    def _enqueue(self, connection: _Connection, key: Hashable, text: str) -> None:
+        if connection.closing:
+            return
+        outbox = connection.outbox
+        if key in outbox:
+            # Re-inserted so it goes out after whatever was queued before it
+            del outbox[key]
+            self.coalesced += 1
+        elif len(outbox) >= self.max_pending:
+            self._evict(connection)
+            return
+        outbox[key] = text
+        if connection.sender is None or connection.sender.done():
+            connection.sender = asyncio.ensure_future(self._send_pending(connection))
+
+    async def _send_pending(self, connection: _Connection) -> None:
+        outbox = connection.outbox
+        try:
+            while outbox and not connection.closing:
+                text = outbox.pop(next(iter(outbox)))
+                await asyncio.wait_for(connection.websocket.send_text(text), self.send_timeout)
+                self.sent += 1
+        except asyncio.TimeoutError:
+            self._evict(connection)
+        except Exception:
+            # Disconnected; the receive loop cleans up
+            outbox.clear()
+
+    def _broadcast(self, topic: Topic, text: str) -> None:
+        for connection in self._topics.get(topic, ()):
+            self._enqueue(connection, topic, text)
+
+    async def _beat(self) -> None:
+        # One timer for all connections; also keeps proxies from closing idle sockets
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            for connection in list(self._connections):
+                self._enqueue(connection, "ping", _PING)
+
+    # Change feed subscribers
+
+    def _product_message(self, product: Dict[str, Any]) -> str:
+        stock = product.get("stock")
+        return _encode({
+            "type": "product",
+            "product": {"id": product["id"], "price": product.get("price"), "stock": stock},
+            "lowStock": stock is not None and stock <= self.low_stock,
+        })
+
+    def on_products_changed(self, event: ProductsChanged) -> None:
+        for product in event.documents:
+            pid = product["id"]
+            if ("product", pid) not in self._topics:
+                continue
+            price, stock = product.get("price"), product.get("stock")
+            last_price, last_stock = self._products.get(pid, (None, None))
+            self._products[pid] = (price, stock)
+            low = stock is not None and stock <= self.low_stock
+            was_low = last_stock is not None and last_stock <= self.low_stock
+            # Stock moves while plentiful are not worth a message
+            if price != last_price or (stock != last_stock and (low or was_low)):
+                self._broadcast(("product", pid), self._product_message(product))
+
+    def on_orders_changed(self, event: OrdersChanged) -> None:
+        for order in event.orders:
+            topic = ("orders", order.get("userId"))
+            if topic not in self._topics:
+                continue
+            text = order_message(order)
+            for connection in self._topics[topic]:
+                self._enqueue(connection, ("order", order.get("id")), text)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._connections),
+            "topics": len(self._topics),
+            "pending": sum(len(connection.outbox) for connection in self._connections),
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "slowCloses": self.slow_closes,
+        }
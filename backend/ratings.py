@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+STARS = ("1", "2", "3", "4", "5")
+
+# What recompute_rating_aggregates() leaves on a product without reviews
+EMPTY_AGGREGATE = {"ratingSum": 0, "reviewCount": 0, "ratingHistogram": {star: 0 for star in STARS}}
+
+
+def _derive_rating() -> Dict[str, Any]:
+    return {
+        "$set": {
+            "rating": {
+                "$cond": [
+                    {"$gt": ["$reviewCount", 0]},
+                    {"$round": [{"$divide": ["$ratingSum", "$reviewCount"]}, 1]},
+                    "$rating",
+                ]
+            }
+        }
+    }
+
+
+def _bump_review_version() -> Dict[str, Any]:
+    # Tags review lists for conditional GETs; bumped by every aggregate change
+    return {"$add": [{"$ifNull": ["$reviewVersion", 0]}, 1]}
+
+
+def add_review_update(rating: int) -> List[Dict[str, Any]]:
+    """Pipeline update folding one review into a product's running aggregate.
+
+    Equivalent to $inc on ratingSum, reviewCount and ratingHistogram.<star>,
+    with `rating` derived from the incremented values in the same atomic
+    document update, so concurrent reviews never lose a count. A product
+    from before aggregates existed has a reviewCount but no ratingSum; its
+    sum is seeded from rating * reviewCount so the average stays right
+    until backfill_rating_aggregates() rebuilds it exactly.
+    """
+    star = f"ratingHistogram.{rating}"
+    seeded_sum = {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$reviewCount", 0]}]}
+    return [
+        {
+            "$set": {
+                "ratingSum": {"$add": [{"$ifNull": ["$ratingSum", seeded_sum]}, rating]},
+                "reviewCount": {"$add": [{"$ifNull": ["$reviewCount", 0]}, 1]},
+                star: {"$add": [{"$ifNull": [f"${star}", 0]}, 1]},
+                "reviewVersion": _bump_review_version(),
+            }
+        },
+        _derive_rating(),
+    ]
+
+
+def _aggregate_update(product_id: str, row: Dict[str, Any]) -> UpdateOne:
+    histogram = {star: row.get(star, 0) for star in STARS}
+    return UpdateOne(
+        {"id": product_id},
+        [
+            {
+                "$set": {
+                    "ratingSum": row["ratingSum"],
+                    "reviewCount": row["reviewCount"],
+                    "ratingHistogram": {"$literal": histogram},
+                    "reviewVersion": _bump_review_version(),
+                }
+            },
+            _derive_rating(),
+        ],
+    )
+
+
+def _reset_update(product: Dict[str, Any]) -> UpdateOne:
+    # Matches only while the aggregate is still the one that was read, so a
+    # review added since the recompute started is not wiped
+    values = dict(EMPTY_AGGREGATE)
+    if product.get("reviewCount"):
+        # The rating was derived from reviews that no longer exist; a seeded
+        # rating on a never-reviewed product is kept, as in add_review_update
+        values["rating"] = 0
+    return UpdateOne(
+        {"id": product["id"], "reviewCount": product.get("reviewCount"), "ratingSum": product.get("ratingSum")},
+        {"$set": values, "$inc": {"reviewVersion": 1}},
+    )
+
+
+async def recompute_rating_aggregates(db, product_ids: Optional[List[str]] = None, batch_size: int = 500) -> int:
+    """Rebuild rating aggregates from the reviews collection.
+
+    Used to backfill products created before aggregates existed, or to repair
+    them: products with reviews get aggregates computed from them, and every
+    other product in scope (`product_ids`, or the whole catalog) is reset to
+    an empty aggregate. Its rating drops to 0 if the old aggregate counted
+    reviews. Returns the number of products updated.
+    """
+    match = {"productId": {"$in": product_ids}} if product_ids else {}
+    group = {"_id": "$productId", "ratingSum": {"$sum": "$rating"}, "reviewCount": {"$sum": 1}}
+    for star in STARS:
+        group[star] = {"$sum": {"$cond": [{"$eq": ["$rating", int(star)]}, 1, 0]}}
+
+    updated = 0
+    batch = []
+
+    async def flush() -> None:
+        nonlocal updated, batch
+        if batch:
+            updated += (await db.products.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+
+    reviewed = set()
+    async for row in db.reviews.aggregate([{"$match": match}, {"$group": group}], allowDiskUse=True):
+        reviewed.add(row["_id"])
+        batch.append(_aggregate_update(row["_id"], row))
+        if len(batch) >= batch_size:
+            await flush()
+
+    # Products without reviews: never aggregated, all reviews deleted, or drifted
+    scope = {"id": {"$in": product_ids}} if product_ids else {}
+    fields = {"_id": 0, "id": 1, **{field: 1 for field in EMPTY_AGGREGATE}}
+    async for product in db.products.find(scope, fields):
+        if product["id"] in reviewed or all(product.get(k) == v for k, v in EMPTY_AGGREGATE.items()):
+            continue
+        batch.append(_reset_update(product))
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+    logger.info("Recomputed rating aggregates for %d products", updated)
+    return updated
+
+
+async def backfill_rating_aggregates(db) -> int:
+    """Recompute aggregates of the products that have none yet, e.g. at startup."""
+    product_ids = await db.products.distinct("id", {"ratingSum": {"$exists": False}})
+    if not product_ids:
+        return 0
+    return await recompute_rating_aggregates(db, product_ids)
+
+
+async def _main(argv: List[str]) -> int:
+    from server import client, db
+
+    try:
+        updated = await recompute_rating_aggregates(db, argv or None)
+        print(f"Updated rating aggregates on {updated} products")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,436 @@
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument
+
+from checkout import place_order
+from facets import facet_pipeline, format_facets
+from pagination import encode_cursor, keyset_filter, merge_filters
+from ratings import add_review_update
+
+
+# A page of documents plus the cursor of the next page, if there is one
+Page = Tuple[List[Dict[str, Any]], Optional[str]]
+
+
+def make_page(docs: List[Dict[str, Any]], sort_field: str, limit: int) -> Page:
+    # Callers fetch limit + 1 documents to learn whether another page exists
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(sort_field, docs[-1])
+    return docs, None
+
+
+class ProductRepository(ABC):
+    """Catalog reads behind the product routes.
+
+    `find` pages by (sort_field, id) descending with the same opaque cursors
+    whatever the backend; a bad cursor raises pagination.InvalidCursor.
+    List methods return documents with exactly the list projection's fields,
+    `get`/`get_many` return whole documents.
+    """
+
+    async def load(self) -> None:
+        """Prepare the backend at startup."""
+
+    async def refresh(self, product_ids: Optional[Sequence[str]] = None) -> None:
+        """Pick up writes to `product_ids`, or to anything when None."""
+
+    def apply(self, documents: Sequence[Dict[str, Any]], deleted: Sequence[Any] = ()) -> Optional[List[str]]:
+        """Apply current documents and deleted `_id`s from a change stream.
+
+        Returns the ids of the deleted products, None if they are unknown.
+        """
+        return None if deleted else []
+
+    @abstractmethod
+    async def find(
+        self,
+        *,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        ids: Optional[Sequence[str]] = None,
+        sort_field: str = "createdAt",
+        cursor: Optional[str] = None,
+        limit: int = 20,
+    ) -> Page:
+        ...
+
+    @abstractmethod
+    async def list_by_ids(self, product_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get(self, product_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, product_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def categories(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    async def facets(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def scan(self, fields: Dict[str, int]) -> AsyncIterator[Dict[str, Any]]:
+        ...
+
+
+class MongoProductRepository(ProductRepository):
+    """Every read is a MongoDB query.
+
+    `collection` should read from the primary: listing pages and categories
+    are cached under the catalog version and single documents end up in the
+    product cache, so a lagging secondary would pin old results to a new
+    version.
+    """
+
+    def __init__(self, collection, projection: Dict[str, Any]):
+        self.collection = collection
+        self.projection = projection
+
+    async def find(self, *, category=None, min_price=None, max_price=None, ids=None,
+                   sort_field="createdAt", cursor=None, limit=20) -> Page:
+        query: Dict[str, Any] = {}
+        if ids is not None:
+            query["id"] = {"$in": list(ids)}
+        if category:
+            query["category"] = category
+        if min_price is not None or max_price is not None:
+            query["price"] = {}
+            if min_price is not None:
+                query["price"]["$gte"] = min_price
+            if max_price is not None:
+                query["price"]["$lte"] = max_price
+        query = merge_filters(query, keyset_filter(sort_field, cursor))
+
+        docs = await self.collection.find(query, self.projection).sort(
+            [(sort_field, -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        return make_page(docs, sort_field, limit)
+
+    async def list_by_ids(self, product_ids):
+        cursor = self.collection.find({"id": {"$in": list(product_ids)}}, self.projection)
+        return {doc["id"]: doc async for doc in cursor}
+
+    async def get(self, product_id):
+        return await self.collection.find_one({"id": product_id}, {"_id": 0})
+
+    async def get_many(self, product_ids):
+        cursor = self.collection.find({"id": {"$in": list(product_ids)}}, {"_id": 0})
+        return {doc["id"]: doc async for doc in cursor}
+
+    async def categories(self):
+        return sorted(await self.collection.distinct("category"))
+
+    async def facets(self, ids=None, category=None, min_price=None, max_price=None):
+        base_match = {"id": {"$in": list(ids)}} if ids is not None else {}
+        pipeline = facet_pipeline(base_match, category, min_price, max_price)
+        result = await self.collection.aggregate(pipeline).to_list(1)
+        return format_facets(result[0] if result else {})
+
+    async def count(self):
+        return await self.collection.count_documents({})
+
+    async def scan(self, fields):
+        async for doc in self.collection.find({}, fields):
+            yield doc
+
+
+class ReviewRepository(ABC):
+    """Reviews of a product, paged by (sort_field, id) descending.
+
+    version() changes whenever a product's reviews do. Inside one session(),
+    a list() never returns reviews older than the version read before it.
+    """
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Any]:
+        yield None
+
+    @abstractmethod
+    async def version(self, product_id: str, session: Any = None) -> int:
+        ...
+
+    @abstractmethod
+    async def list(self, product_id: str, sort_field: str, cursor: Optional[str], limit: int,
+                   session: Any = None) -> Page:
+        ...
+
+    @abstractmethod
+    async def add(self, review: Dict[str, Any]) -> None:
+        """Store a review and fold it into its product's rating aggregate."""
+
+
+class MongoReviewRepository(ReviewRepository):
+    """Review lists come from `reads`, which may route to secondaries.
+    Writes, the rating aggregate and the product's `reviewVersion`, which
+    add_review_update() bumps, go to the primary. The session is causally
+    consistent, so a secondary waits until it has caught up with the
+    version read on the primary before it answers list()."""
+
+    def __init__(self, reads, writes, products, projection: Dict[str, Any]):
+        self.reads = reads
+        self.writes = writes
+        self.products = products
+        self.projection = projection
+
+    @asynccontextmanager
+    async def session(self):
+        async with await self.products.database.client.start_session(causal_consistency=True) as session:
+            yield session
+
+    async def version(self, product_id: str, session=None) -> int:
+        doc = await self.products.find_one({"id": product_id}, {"_id": 0, "reviewVersion": 1}, session=session)
+        return doc.get("reviewVersion", 0) if doc else 0
+
+    async def list(self, product_id: str, sort_field: str, cursor: Optional[str], limit: int,
+                   session=None) -> Page:
+        query = merge_filters({"productId": product_id}, keyset_filter(sort_field, cursor))
+        docs = await self.reads.find(query, self.projection, session=session).sort(
+            [(sort_field, -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        return make_page(docs, sort_field, limit)
+
+    async def add(self, review: Dict[str, Any]) -> None:
+        await self.writes.insert_one(dict(review))
+        # Fold the review into the product's running rating aggregate
+        await self.products.update_one({"id": review["productId"]}, add_review_update(review["rating"]))
+
+
+CART_PROJECTION = {"_id": 0}
+
+
+def add_item_pipeline(product_id: str, quantity: int):
+    # Increment the line if the product is already in the cart, append it
+    # otherwise; a single atomic update that also creates the cart on upsert.
+    pid = {"$literal": product_id}
+    items = {"$ifNull": ["$items", []]}
+    return [
+        {
+            "$set": {
+                "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+                "items": {
+                    "$cond": [
+                        {"$in": [pid, {"$map": {"input": items, "in": "$$this.productId"}}]},
+                        {
+                            "$map": {
+                                "input": items,
+                                "in": {
+                                    "$cond": [
+                                        {"$eq": ["$$this.productId", pid]},
+                                        {"productId": pid, "quantity": {"$add": ["$$this.quantity", quantity]}},
+                                        "$$this",
+                                    ]
+                                },
+                            }
+                        },
+                        {"$concatArrays": [items, [{"productId": pid, "quantity": quantity}]]},
+                    ]
+                },
+                "updatedAt": datetime.utcnow(),
+            }
+        }
+    ]
+
+
+def hydrated_cart_pipeline(userId: str):
+    return [
+        {"$match": {"userId": userId}},
+        {
+            "$lookup": {
+                "from": "products",
+                "localField": "items.productId",
+                "foreignField": "id",
+                "as": "products",
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "id": 1,
+                "userId": 1,
+                "items": 1,
+                "updatedAt": 1,
+                "products": {"id": 1, "name": 1, "price": 1, "image": 1, "stock": 1},
+            }
+        },
+    ]
+
+
+def hydrate_cart(cart: dict) -> dict:
+    products = {product["id"]: product for product in cart.pop("products", [])}
+    items = []
+    total = 0.0
+    item_count = 0
+    for item in cart.get("items", []):
+        product = products.get(item["productId"])
+        line = {"productId": item["productId"], "quantity": item["quantity"]}
+        if product is None:
+            line.update(missing=True, outOfStock=False, subtotal=0.0)
+        else:
+            out_of_stock = product.get("stock", 0) < item["quantity"]
+            subtotal = round(product["price"] * item["quantity"], 2)
+            line.update(
+                name=product["name"],
+                price=product["price"],
+                image=product["image"],
+                stock=product.get("stock", 0),
+                missing=False,
+                outOfStock=out_of_stock,
+                subtotal=subtotal,
+            )
+            # Only lines that can actually be checked out count towards the total
+            if not out_of_stock:
+                total += subtotal
+                item_count += item["quantity"]
+        items.append(line)
+    return {**cart, "items": items, "itemCount": item_count, "total": round(total, 2)}
+
+
+class CartRepository(ABC):
+    """One cart per user; carts are created on first use."""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def view(self, user_id: str) -> Dict[str, Any]:
+        """The cart with each line joined to its product, see hydrate_cart."""
+
+    @abstractmethod
+    async def add_item(self, user_id: str, product_id: str, quantity: int) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def set_quantity(self, user_id: str, product_id: str, quantity: int) -> Optional[Dict[str, Any]]:
+        """Set a line's quantity, removing the line at zero; None if there is no cart."""
+
+    @abstractmethod
+    async def remove_item(self, user_id: str, product_id: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self, user_id: str) -> None:
+        ...
+
+
+class MongoCartRepository(CartRepository):
+    """One cart document per user; every mutation is a single atomic update."""
+
+    def __init__(self, collection, cart_model):
+        self.collection = collection
+        self.cart_model = cart_model
+
+    def new_cart_fields(self) -> Dict[str, Any]:
+        # Fields written only when an upsert creates the cart; userId comes from the filter
+        cart = self.cart_model().dict()
+        del cart["userId"]
+        return cart
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        return await self.collection.find_one_and_update(
+            {"userId": user_id},
+            {"$setOnInsert": self.new_cart_fields()},
+            projection=CART_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def view(self, user_id: str) -> Dict[str, Any]:
+        # Cart joined to its products in one aggregation round trip
+        carts = await self.collection.aggregate(hydrated_cart_pipeline(user_id)).to_list(1)
+        return hydrate_cart(carts[0] if carts else {"userId": user_id, "items": []})
+
+    async def add_item(self, user_id: str, product_id: str, quantity: int) -> Dict[str, Any]:
+        return await self.collection.find_one_and_update(
+            {"userId": user_id},
+            add_item_pipeline(product_id, quantity),
+            projection=CART_PROJECTION,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def set_quantity(self, user_id: str, product_id: str, quantity: int) -> Optional[Dict[str, Any]]:
+        if quantity <= 0:
+            update = {"$pull": {"items": {"productId": product_id}}, "$set": {"updatedAt": datetime.utcnow()}}
+            array_filters = None
+        else:
+            update = {"$set": {"items.$[item].quantity": quantity, "updatedAt": datetime.utcnow()}}
+            array_filters = [{"item.productId": product_id}]
+        return await self.collection.find_one_and_update(
+            {"userId": user_id},
+            update,
+            projection=CART_PROJECTION,
+            array_filters=array_filters,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def remove_item(self, user_id: str, product_id: str) -> None:
+        await self.collection.update_one(
+            {"userId": user_id},
+            {"$pull": {"items": {"productId": product_id}}, "$set": {"updatedAt": datetime.utcnow()}},
+        )
+
+    async def clear(self, user_id: str) -> None:
+        await self.collection.update_one(
+            {"userId": user_id},
+            {"$set": {"items": [], "updatedAt": datetime.utcnow()}},
+        )
+
+
+class OrderRepository(ABC):
+    """Orders of a user, newest first."""
+
+    @abstractmethod
+    async def place(self, order: Dict[str, Any], quantities: Dict[str, int]) -> Dict[str, Any]:
+        """Price, reserve stock for and store `order`; raises
+        checkout.UnknownProducts / InsufficientStock."""
+
+    @abstractmethod
+    async def list_summaries(self, user_id: str, cursor: Optional[str], limit: int) -> Page:
+        ...
+
+    @abstractmethod
+    async def get(self, user_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+
+class MongoOrderRepository(OrderRepository):
+    def __init__(self, client, db, summary_projection: Dict[str, Any]):
+        self.client = client
+        self.db = db
+        self.summary_projection = summary_projection
+
+    async def place(self, order: Dict[str, Any], quantities: Dict[str, int]) -> Dict[str, Any]:
+        return await place_order(self.client, self.db, order, quantities)
+
+    async def list_summaries(self, user_id: str, cursor: Optional[str], limit: int) -> Page:
+        query = merge_filters({"userId": user_id}, keyset_filter("createdAt", cursor))
+        docs = await self.db.orders.find(query, self.summary_projection).sort(
+            [("createdAt", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        return make_page(docs, "createdAt", limit)
+
+    async def get(self, user_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.orders.find_one({"id": order_id, "userId": user_id})
@@ -0,0 +1,183 @@
+import bisect
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with your you our".split()
+)
+
+# Matches in the product name count for more than matches in the description
+FIELD_WEIGHTS = {"name": 2.0, "description": 1.0}
+
+# Kept per document to filter, sort and facet matches without a database read
+DOC_FIELDS = ("category", "price", "rating", "createdAt")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def stem(token: str) -> str:
+    # Light suffix stripping; applied identically to documents and queries,
+    # so it only needs to be consistent, not linguistically exact.
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith(("ches", "shes", "xes", "zes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        token = token[:-1]
+    if token.endswith("ing") and len(token) > 5:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 4:
+        return token[:-2]
+    if token.endswith("ly") and len(token) > 4:
+        return token[:-2]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [stem(t) for t in _TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS]
+
+
+class SearchIndex:
+    """In-memory inverted index over product name and description, BM25 ranked.
+
+    Documents carry the DOC_FIELDS of the product, so matches can be
+    filtered by category and price, sorted and paged by any list sort, and
+    counted into facets without a database round trip.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def clear(self) -> None:
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._total_len = 0.0
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def add(self, product: Dict[str, Any]) -> None:
+        """Index or re-index a product document."""
+        doc_id = product.get("id") or str(product.get("_id"))
+        if doc_id in self._doc_terms:
+            self.remove(doc_id)
+
+        terms: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(product.get(field)):
+                terms[token] += weight
+        length = sum(terms.values())
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._vocabulary_dirty = True
+            postings[doc_id] = tf
+        self._doc_terms[doc_id] = terms
+        self._doc_len[doc_id] = length
+        self._docs[doc_id] = {"id": doc_id, **{field: product.get(field) for field in DOC_FIELDS}}
+        self._total_len += length
+
+    def add_many(self, products: Iterable[Dict[str, Any]]) -> None:
+        for product in products:
+            self.add(product)
+
+    def remove(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+        self._total_len -= self._doc_len.pop(doc_id)
+        del self._docs[doc_id]
+
+    def documents(self, doc_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """The id and DOC_FIELDS of each indexed product; not to be modified."""
+        return [self._docs[doc_id] for doc_id in doc_ids if doc_id in self._docs]
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        return self._vocabulary[start:end]
+
+    def _matches_filters(self, doc_id, category, min_price, max_price) -> bool:
+        doc = self._docs[doc_id]
+        doc_category, price = doc["category"], doc["price"]
+        if category is not None and doc_category != category:
+            return False
+        if min_price is not None and (price is None or price < min_price):
+            return False
+        if max_price is not None and (price is None or price > max_price):
+            return False
+        return True
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return (product id, score) pairs, best match first.
+
+        The last query token is also treated as a prefix so results follow the
+        user while they are still typing.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self._doc_terms:
+            return []
+
+        query_terms = [[t] for t in tokens]
+        raw_last = _TOKEN_RE.findall(normalize(query))[-1]
+        if raw_last not in STOPWORDS:
+            query_terms[-1] = sorted(set(query_terms[-1] + self._expand_prefix(raw_last)))
+
+        n_docs = len(self._doc_terms)
+        avg_len = self._total_len / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for alternatives in query_terms:
+            for term in alternatives:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = [
+            (doc_id, score)
+            for doc_id, score in scores.items()
+            if self._matches_filters(doc_id, category, min_price, max_price)
+        ]
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked
@@ -1,86 +1,256 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, Response, WebSocket
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.responses import FileResponse, PlainTextResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel
+from typing import Dict, List, Optional
 import uuid
-from datetime import datetime
+from contextlib import asynccontextmanager
 from bson import ObjectId
 
+from admission import AdmissionMiddleware, RouteLimiter, load_rules
+from cache import LRUCache, QueryCache
+from catalog_engine import InMemoryCatalog
+from changes import ChangeFeed, FeedReset, OrdersChanged, ProductsChanged, ReviewsChanged
+from checkout import InsufficientStock, UnknownProducts, merge_lines
+from database import DatabaseSettings, PoolStats
+from etag import CatalogVersion, make_etag, not_modified
+from facets import count_facets
+from images import FORMATS, FileOrigin, HttpOrigin, ImageVariants, OriginError, SourceNotAllowed, VariantCache
+from importer import PARSERS, import_products, iter_file_chunks, iter_lines, parse_ndjson
+from indexes import ensure_indexes, verify_query_plans
+from metrics import CommandMetrics, Metrics, MetricsMiddleware
+from models import (
+    AddToCartRequest,
+    Cart,
+    Order,
+    OrderCreate,
+    OrderSummary,
+    Product,
+    Review,
+    ReviewCreate,
+    ReviewSummary,
+)
+from pagination import InvalidCursor, decode_cursor, encode_cursor, page_in_memory
+from profiler import SlowQueryProfiler
+from push import PushHub
+from ratings import STARS, backfill_rating_aggregates
+from repositories import (
+    MongoCartRepository,
+    MongoOrderRepository,
+    MongoProductRepository,
+    MongoReviewRepository,
+)
+from search import SearchIndex
+from serialization import fast_list_response, list_body, model_projection
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Request and MongoDB command metrics, served on /metrics
+metrics = Metrics()
+
+# Commands slower than SLOW_QUERY_MS are grouped by shape and explained
+slow_queries = SlowQueryProfiler(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', '100')),
+    explain_interval=float(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', '600')),
+    max_explains_per_minute=int(os.environ.get('SLOW_QUERY_EXPLAINS_PER_MINUTE', '10')),
+)
+
+# MongoDB connection; pool and routing settings come from MONGO_* variables.
+# Built at import time because the repositories, the change feed and the
+# importer/indexes/ratings CLIs all hold `db`; creating a Motor client does
+# not connect or bind an event loop, so nothing is done until the lifespan
+# below first uses it, and the lifespan closes it on shutdown.
+db_settings = DatabaseSettings.from_env()
+pool_stats = PoolStats(db_settings.max_pool_size)
+client = AsyncIOMotorClient(
+    db_settings.url,
+    event_listeners=[CommandMetrics(metrics), slow_queries, pool_stats],
+    **db_settings.client_options(),
+)
+db = client[db_settings.name]
+# Review lists may read from secondaries within the staleness bound. Reads
+# tagged with or cached under the catalog version (products, categories,
+# facets, the search index) stay on `db`: a lagging secondary would pin an
+# old result to a new version, or undo an invalidation.
+catalog_db = db.with_options(**db_settings.catalog_options())
+# Carts and orders: primary reads and the configured write concern
+checkout_db = db.with_options(**db_settings.checkout_options())
+
+# Full-text index over product name/description, serves the `search` filter
+search_index = SearchIndex()
+SEARCH_FIELDS = {"_id": 0, "id": 1, "name": 1, "description": 1, "category": 1, "price": 1, "rating": 1, "createdAt": 1}
+
+# Product entity cache keyed by product id; bounded by entry count and TTL
+product_cache = LRUCache(
+    maxsize=int(os.environ.get('PRODUCT_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('PRODUCT_CACHE_TTL', '300')),
+)
+
+# Facet counts per filter combination; dropped whenever the catalog changes
+facet_cache = LRUCache(
+    maxsize=int(os.environ.get('FACET_CACHE_SIZE', '1000')),
+    ttl=float(os.environ.get('FACET_CACHE_TTL', '300')),
+)
+
+# Serialized listing pages and categories keyed by normalized query. Entries
+# carry the catalog version they were built at; after a write they are still
+# served for a few seconds while one background query refreshes them.
+listing_cache = QueryCache(
+    max_bytes=int(float(os.environ.get('LISTING_CACHE_MB', '64')) * 1024 * 1024),
+    ttl=float(os.environ.get('LISTING_CACHE_TTL', '30')),
+    stale_ttl=float(os.environ.get('LISTING_CACHE_STALE_TTL', '5')),
+    sizeof=lambda page: len(page[0]) + len(page[1] or ""),
+)
+
+metrics.register_stats("cache", product_cache, cache="product")
+metrics.register_stats("cache", facet_cache, cache="facet")
+metrics.register_stats("query_cache", listing_cache, cache="listing")
+metrics.register_stats("mongodb_pool", pool_stats)
+
+
+def invalidate_catalog_caches(product_ids: Optional[List[str]] = None):
+    if product_ids is None:
+        product_cache.clear()
+    else:
+        for product_id in product_ids:
+            product_cache.invalidate(product_id)
+    facet_cache.clear()
+
+
+# Change stream over products, reviews and orders; every write, whoever
+# makes it, reaches this process's caches and indexes within milliseconds
+change_feed = ChangeFeed(
+    db,
+    flush_ms=float(os.environ.get('CHANGE_FEED_FLUSH_MS', '10')),
+    save_interval=float(os.environ.get('CHANGE_FEED_SAVE_INTERVAL', '1.0')),
+)
+metrics.register_stats("change_feed", change_feed)
+
+
+async def catalog_changed_elsewhere(product_ids: Optional[List[str]]):
+    # Another worker wrote these products (None: unknown, assume anything).
+    # Only needed when the change feed is not running, e.g. on a standalone server.
+    if change_feed.active:
+        return
+    await product_repo.refresh(product_ids)
+    invalidate_catalog_caches(product_ids)
+
+
+# Shared catalog version; ETags of catalog reads are derived from it
+catalog_version = CatalogVersion(
+    refresh_interval=float(os.environ.get('CATALOG_VERSION_REFRESH', '1.0')),
+    on_change=catalog_changed_elsewhere,
+)
+
+
+async def catalog_changed(*product_ids: str):
+    # Call after any write to products or reviews made by this process;
+    # without ids the whole catalog is treated as changed
+    changed = list(product_ids) if product_ids else None
+    await product_repo.refresh(changed)
+    invalidate_catalog_caches(changed)
+    await catalog_version.bump(db, product_ids)
+
+
+async def catalog_version_key() -> str:
+    return await catalog_version.key(db)
+
+
+async def catalog_etag(request: Request) -> str:
+    return make_etag(await catalog_version_key(), request)
+
+
+async def on_products_changed(event: ProductsChanged):
+    removed = product_repo.apply(event.documents, event.deleted)
+    for product in event.documents:
+        search_index.add(product)
+    # Products deleted under an unknown id stay in the search index; their
+    # ids no longer resolve to products, so they never show up in results
+    for product_id in removed or ():
+        search_index.remove(product_id)
+    invalidate_catalog_caches(event.ids + removed if removed is not None else None)
+
+
+async def on_feed_reset(event: FeedReset):
+    logger.warning("Change feed reset (%s); reloading the catalog", event.reason)
+    invalidate_catalog_caches()
+    await load_catalog()
+
+
+async def on_catalog_changed(event):
+    # Covers writes that did not bump the version, e.g. from the shell
+    await catalog_version.record_change(db, event.at)
+
+
+change_feed.subscribe(ProductsChanged, on_products_changed)
+change_feed.subscribe(ProductsChanged, on_catalog_changed)
+change_feed.subscribe(ReviewsChanged, on_catalog_changed)
+change_feed.subscribe(FeedReset, on_feed_reset)
+change_feed.subscribe(FeedReset, on_catalog_changed)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    slow_queries.attach(client, asyncio.get_running_loop())
+    feed_enabled = os.environ.get('CHANGE_FEED', '1').lower() in ('1', 'true', 'yes')
+    if feed_enabled:
+        # Before loading, so writes made while loading are delivered
+        await change_feed.prepare()
+    # Independent warm-up steps; running them together shortens cold start
+    await asyncio.gather(create_db_indexes(), backfill_ratings_and_load_catalog())
+    if feed_enabled:
+        change_feed.start()
+    push_hub.start()
+    await asyncio.to_thread(image_variants.cache.load)
+    yield
+    await push_hub.stop()
+    await change_feed.stop()
+    await image_variants.origin.close()
+    client.close()
+
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 
-# Define Models
-class Product(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    description: str
-    price: float
-    category: str
-    image: str
-    rating: float = 0.0
-    reviewCount: int = 0
-    stock: int = 100
-    createdAt: datetime = Field(default_factory=datetime.utcnow)
-
-class Review(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    productId: str
-    userId: str = "mock-user"
-    userName: str = "Guest User"
-    rating: int
-    comment: str
-    createdAt: datetime = Field(default_factory=datetime.utcnow)
-
-class ReviewCreate(BaseModel):
-    productId: str
-    rating: int
-    comment: str
-
-class CartItem(BaseModel):
-    productId: str
-    quantity: int
-
-class Cart(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    userId: str = "mock-user"
-    items: List[CartItem] = []
-    updatedAt: datetime = Field(default_factory=datetime.utcnow)
-
-class AddToCartRequest(BaseModel):
-    productId: str
-    quantity: int = 1
-
-class Order(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    userId: str = "mock-user"
-    items: List[dict]
-    total: float
-    status: str = "pending"
-    shippingAddress: dict
-    createdAt: datetime = Field(default_factory=datetime.utcnow)
-
-class OrderCreate(BaseModel):
-    items: List[dict]
-    total: float
-    shippingAddress: dict
+# List endpoints fetch exactly the model fields and skip re-validation
+PRODUCT_PROJECTION = model_projection(Product)
+REVIEW_PROJECTION = model_projection(Review)
+ORDER_SUMMARY_PROJECTION = {
+    **model_projection(OrderSummary),
+    "itemCount": {"$size": {"$ifNull": ["$items", []]}},
+}
+
+
+# Data access goes through repositories. Product reads are served from the
+# in-memory catalog engine unless CATALOG_BACKEND=mongo; it falls back to
+# MongoDB until loaded or when the catalog exceeds CATALOG_MEMORY_MAX_PRODUCTS.
+mongo_product_repo = MongoProductRepository(db.products, PRODUCT_PROJECTION)
+if os.environ.get('CATALOG_BACKEND', 'memory') == 'memory':
+    product_repo = InMemoryCatalog(
+        mongo_product_repo,
+        db.products,
+        Product.model_fields,
+        max_products=int(os.environ.get('CATALOG_MEMORY_MAX_PRODUCTS', '200000')),
+    )
+else:
+    product_repo = mongo_product_repo
+review_repo = MongoReviewRepository(catalog_db.reviews, db.reviews, db.products, REVIEW_PROJECTION)
+cart_repo = MongoCartRepository(checkout_db.carts, Cart)
+order_repo = MongoOrderRepository(client, checkout_db, ORDER_SUMMARY_PROJECTION)
 
 
 # Root endpoint
@@ -92,48 +262,231 @@ async def root():
 # Product endpoints
 @api_router.get("/products", response_model=List[Product])
 async def get_products(
+    request: Request,
     category: Optional[str] = None,
     search: Optional[str] = None,
     minPrice: Optional[float] = None,
     maxPrice: Optional[float] = None,
-    sort: Optional[str] = "createdAt"
+    sort: Optional[str] = "createdAt",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
 ):
-    query = {}
-    if category:
-        query["category"] = category
-    if search:
-        query["name"] = {"$regex": search, "$options": "i"}
-    if minPrice is not None or maxPrice is not None:
-        query["price"] = {}
-        if minPrice is not None:
-            query["price"]["$gte"] = minPrice
-        if maxPrice is not None:
-            query["price"]["$lte"] = maxPrice
-    
-    sort_field = sort if sort in ["price", "rating", "createdAt"] else "createdAt"
-    products = await db.products.find(query).sort(sort_field, -1).to_list(1000)
-    return [Product(**{**product, "id": product.get("id", str(product.get("_id")))}) for product in products]
+    version = await catalog_version_key()
+    cached = not_modified(request, make_etag(version, request))
+    if cached:
+        return cached
+
+    if search and sort == "relevance":
+        sort_field = "relevance"
+    else:
+        sort_field = sort if sort in ["price", "rating", "createdAt"] else "createdAt"
+    search = search or None
+
+    async def load_page():
+        if sort_field == "relevance":
+            products, next_cursor = await search_products_by_relevance(
+                search, category, minPrice, maxPrice, limit, cursor
+            )
+        else:
+            products, next_cursor = await find_products(
+                category, search, minPrice, maxPrice, sort_field, limit, cursor
+            )
+        return list_body(products, Product), next_cursor
+
+    # Identical concurrent requests share one query
+    key = ("products", category or None, search, minPrice, maxPrice, sort_field, limit, cursor)
+    (body, next_cursor), page_version = await listing_cache.get(key, version, load_page)
+    # A stale page keeps the ETag of the version it was built at
+    headers = {"ETag": make_etag(page_version, request)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def find_products(category, search, minPrice, maxPrice, sort_field, limit, cursor):
+    try:
+        if not search:
+            return await product_repo.find(
+                category=category,
+                min_price=minPrice,
+                max_price=maxPrice,
+                sort_field=sort_field,
+                cursor=cursor,
+                limit=limit,
+            )
+        # Matches are filtered, sorted and paged on the search index's copy of
+        # their fields; only the page is fetched, never an $in over every match
+        matches = search_index.search(search, category, minPrice, maxPrice)
+        page, next_cursor = page_in_memory(
+            search_index.documents(doc_id for doc_id, _ in matches), sort_field, cursor, limit
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    by_id = await product_repo.list_by_ids([doc["id"] for doc in page])
+    return [by_id[doc["id"]] for doc in page if doc["id"] in by_id], next_cursor
+
+
+async def search_products_by_relevance(search, category, minPrice, maxPrice, limit, cursor):
+    # Ranking happens in memory, so the cursor is simply an offset into the
+    # ranked list; only the documents of the requested page are fetched.
+    try:
+        offset = int(decode_cursor(cursor, "relevance")[0]) if cursor else 0
+    except (InvalidCursor, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Malformed cursor")
+
+    matches = search_index.search(search, category, minPrice, maxPrice)
+    page_ids = [doc_id for doc_id, _ in matches[offset:offset + limit]]
+    if not page_ids:
+        return [], None
+    next_cursor = None
+    if offset + limit < len(matches):
+        next_cursor = encode_cursor("relevance", {"relevance": offset + limit, "id": page_ids[-1]})
+
+    by_id = await product_repo.list_by_ids(page_ids)
+    return [by_id[doc_id] for doc_id in page_ids if doc_id in by_id], next_cursor
+
+
+@api_router.get("/products/facets")
+async def get_product_facets(
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    minPrice: Optional[float] = None,
+    maxPrice: Optional[float] = None,
+):
+    key = (category, search, minPrice, maxPrice)
+    facets = facet_cache.get(key)
+    if facets is None:
+        if search:
+            # Counted over the search index's copy of the matches
+            matches = search_index.documents(doc_id for doc_id, _ in search_index.search(search))
+            facets = count_facets(matches, category, minPrice, maxPrice)
+        else:
+            facets = await product_repo.facets(None, category, minPrice, maxPrice)
+        facet_cache.set(key, facets)
+    return facets
+
+
+MAX_BATCH_IDS = 250
+
+
+class ProductBatch(BaseModel):
+    products: Dict[str, Product]
+    missing: List[str]
+
+
+async def get_products_by_ids(product_ids: List[str]) -> Dict[str, dict]:
+    # Serve what we can from the product cache, then one $in query for the rest
+    found = {}
+    misses = []
+    for product_id in product_ids:
+        product = product_cache.get(product_id)
+        if product is None:
+            misses.append(product_id)
+        else:
+            found[product_id] = product
+    if misses:
+        for product_id, product in (await product_repo.get_many(misses)).items():
+            product_cache.set(product_id, product)
+            found[product_id] = product
+    return found
+
+
+@api_router.get("/products/batch", response_model=ProductBatch)
+async def get_products_batch(ids: List[str] = Query(...)):
+    # Accept both ?ids=a,b and ?ids=a&ids=b
+    product_ids = list(dict.fromkeys(i for value in ids for i in value.split(",") if i))
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    found = await get_products_by_ids(product_ids)
+    return {
+        "products": {product_id: found[product_id] for product_id in product_ids if product_id in found},
+        "missing": [product_id for product_id in product_ids if product_id not in found],
+    }
 
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
-    product = await db.products.find_one({"id": product_id})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return Product(**{**product, "id": product.get("id", str(product.get("_id")))})
+async def get_product(product_id: str, request: Request, response: Response):
+    etag = await catalog_etag(request)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+
+    return Product(**await load_product(product_id))
+
+
+async def load_product(product_id: str) -> dict:
+    product = product_cache.get(product_id)
+    if product is None:
+        product = await product_repo.get(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        product_cache.set(product_id, product)
+    return product
 
 
 @api_router.get("/categories")
-async def get_categories():
-    categories = await db.products.distinct("category")
-    return {"categories": categories}
+async def get_categories(request: Request):
+    version = await catalog_version_key()
+    cached = not_modified(request, make_etag(version, request))
+    if cached:
+        return cached
+
+    async def load_categories():
+        return ORJSONResponse({"categories": await product_repo.categories()}).body, None
+
+    (body, _), body_version = await listing_cache.get(("categories",), version, load_categories)
+    return Response(body, media_type="application/json", headers={"ETag": make_etag(body_version, request)})
 
 
 # Review endpoints
 @api_router.get("/reviews/{product_id}", response_model=List[Review])
-async def get_reviews(product_id: str):
-    reviews = await db.reviews.find({"productId": product_id}).sort("createdAt", -1).to_list(1000)
-    return [Review(**review) for review in reviews]
+async def get_reviews(
+    product_id: str,
+    request: Request,
+    sort: Optional[str] = "createdAt",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    sort_field = sort if sort in ["createdAt", "rating"] else "createdAt"
+    async with review_repo.session() as session:
+        # The product's review version is read from the primary, so a
+        # matching If-None-Match is answered without querying the reviews
+        etag = make_etag(await review_repo.version(product_id, session), request)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        try:
+            # May be served by a secondary, never one behind that version
+            reviews, next_cursor = await review_repo.list(product_id, sort_field, cursor, limit, session)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    response = fast_list_response(reviews, Review)
+    response.headers["ETag"] = etag
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+@api_router.get("/reviews/{product_id}/summary", response_model=ReviewSummary)
+async def get_review_summary(product_id: str, request: Request, response: Response):
+    etag = await catalog_etag(request)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+
+    # Read from the aggregate maintained on the product by create_review
+    product = await load_product(product_id)
+    count = product.get("reviewCount", 0)
+    histogram = product.get("ratingHistogram") or {}
+    return {
+        "productId": product_id,
+        "average": round(product.get("ratingSum", 0) / count, 2) if count else 0.0,
+        "count": count,
+        "histogram": {star: histogram.get(star, 0) for star in STARS},
+    }
 
 
 @api_router.post("/reviews", response_model=Review)
@@ -144,340 +497,289 @@ async def create_review(review: ReviewCreate):
         comment=review.comment,
         userName="Guest User"
     )
-    await db.reviews.insert_one(review_obj.dict())
-    
-    # Update product rating
-    reviews = await db.reviews.find({"productId": review.productId}).to_list(1000)
-    avg_rating = sum(r["rating"] for r in reviews) / len(reviews)
-    await db.products.update_one(
-        {"id": review.productId},
-        {"$set": {"rating": round(avg_rating, 1), "reviewCount": len(reviews)}}
-    )
+    await review_repo.add(review_obj.dict())
+    await catalog_changed(review.productId)
     
     return review_obj
 
 
 # Cart endpoints
+@api_router.get("/cart/view")
+async def get_cart_view(userId: str = "mock-user"):
+    return await cart_repo.view(userId)
+
+
 @api_router.get("/cart")
 async def get_cart(userId: str = "mock-user"):
-    cart = await db.carts.find_one({"userId": userId}, {"_id": 0})
-    if not cart:
-        cart = Cart(userId=userId).dict()
-        await db.carts.insert_one(cart)
-        cart = await db.carts.find_one({"userId": userId}, {"_id": 0})
-    return cart
+    return await cart_repo.get(userId)
 
 
 @api_router.post("/cart/add")
 async def add_to_cart(request: AddToCartRequest, userId: str = "mock-user"):
-    cart = await db.carts.find_one({"userId": userId}, {"_id": 0})
-    if not cart:
-        cart = Cart(userId=userId).dict()
-        await db.carts.insert_one(cart)
-        cart = await db.carts.find_one({"userId": userId}, {"_id": 0})
-    
-    items = cart.get("items", [])
-    existing_item = next((item for item in items if item["productId"] == request.productId), None)
-    
-    if existing_item:
-        existing_item["quantity"] += request.quantity
-    else:
-        items.append({"productId": request.productId, "quantity": request.quantity})
-    
-    await db.carts.update_one(
-        {"userId": userId},
-        {"$set": {"items": items, "updatedAt": datetime.utcnow()}}
-    )
-    
-    return {"message": "Added to cart", "items": items}
+    cart = await cart_repo.add_item(userId, request.productId, request.quantity)
+    return {"message": "Added to cart", "items": cart["items"]}
 
 
 @api_router.post("/cart/update")
 async def update_cart_item(request: AddToCartRequest, userId: str = "mock-user"):
-    cart = await db.carts.find_one({"userId": userId}, {"_id": 0})
+    cart = await cart_repo.set_quantity(userId, request.productId, request.quantity)
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     
-    items = cart.get("items", [])
-    existing_item = next((item for item in items if item["productId"] == request.productId), None)
-    
-    if existing_item:
-        if request.quantity <= 0:
-            items.remove(existing_item)
-        else:
-            existing_item["quantity"] = request.quantity
-    
-    await db.carts.update_one(
-        {"userId": userId},
-        {"$set": {"items": items, "updatedAt": datetime.utcnow()}}
-    )
-    
-    return {"message": "Cart updated", "items": items}
+    return {"message": "Cart updated", "items": cart["items"]}
 
 
 @api_router.delete("/cart/remove/{product_id}")
 async def remove_from_cart(product_id: str, userId: str = "mock-user"):
-    cart = await db.carts.find_one({"userId": userId}, {"_id": 0})
-    if cart:
-        items = [item for item in cart.get("items", []) if item["productId"] != product_id]
-        await db.carts.update_one(
-            {"userId": userId},
-            {"$set": {"items": items, "updatedAt": datetime.utcnow()}}
-        )
+    await cart_repo.remove_item(userId, product_id)
     return {"message": "Removed from cart"}
 
 
 @api_router.delete("/cart/clear")
 async def clear_cart(userId: str = "mock-user"):
-    await db.carts.update_one(
-        {"userId": userId},
-        {"$set": {"items": [], "updatedAt": datetime.utcnow()}}
-    )
+    await cart_repo.clear(userId)
     return {"message": "Cart cleared"}
 
 
 # Order endpoints
 @api_router.post("/orders", response_model=Order)
 async def create_order(order: OrderCreate, userId: str = "mock-user"):
+    try:
+        quantities = merge_lines(order.items)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if not quantities:
+        raise HTTPException(status_code=400, detail="Order has no items")
+
     order_obj = Order(
         userId=userId,
-        items=order.items,
-        total=order.total,
+        items=[],
+        total=0,
         shippingAddress=order.shippingAddress,
         status="confirmed"
     )
-    await db.orders.insert_one(order_obj.dict())
-    
-    # Clear cart after order
-    await db.carts.update_one(
-        {"userId": userId},
-        {"$set": {"items": [], "updatedAt": datetime.utcnow()}}
-    )
-    
-    return order_obj
-
+    try:
+        placed = await order_repo.place(order_obj.dict(), quantities)
+    except UnknownProducts as exc:
+        raise HTTPException(status_code=400, detail={"message": str(exc), "productIds": exc.product_ids})
+    except InsufficientStock as exc:
+        raise HTTPException(status_code=409, detail={"message": str(exc), "productIds": exc.product_ids})
+
+    # Stock changed on every ordered product
+    await catalog_changed(*quantities)
+    return placed
+
+
+@api_router.get("/orders", response_model=List[OrderSummary])
+async def get_orders(
+    userId: str = "mock-user",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    # Summaries only; full items and shipping address come from get_order
+    try:
+        orders, next_cursor = await order_repo.list_summaries(userId, cursor, limit)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
-@api_router.get("/orders", response_model=List[Order])
-async def get_orders(userId: str = "mock-user"):
-    orders = await db.orders.find({"userId": userId}).sort("createdAt", -1).to_list(1000)
-    return [Order(**order) for order in orders]
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return fast_list_response(orders, OrderSummary, headers)
 
 
 @api_router.get("/orders/{order_id}", response_model=Order)
 async def get_order(order_id: str, userId: str = "mock-user"):
-    order = await db.orders.find_one({"id": order_id, "userId": userId})
+    order = await order_repo.get(userId, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return Order(**order)
 
 
+# Push channel: order status and watched-product price/stock changes over
+# a WebSocket, fed by the change feed instead of client polling
+push_hub = PushHub(
+    get_products_by_ids,
+    low_stock=int(os.environ.get('LOW_STOCK_THRESHOLD', '5')),
+    max_watched=int(os.environ.get('PUSH_MAX_WATCHED', '100')),
+    heartbeat_interval=float(os.environ.get('PUSH_HEARTBEAT_INTERVAL', '25')),
+)
+change_feed.subscribe(ProductsChanged, push_hub.on_products_changed)
+change_feed.subscribe(OrdersChanged, push_hub.on_orders_changed)
+metrics.register_stats("push", push_hub)
+
+
+@api_router.websocket("/push")
+async def push_updates(websocket: WebSocket, userId: str = "mock-user"):
+    await push_hub.serve(websocket, userId)
+
+
+# Resized product images. Sources come from IMAGE_ORIGIN_HOSTS over HTTP,
+# or from files in IMAGE_ORIGIN_DIR when set (local development, tests).
+if os.environ.get('IMAGE_ORIGIN_DIR'):
+    image_origin = FileOrigin(Path(os.environ['IMAGE_ORIGIN_DIR']))
+else:
+    image_origin = HttpOrigin(
+        os.environ.get('IMAGE_ORIGIN_HOSTS', 'images.unsplash.com,images.pexels.com').split(','),
+    )
+image_variants = ImageVariants(
+    image_origin,
+    VariantCache(
+        Path(os.environ.get('IMAGE_CACHE_DIR', ROOT_DIR / 'image_cache')),
+        max_bytes=int(float(os.environ.get('IMAGE_CACHE_MB', '1024')) * 1024 * 1024),
+    ),
+    max_concurrent_renders=int(os.environ.get('IMAGE_RENDER_CONCURRENCY', '2')),
+)
+metrics.register_stats("images", image_variants)
+
+
+@api_router.get("/images")
+async def get_image(
+    request: Request,
+    url: str,
+    w: int = Query(320, ge=1, le=4096),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+):
+    # Without an explicit format, WebP for clients that accept it
+    fmt = format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")
+    try:
+        path = await image_variants.variant(url, w, fmt)
+    except SourceNotAllowed as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except OriginError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+
+    # Variant names are content digests, so the bytes behind a URL never change
+    etag = f'"{path.stem}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if format is None:
+        headers["Vary"] = "Accept"
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=FORMATS[fmt][1], headers=headers)
+
+
+# Catalog import
+IMPORT_DIR = Path(os.environ.get('IMPORT_DIR', ROOT_DIR / 'imports'))
+MOCK_PRODUCTS = ROOT_DIR / 'data' / 'mock_products.ndjson'
+
+
+async def index_imported_products(products: List[dict]):
+    # Index what was stored: an upsert keeps fields the input left out
+    ids = [product["id"] for product in products]
+    stored = await db.products.find({"id": {"$in": ids}}, SEARCH_FIELDS).to_list(len(ids))
+    search_index.add_many(stored)
+    for product_id in ids:
+        product_cache.invalidate(product_id)
+
+
+@api_router.post("/products/import")
+async def import_catalog(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    mode: str = Query("upsert", pattern="^(upsert|insert)$"),
+    importId: Optional[str] = Query(None, pattern="^[A-Za-z0-9_-]{1,64}$"),
+):
+    # The request body is streamed; re-send it with the same importId to
+    # resume an interrupted import after the last committed batch
+    import_id = importId or str(uuid.uuid4())
+    IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    rejects_path = IMPORT_DIR / f"{import_id}.rejects.ndjson"
+    with open(rejects_path, "a") as rejects:
+        stats = await import_products(
+            db,
+            PARSERS[format](iter_lines(request.stream())),
+            Product,
+            mode=mode,
+            import_id=import_id,
+            rejects=rejects,
+            on_batch=index_imported_products,
+        )
+    await catalog_changed()
+    return {
+        "importId": import_id,
+        **stats.as_dict(),
+        "rejectsFile": str(rejects_path) if stats.rejected else None,
+    }
+
+
 # Initialize mock data
 @api_router.post("/init-data")
 async def init_mock_data():
     # Check if data already exists
-    existing_products = await db.products.count_documents({})
+    existing_products = await product_repo.count()
     if existing_products > 0:
         return {"message": "Data already initialized"}
     
     # Mock products with stock images
-    products = [
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Premium Laptop",
-            "description": "High-performance laptop with latest processor and stunning display. Perfect for work and entertainment.",
-            "price": 1299.99,
-            "category": "Electronics",
-            "image": "https://images.unsplash.com/photo-1691073121676-1ab3a6d3d743",
-            "rating": 4.5,
-            "reviewCount": 0,
-            "stock": 50,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Wireless Earbuds",
-            "description": "Crystal clear sound with active noise cancellation. Long battery life and comfortable fit.",
-            "price": 149.99,
-            "category": "Electronics",
-            "image": "https://images.unsplash.com/photo-1717996563514-e3519f9ef9f7",
-            "rating": 4.3,
-            "reviewCount": 0,
-            "stock": 100,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Smart Watch",
-            "description": "Track your fitness, receive notifications, and stay connected on the go.",
-            "price": 299.99,
-            "category": "Electronics",
-            "image": "https://images.pexels.com/photos/10185544/pexels-photo-10185544.jpeg",
-            "rating": 4.6,
-            "reviewCount": 0,
-            "stock": 75,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Designer T-Shirt",
-            "description": "Premium quality cotton t-shirt with modern design. Comfortable and stylish.",
-            "price": 39.99,
-            "category": "Fashion",
-            "image": "https://images.unsplash.com/photo-1532453288672-3a27e9be9efd",
-            "rating": 4.4,
-            "reviewCount": 0,
-            "stock": 200,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Running Shoes",
-            "description": "Lightweight and comfortable running shoes with excellent cushioning and support.",
-            "price": 89.99,
-            "category": "Fashion",
-            "image": "https://images.unsplash.com/photo-1567401893414-76b7b1e5a7a5",
-            "rating": 4.7,
-            "reviewCount": 0,
-            "stock": 150,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Casual Jacket",
-            "description": "Stylish casual jacket perfect for any season. Durable and comfortable.",
-            "price": 129.99,
-            "category": "Fashion",
-            "image": "https://images.unsplash.com/photo-1441984904996-e0b6ba687e04",
-            "rating": 4.5,
-            "reviewCount": 0,
-            "stock": 80,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Modern Sofa",
-            "description": "Comfortable and stylish sofa perfect for any living room. Premium upholstery.",
-            "price": 899.99,
-            "category": "Home",
-            "image": "https://images.unsplash.com/photo-1616046229478-9901c5536a45",
-            "rating": 4.8,
-            "reviewCount": 0,
-            "stock": 25,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Table Lamp",
-            "description": "Elegant table lamp with adjustable brightness. Perfect for reading and ambiance.",
-            "price": 49.99,
-            "category": "Home",
-            "image": "https://images.unsplash.com/photo-1618220179428-22790b461013",
-            "rating": 4.2,
-            "reviewCount": 0,
-            "stock": 100,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Wall Art Set",
-            "description": "Beautiful set of wall art to decorate your home. Modern and elegant design.",
-            "price": 79.99,
-            "category": "Home",
-            "image": "https://images.unsplash.com/photo-1572048572872-2394404cf1f3",
-            "rating": 4.4,
-            "reviewCount": 0,
-            "stock": 60,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Coffee Maker",
-            "description": "Programmable coffee maker with thermal carafe. Brew perfect coffee every time.",
-            "price": 79.99,
-            "category": "Kitchen",
-            "image": "https://images.pexels.com/photos/35348456/pexels-photo-35348456.jpeg",
-            "rating": 4.5,
-            "reviewCount": 0,
-            "stock": 90,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Blender Pro",
-            "description": "Powerful blender for smoothies, soups, and more. Multiple speed settings.",
-            "price": 129.99,
-            "category": "Kitchen",
-            "image": "https://images.unsplash.com/photo-1586898633445-fc34716255b2",
-            "rating": 4.6,
-            "reviewCount": 0,
-            "stock": 70,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Yoga Mat",
-            "description": "Non-slip yoga mat with extra cushioning. Perfect for all types of workouts.",
-            "price": 29.99,
-            "category": "Sports",
-            "image": "https://images.pexels.com/photos/3393705/pexels-photo-3393705.jpeg",
-            "rating": 4.3,
-            "reviewCount": 0,
-            "stock": 120,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Dumbbell Set",
-            "description": "Adjustable dumbbell set for home workouts. Multiple weight options.",
-            "price": 199.99,
-            "category": "Sports",
-            "image": "https://images.unsplash.com/photo-1768987439370-bd60d3d0b28b",
-            "rating": 4.7,
-            "reviewCount": 0,
-            "stock": 45,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Backpack",
-            "description": "Spacious and durable backpack with laptop compartment. Perfect for travel and work.",
-            "price": 59.99,
-            "category": "Accessories",
-            "image": "https://images.pexels.com/photos/7289716/pexels-photo-7289716.jpeg",
-            "rating": 4.4,
-            "reviewCount": 0,
-            "stock": 110,
-            "createdAt": datetime.utcnow()
-        },
-        {
-            "id": str(uuid.uuid4()),
-            "name": "Sunglasses",
-            "description": "Stylish sunglasses with UV protection. Classic design that never goes out of style.",
-            "price": 89.99,
-            "category": "Accessories",
-            "image": "https://images.pexels.com/photos/7289741/pexels-photo-7289741.jpeg",
-            "rating": 4.5,
-            "reviewCount": 0,
-            "stock": 95,
-            "createdAt": datetime.utcnow()
-        }
-    ]
-    
-    await db.products.insert_many(products)
-    return {"message": "Mock data initialized successfully", "products_count": len(products)}
+    stats = await import_products(
+        db,
+        parse_ndjson(iter_lines(iter_file_chunks(MOCK_PRODUCTS))),
+        Product,
+        mode="insert",
+        on_batch=index_imported_products,
+    )
+    await catalog_changed()
+    return {"message": "Mock data initialized successfully", "products_count": stats.inserted}
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/slow-queries", include_in_schema=False)
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("totalMs", pattern="^(totalMs|count|maxMs|avgMs|examinedPerReturned)$"),
+):
+    return {"thresholdMs": slow_queries.threshold_micros / 1000, "shapes": slow_queries.report(limit, sort)}
+
+
+# Per-user/IP rate limits and per-route concurrency limits; innermost, so
+# 429/503 responses still get CORS headers and show up in the metrics.
+# Defaults are in admission.DEFAULT_RULES, overridden by ADMISSION_RULES.
+# IP limits key on the peer address. Behind an ingress or load balancer
+# that is the proxy, so every client would share one bucket: set
+# TRUST_FORWARDED_FOR=1 there (and only there, since clients can forge the
+# header when nothing in front overwrites it). ADMISSION_CONTROL=0 turns
+# the limits off, e.g. for capacity benchmarks.
+admission_limiters = [RouteLimiter(rule) for rule in load_rules()]
+for limiter in admission_limiters:
+    metrics.register_stats("admission", limiter, rule=limiter.rule.name)
+if os.environ.get('ADMISSION_CONTROL', '1').lower() in ('1', 'true', 'yes'):
+    app.add_middleware(
+        AdmissionMiddleware,
+        limiters=admission_limiters,
+        trust_forwarded=os.environ.get('TRUST_FORWARDED_FOR', '').lower() in ('1', 'true', 'yes'),
+    )
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=False,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+class ListGZipMiddleware(GZipMiddleware):
+    # Images are compressed already; gzipping them only burns CPU
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/images"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress large list bodies for clients that accept gzip
+app.add_middleware(ListGZipMiddleware, minimum_size=1024)
+
+# Outermost, so latency includes compression and the other middleware
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -485,6 +787,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def create_db_indexes():
+    await ensure_indexes(db)
+    # Opt-in self-check: refuse to start if any router query shape COLLSCANs
+    if os.environ.get('INDEX_SELF_CHECK', '').lower() in ('1', 'true', 'yes'):
+        await verify_query_plans(db)
+
+async def load_catalog():
+    await product_repo.load()
+    await build_search_index()
+
+async def backfill_ratings_and_load_catalog():
+    # Products from before rating aggregates existed get them before they are
+    # loaded and cached; a no-op once every product has one
+    updated = await backfill_rating_aggregates(db)
+    if updated:
+        await catalog_version.bump(db)
+    await load_catalog()
+
+async def build_search_index():
+    search_index.clear()
+    async for product in product_repo.scan(SEARCH_FIELDS):
+        search_index.add(product)
+    logger.info("Search index built over %d products", len(search_index))
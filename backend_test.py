@@ -405,9 +405,9 @@ class ECommerceAPITester:
                 }
             }
             response = self.make_request("POST", "/orders", json=order_payload)
-            # This should still work as the API doesn't validate empty orders
-            if response.status_code == 200:
-                self.log_test("Empty cart checkout", True, "Empty order created (no validation)")
+            # Orders without items are rejected at checkout
+            if response.status_code == 400:
+                self.log_test("Empty cart checkout", True, "Empty order rejected")
             else:
                 self.log_test("Empty cart checkout", False, f"Status: {response.status_code}")
         except Exception as e:
@@ -13,7 +13,7 @@ import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import CartItemCard from '../../components/CartItemCard';
 import { useCartStore } from '../../store/cartStore';
-import { getCart, updateCartItem, removeFromCart, getProduct } from '../../utils/api';
+import { getCartView, updateCartItem, removeFromCart } from '../../utils/api';
 import { Product } from '../../types';
 
 export default function CartScreen() {
@@ -29,28 +29,10 @@ export default function CartScreen() {
   const loadCart = async () => {
     try {
       setLoading(true);
-      const cart = await getCart();
-      setItems(cart.items || []);
-      
-      // Load product details for each cart item
-      const itemsWithDetails = await Promise.all(
-        (cart.items || []).map(async (item: any) => {
-          try {
-            const product = await getProduct(item.productId);
-            return {
-              ...item,
-              name: product.name,
-              price: product.price,
-              image: product.image,
-            };
-          } catch (error) {
-            console.error('Error loading product:', error);
-            return null;
-          }
-        })
-      );
-      
-      setCartItems(itemsWithDetails.filter(Boolean));
+      // Cart lines come back already joined to their products
+      const cart = await getCartView();
+      setItems(cart.items.map((item: any) => ({ productId: item.productId, quantity: item.quantity })));
+      setCartItems(cart.items.filter((item: any) => !item.missing));
     } catch (error) {
       console.error('Error loading cart:', error);
     } finally {
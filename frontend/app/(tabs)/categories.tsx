@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -12,6 +12,7 @@ import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import ProductCard from '../../components/ProductCard';
 import { getCategories, getProducts } from '../../utils/api';
+import { isNearEnd } from '../../utils/paging';
 import { Product } from '../../types';
 
 export default function CategoriesScreen() {
@@ -20,6 +21,11 @@ export default function CategoriesScreen() {
   const [selectedCategory, setSelectedCategory] = useState<string | null>(null);
   const [products, setProducts] = useState<Product[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Category on screen; pages fetched for another one are dropped
+  const shownCategory = useRef<string | null>(null);
+  const fetchingMore = useRef(false);
 
   useEffect(() => {
     loadCategories();
@@ -48,8 +54,11 @@ export default function CategoriesScreen() {
   const loadProductsByCategory = async (category: string) => {
     try {
       setLoading(true);
-      const data = await getProducts({ category });
-      setProducts(data);
+      shownCategory.current = category;
+      const page = await getProducts({ category });
+      if (shownCategory.current !== category) return;
+      setProducts(page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error loading products:', error);
     } finally {
@@ -57,6 +66,24 @@ export default function CategoriesScreen() {
     }
   };
 
+  const loadMore = async () => {
+    const category = shownCategory.current;
+    if (!category || !nextCursor || fetchingMore.current) return;
+    fetchingMore.current = true;
+    setLoadingMore(true);
+    try {
+      const page = await getProducts({ category, cursor: nextCursor });
+      if (shownCategory.current !== category) return;
+      setProducts((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more products:', error);
+    } finally {
+      fetchingMore.current = false;
+      setLoadingMore(false);
+    }
+  };
+
   const getCategoryIcon = (category: string) => {
     const icons: { [key: string]: any } = {
       Electronics: 'phone-portrait',
@@ -110,7 +137,11 @@ export default function CategoriesScreen() {
           <ActivityIndicator size="large" color="#FF6B35" />
         </View>
       ) : (
-        <ScrollView style={styles.scrollView}>
+        <ScrollView
+          style={styles.scrollView}
+          onScroll={({ nativeEvent }) => isNearEnd(nativeEvent) && loadMore()}
+          scrollEventThrottle={200}
+        >
           <View style={styles.productsGrid}>
             {products.map((product) => (
               <ProductCard
@@ -126,6 +157,7 @@ export default function CategoriesScreen() {
               <Text style={styles.emptyText}>No products in this category</Text>
             </View>
           )}
+          {loadingMore && <ActivityIndicator style={styles.loadingMore} color="#FF6B35" />}
         </ScrollView>
       )}
     </SafeAreaView>
@@ -200,4 +232,7 @@ const styles = StyleSheet.create({
     fontSize: 16,
     color: '#999',
   },
+  loadingMore: {
+    paddingBottom: 24,
+  },
 });
\ No newline at end of file
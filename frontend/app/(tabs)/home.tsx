@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -13,7 +13,8 @@ import { SafeAreaView } from 'react-native-safe-area-context';
 import { Ionicons } from '@expo/vector-icons';
 import { useRouter } from 'expo-router';
 import ProductCard from '../../components/ProductCard';
-import { getProducts } from '../../utils/api';
+import { getProducts, ProductQuery } from '../../utils/api';
+import { isNearEnd } from '../../utils/paging';
 import { Product } from '../../types';
 
 export default function HomeScreen() {
@@ -22,17 +23,33 @@ export default function HomeScreen() {
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
-  const [selectedSort, setSelectedSort] = useState<'createdAt' | 'price' | 'rating'>('createdAt');
+  // The submitted search; the server filters and ranks by it
+  const [activeSearch, setActiveSearch] = useState('');
+  const [selectedSort, setSelectedSort] = useState<'relevance' | 'createdAt' | 'price' | 'rating'>('createdAt');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Params of the list on screen; pages fetched for older params are dropped
+  const query = useRef<ProductQuery>({});
+  const fetchingMore = useRef(false);
 
   useEffect(() => {
     loadProducts();
-  }, [selectedSort]);
+  }, [selectedSort, activeSearch]);
+
+  const showFirstPage = async (params: ProductQuery) => {
+    query.current = params;
+    const page = await getProducts(params);
+    if (query.current !== params) return;
+    setProducts(page.items);
+    setNextCursor(page.nextCursor);
+  };
 
   const loadProducts = async () => {
     try {
       setLoading(true);
-      const data = await getProducts({ sort: selectedSort });
-      setProducts(data);
+      await showFirstPage(
+        activeSearch ? { search: activeSearch, sort: selectedSort } : { sort: selectedSort }
+      );
     } catch (error) {
       console.error('Error loading products:', error);
     } finally {
@@ -46,26 +63,42 @@ export default function HomeScreen() {
     setRefreshing(false);
   };
 
-  const handleSearch = async () => {
-    if (!searchQuery.trim()) {
-      loadProducts();
+  const handleSearch = () => {
+    const search = searchQuery.trim();
+    if (!search) {
+      clearSearch();
       return;
     }
+    setActiveSearch(search);
+    setSelectedSort('relevance');
+  };
+
+  const clearSearch = () => {
+    setSearchQuery('');
+    setActiveSearch('');
+    if (selectedSort === 'relevance') {
+      setSelectedSort('createdAt');
+    }
+  };
+
+  const loadMore = async () => {
+    if (!nextCursor || fetchingMore.current) return;
+    const params = query.current;
+    fetchingMore.current = true;
+    setLoadingMore(true);
     try {
-      setLoading(true);
-      const data = await getProducts({ search: searchQuery, sort: selectedSort });
-      setProducts(data);
+      const page = await getProducts({ ...params, cursor: nextCursor });
+      if (query.current !== params) return;
+      setProducts((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
     } catch (error) {
-      console.error('Error searching products:', error);
+      console.error('Error loading more products:', error);
     } finally {
-      setLoading(false);
+      fetchingMore.current = false;
+      setLoadingMore(false);
     }
   };
 
-  const filteredProducts = searchQuery
-    ? products.filter((p) => p.name.toLowerCase().includes(searchQuery.toLowerCase()))
-    : products;
-
   return (
     <SafeAreaView style={styles.container} edges={['bottom']}>
       <View style={styles.searchContainer}>
@@ -79,10 +112,7 @@ export default function HomeScreen() {
             onSubmitEditing={handleSearch}
           />
           {searchQuery.length > 0 && (
-            <TouchableOpacity onPress={() => {
-              setSearchQuery('');
-              loadProducts();
-            }}>
+            <TouchableOpacity onPress={clearSearch}>
               <Ionicons name="close-circle" size={20} color="#999" />
             </TouchableOpacity>
           )}
@@ -91,6 +121,16 @@ export default function HomeScreen() {
 
       <View style={styles.filterContainer}>
         <ScrollView horizontal showsHorizontalScrollIndicator={false}>
+          {activeSearch.length > 0 && (
+            <TouchableOpacity
+              style={[styles.filterChip, selectedSort === 'relevance' && styles.filterChipActive]}
+              onPress={() => setSelectedSort('relevance')}
+            >
+              <Text style={[styles.filterText, selectedSort === 'relevance' && styles.filterTextActive]}>
+                Best Match
+              </Text>
+            </TouchableOpacity>
+          )}
           <TouchableOpacity
             style={[styles.filterChip, selectedSort === 'createdAt' && styles.filterChipActive]}
             onPress={() => setSelectedSort('createdAt')}
@@ -126,9 +166,11 @@ export default function HomeScreen() {
         <ScrollView
           style={styles.scrollView}
           refreshControl={<RefreshControl refreshing={refreshing} onRefresh={onRefresh} />}
+          onScroll={({ nativeEvent }) => isNearEnd(nativeEvent) && loadMore()}
+          scrollEventThrottle={200}
         >
           <View style={styles.productsGrid}>
-            {filteredProducts.map((product) => (
+            {products.map((product) => (
               <ProductCard
                 key={product.id}
                 product={product}
@@ -136,12 +178,13 @@ export default function HomeScreen() {
               />
             ))}
           </View>
-          {filteredProducts.length === 0 && (
+          {products.length === 0 && (
             <View style={styles.emptyContainer}>
               <Ionicons name="search" size={64} color="#CCC" />
               <Text style={styles.emptyText}>No products found</Text>
             </View>
           )}
+          {loadingMore && <ActivityIndicator style={styles.loadingMore} color="#FF6B35" />}
         </ScrollView>
       )}
     </SafeAreaView>
@@ -217,4 +260,7 @@ const styles = StyleSheet.create({
     fontSize: 16,
     color: '#999',
   },
+  loadingMore: {
+    paddingBottom: 24,
+  },
 });
\ No newline at end of file
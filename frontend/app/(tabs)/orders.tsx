@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
   View,
   Text,
@@ -12,23 +12,46 @@ import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import OrderCard from '../../components/OrderCard';
 import { getOrders } from '../../utils/api';
-import { Order } from '../../types';
+import { isNearEnd } from '../../utils/paging';
+import { subscribeOrders } from '../../utils/push';
+import { OrderSummary } from '../../types';
 
 export default function OrdersScreen() {
   const router = useRouter();
-  const [orders, setOrders] = useState<Order[]>([]);
+  const [orders, setOrders] = useState<OrderSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [refreshing, setRefreshing] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Bumped on every reload so a page fetched for the old list is dropped
+  const generation = useRef(0);
+  const fetchingMore = useRef(false);
 
   useEffect(() => {
     loadOrders();
   }, []);
 
+  // Status changes and new orders are pushed; no need to poll
+  useEffect(
+    () =>
+      subscribeOrders((update) => {
+        setOrders((current) =>
+          current.some((order) => order.id === update.id)
+            ? current.map((order) => (order.id === update.id ? { ...order, ...update } : order))
+            : [update, ...current]
+        );
+      }),
+    []
+  );
+
   const loadOrders = async () => {
     try {
       setLoading(true);
-      const data = await getOrders();
-      setOrders(data);
+      const current = ++generation.current;
+      const page = await getOrders();
+      if (generation.current !== current) return;
+      setOrders(page.items);
+      setNextCursor(page.nextCursor);
     } catch (error) {
       console.error('Error loading orders:', error);
     } finally {
@@ -36,6 +59,28 @@ export default function OrdersScreen() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor || fetchingMore.current) return;
+    const current = generation.current;
+    fetchingMore.current = true;
+    setLoadingMore(true);
+    try {
+      const page = await getOrders({ cursor: nextCursor });
+      if (generation.current !== current) return;
+      // A pushed update may already have added an order from this page
+      setOrders((prev) => [
+        ...prev,
+        ...page.items.filter((order) => !prev.some((seen) => seen.id === order.id)),
+      ]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more orders:', error);
+    } finally {
+      fetchingMore.current = false;
+      setLoadingMore(false);
+    }
+  };
+
   const onRefresh = async () => {
     setRefreshing(true);
     await loadOrders();
@@ -70,10 +115,13 @@ export default function OrdersScreen() {
         style={styles.scrollView}
         contentContainerStyle={styles.scrollContent}
         refreshControl={<RefreshControl refreshing={refreshing} onRefresh={onRefresh} />}
+        onScroll={({ nativeEvent }) => isNearEnd(nativeEvent) && loadMore()}
+        scrollEventThrottle={200}
       >
         {orders.map((order) => (
           <OrderCard key={order.id} order={order} onPress={() => router.push(`/order/${order.id}`)} />
         ))}
+        {loadingMore && <ActivityIndicator style={styles.loadingMore} color="#FF6B35" />}
       </ScrollView>
     </SafeAreaView>
   );
@@ -112,4 +160,7 @@ const styles = StyleSheet.create({
     fontSize: 16,
     color: '#999',
   },
+  loadingMore: {
+    paddingVertical: 16,
+  },
 });
\ No newline at end of file
@@ -15,7 +15,7 @@ import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { useCartStore } from '../store/cartStore';
-import { getCart, createOrder, getProduct } from '../utils/api';
+import { getCart, createOrder, getProductsBatch } from '../utils/api';
 
 export default function CheckoutScreen() {
   const router = useRouter();
@@ -41,24 +41,24 @@ export default function CheckoutScreen() {
       setLoading(true);
       const cart = await getCart();
       
-      const itemsWithDetails = await Promise.all(
-        (cart.items || []).map(async (item: any) => {
-          try {
-            const product = await getProduct(item.productId);
-            return {
-              productId: product.id,
-              name: product.name,
-              price: product.price,
-              quantity: item.quantity,
-              image: product.image,
-            };
-          } catch (error) {
-            return null;
-          }
-        })
-      );
+      const cartLines = cart.items || [];
+      const { products } = cartLines.length
+        ? await getProductsBatch(cartLines.map((item: any) => item.productId))
+        : { products: {} };
+      const itemsWithDetails = cartLines
+        .filter((item: any) => products[item.productId])
+        .map((item: any) => {
+          const product = products[item.productId];
+          return {
+            productId: product.id,
+            name: product.name,
+            price: product.price,
+            quantity: item.quantity,
+            image: product.image,
+          };
+        });
       
-      setCartItems(itemsWithDetails.filter(Boolean));
+      setCartItems(itemsWithDetails);
     } catch (error) {
       console.error('Error loading cart:', error);
     } finally {
@@ -10,7 +10,8 @@ import {
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useLocalSearchParams } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import { getOrder } from '../../utils/api';
+import { getOrder, imageUrl } from '../../utils/api';
+import { subscribeOrders } from '../../utils/push';
 import { Order } from '../../types';
 
 export default function OrderDetailScreen() {
@@ -24,6 +25,16 @@ export default function OrderDetailScreen() {
     }
   }, [id]);
 
+  useEffect(
+    () =>
+      subscribeOrders((update) => {
+        if (update.id === id) {
+          setOrder((current) => (current ? { ...current, status: update.status } : current));
+        }
+      }),
+    [id]
+  );
+
   const loadOrder = async () => {
     try {
       const data = await getOrder(id as string);
@@ -113,7 +124,7 @@ export default function OrderDetailScreen() {
           <Text style={styles.sectionTitle}>Items ({order.items.length})</Text>
           {order.items.map((item, index) => (
             <View key={index} style={styles.itemCard}>
-              <Image source={{ uri: item.image }} style={styles.itemImage} />
+              <Image source={{ uri: imageUrl(item.image, 60) }} style={styles.itemImage} />
               <View style={styles.itemDetails}>
                 <Text style={styles.itemName} numberOfLines={2}>
                   {item.name}
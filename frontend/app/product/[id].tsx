@@ -1,5 +1,6 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import {
+  Dimensions,
   View,
   Text,
   StyleSheet,
@@ -13,9 +14,18 @@ import {
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useLocalSearchParams, useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import { getProduct, getReviews, createReview, addToCart } from '../../utils/api';
+import {
+  getProduct,
+  getReviews,
+  getReviewSummary,
+  createReview,
+  addToCart,
+  imageUrl,
+} from '../../utils/api';
+import { isNearEnd } from '../../utils/paging';
+import { watchProduct } from '../../utils/push';
 import { useCartStore } from '../../store/cartStore';
-import { Product, Review } from '../../types';
+import { Product, Review, ReviewSummary } from '../../types';
 
 export default function ProductDetailScreen() {
   const { id } = useLocalSearchParams();
@@ -24,6 +34,12 @@ export default function ProductDetailScreen() {
   
   const [product, setProduct] = useState<Product | null>(null);
   const [reviews, setReviews] = useState<Review[]>([]);
+  const [reviewSummary, setReviewSummary] = useState<ReviewSummary | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Bumped on every reload so a page fetched for the old list is dropped
+  const generation = useRef(0);
+  const fetchingMore = useRef(false);
   const [loading, setLoading] = useState(true);
   const [quantity, setQuantity] = useState(1);
   const [showReviewForm, setShowReviewForm] = useState(false);
@@ -37,6 +53,13 @@ export default function ProductDetailScreen() {
     }
   }, [id]);
 
+  useEffect(() => {
+    if (!id) return;
+    return watchProduct(id as string, (update) => {
+      setProduct((current) => (current ? { ...current, price: update.price, stock: update.stock } : current));
+    });
+  }, [id]);
+
   const loadProduct = async () => {
     try {
       const data = await getProduct(id as string);
@@ -51,13 +74,38 @@ export default function ProductDetailScreen() {
 
   const loadReviews = async () => {
     try {
-      const data = await getReviews(id as string);
-      setReviews(data);
+      const current = ++generation.current;
+      const [page, summary] = await Promise.all([
+        getReviews(id as string),
+        getReviewSummary(id as string),
+      ]);
+      if (generation.current !== current) return;
+      setReviews(page.items);
+      setNextCursor(page.nextCursor);
+      setReviewSummary(summary);
     } catch (error) {
       console.error('Error loading reviews:', error);
     }
   };
 
+  const loadMoreReviews = async () => {
+    if (!nextCursor || fetchingMore.current) return;
+    const current = generation.current;
+    fetchingMore.current = true;
+    setLoadingMore(true);
+    try {
+      const page = await getReviews(id as string, { cursor: nextCursor });
+      if (generation.current !== current) return;
+      setReviews((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Error loading more reviews:', error);
+    } finally {
+      fetchingMore.current = false;
+      setLoadingMore(false);
+    }
+  };
+
   const handleAddToCart = async () => {
     if (!product) return;
     
@@ -110,8 +158,12 @@ export default function ProductDetailScreen() {
 
   return (
     <SafeAreaView style={styles.container} edges={['bottom']}>
-      <ScrollView style={styles.scrollView}>
-        <Image source={{ uri: product.image }} style={styles.image} />
+      <ScrollView
+        style={styles.scrollView}
+        onScroll={({ nativeEvent }) => isNearEnd(nativeEvent) && loadMoreReviews()}
+        scrollEventThrottle={200}
+      >
+        <Image source={{ uri: imageUrl(product.image, Dimensions.get('window').width) }} style={styles.image} />
         
         <View style={styles.content}>
           <Text style={styles.name}>{product.name}</Text>
@@ -154,7 +206,9 @@ export default function ProductDetailScreen() {
             </View>
           </View>
 
-          <Text style={styles.sectionTitle}>Reviews ({reviews.length})</Text>
+          <Text style={styles.sectionTitle}>
+            Reviews ({reviewSummary ? reviewSummary.count : product.reviewCount})
+          </Text>
           
           {!showReviewForm && (
             <TouchableOpacity
@@ -225,6 +279,7 @@ export default function ProductDetailScreen() {
               </Text>
             </View>
           ))}
+          {loadingMore && <ActivityIndicator style={styles.loadingMore} color="#FF6B35" />}
         </View>
       </ScrollView>
 
@@ -460,6 +515,9 @@ const styles = StyleSheet.create({
     fontSize: 12,
     color: '#999',
   },
+  loadingMore: {
+    paddingVertical: 16,
+  },
   footer: {
     backgroundColor: '#FFF',
     padding: 16,
@@ -1,6 +1,7 @@
 import React from 'react';
 import { View, Text, Image, StyleSheet, TouchableOpacity } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
+import { imageUrl } from '../utils/api';
 
 interface CartItemCardProps {
   item: {
@@ -17,7 +18,7 @@ interface CartItemCardProps {
 export default function CartItemCard({ item, onUpdateQuantity, onRemove }: CartItemCardProps) {
   return (
     <View style={styles.card}>
-      <Image source={{ uri: item.image }} style={styles.image} />
+      <Image source={{ uri: imageUrl(item.image, 80) }} style={styles.image} />
       <View style={styles.details}>
         <Text style={styles.name} numberOfLines={2}>
           {item.name}
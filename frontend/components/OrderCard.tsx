@@ -8,7 +8,7 @@ interface OrderCardProps {
     createdAt: string;
     total: number;
     status: string;
-    items: any[];
+    itemCount: number;
   };
   onPress: () => void;
 }
@@ -53,7 +53,7 @@ export default function OrderCard({ order, onPress }: OrderCardProps) {
       <View style={styles.footer}>
         <View style={styles.itemsContainer}>
           <Ionicons name="cube-outline" size={16} color="#666" />
-          <Text style={styles.itemsText}>{order.items.length} items</Text>
+          <Text style={styles.itemsText}>{order.itemCount} items</Text>
         </View>
         <Text style={styles.total}>${order.total.toFixed(2)}</Text>
       </View>
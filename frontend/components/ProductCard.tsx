@@ -2,6 +2,7 @@ import React from 'react';
 import { View, Text, Image, StyleSheet, TouchableOpacity, Dimensions } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
 import { Product } from '../types';
+import { imageUrl } from '../utils/api';
 
 interface ProductCardProps {
   product: Product;
@@ -14,7 +15,7 @@ const CARD_WIDTH = (width - 48) / 2;
 export default function ProductCard({ product, onPress }: ProductCardProps) {
   return (
     <TouchableOpacity style={styles.card} onPress={onPress} activeOpacity={0.7}>
-      <Image source={{ uri: product.image }} style={styles.image} />
+      <Image source={{ uri: imageUrl(product.image, CARD_WIDTH) }} style={styles.image} />
       <View style={styles.content}>
         <Text style={styles.name} numberOfLines={2}>
           {product.name}
@@ -1,3 +1,8 @@
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
 export interface Product {
   id: string;
   name: string;
@@ -20,6 +25,13 @@ export interface Review {
   createdAt: string;
 }
 
+export interface ReviewSummary {
+  productId: string;
+  average: number;
+  count: number;
+  histogram: Record<string, number>;
+}
+
 export interface CartItem {
   productId: string;
   quantity: number;
@@ -35,6 +47,14 @@ export interface Order {
   createdAt: string;
 }
 
+export interface OrderSummary {
+  id: string;
+  status: string;
+  total: number;
+  itemCount: number;
+  createdAt: string;
+}
+
 export interface OrderItem {
   productId: string;
   name: string;
@@ -50,4 +70,14 @@ export interface ShippingAddress {
   state: string;
   zipCode: string;
   phone: string;
-}
\ No newline at end of file
+}
+export interface ProductUpdate {
+  id: string;
+  price: number;
+  stock: number;
+}
+
+export type PushMessage =
+  | { type: 'order'; order: OrderSummary }
+  | { type: 'product'; product: ProductUpdate; lowStock: boolean }
+  | { type: 'ping' };
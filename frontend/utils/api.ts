@@ -1,5 +1,7 @@
-import axios from 'axios';
+import axios, { AxiosResponse } from 'axios';
 import Constants from 'expo-constants';
+import { PixelRatio } from 'react-native';
+import { OrderSummary, Page, Product, Review, ReviewSummary } from '../types';
 
 const API_URL = Constants.expoConfig?.extra?.EXPO_PUBLIC_BACKEND_URL || process.env.EXPO_PUBLIC_BACKEND_URL || '';
 
@@ -11,16 +13,26 @@ const api = axios.create({
   },
 });
 
+// List endpoints return one page; pass `nextCursor` back as `cursor` for the next
+const toPage = <T>(response: AxiosResponse<T[]>): Page<T> => ({
+  items: response.data,
+  nextCursor: response.headers['x-next-cursor'] || null,
+});
+
 // Products
-export const getProducts = async (params?: {
+export type ProductQuery = {
   category?: string;
   search?: string;
   minPrice?: number;
   maxPrice?: number;
   sort?: string;
-}) => {
-  const response = await api.get('/products', { params });
-  return response.data;
+  limit?: number;
+  cursor?: string;
+};
+
+export const getProducts = async (params?: ProductQuery): Promise<Page<Product>> => {
+  const response = await api.get<Product[]>('/products', { params });
+  return toPage(response);
 };
 
 export const getProduct = async (id: string) => {
@@ -28,14 +40,37 @@ export const getProduct = async (id: string) => {
   return response.data;
 };
 
+export const getProductsBatch = async (ids: string[]) => {
+  const response = await api.get('/products/batch', { params: { ids: ids.join(',') } });
+  return response.data;
+};
+
+export const getProductFacets = async (params?: {
+  category?: string;
+  search?: string;
+  minPrice?: number;
+  maxPrice?: number;
+}) => {
+  const response = await api.get('/products/facets', { params });
+  return response.data;
+};
+
 export const getCategories = async () => {
   const response = await api.get('/categories');
   return response.data;
 };
 
 // Reviews
-export const getReviews = async (productId: string) => {
-  const response = await api.get(`/reviews/${productId}`);
+export const getReviews = async (
+  productId: string,
+  params?: { sort?: 'createdAt' | 'rating'; limit?: number; cursor?: string }
+): Promise<Page<Review>> => {
+  const response = await api.get<Review[]>(`/reviews/${productId}`, { params });
+  return toPage(response);
+};
+
+export const getReviewSummary = async (productId: string): Promise<ReviewSummary> => {
+  const response = await api.get(`/reviews/${productId}/summary`);
   return response.data;
 };
 
@@ -54,6 +89,11 @@ export const getCart = async () => {
   return response.data;
 };
 
+export const getCartView = async () => {
+  const response = await api.get('/cart/view');
+  return response.data;
+};
+
 export const addToCart = async (productId: string, quantity: number = 1) => {
   const response = await api.post('/cart/add', { productId, quantity });
   return response.data;
@@ -84,9 +124,12 @@ export const createOrder = async (data: {
   return response.data;
 };
 
-export const getOrders = async () => {
-  const response = await api.get('/orders');
-  return response.data;
+export const getOrders = async (params?: {
+  limit?: number;
+  cursor?: string;
+}): Promise<Page<OrderSummary>> => {
+  const response = await api.get<OrderSummary[]>('/orders', { params });
+  return toPage(response);
 };
 
 export const getOrder = async (id: string) => {
@@ -94,6 +137,14 @@ export const getOrder = async (id: string) => {
   return response.data;
 };
 
+// Images: a resized variant instead of the full-resolution original.
+// `width` is the displayed width in layout points.
+export const imageUrl = (url: string, width: number) => {
+  if (!url) return url;
+  const pixels = PixelRatio.getPixelSizeForLayoutSize(width);
+  return `${API_URL}/api/images?url=${encodeURIComponent(url)}&w=${pixels}`;
+};
+
 // Initialize mock data
 export const initMockData = async () => {
   const response = await api.post('/init-data');
@@ -0,0 +1,7 @@
+import { NativeScrollEvent } from 'react-native';
+
+// True once a ScrollView is within `threshold` points of its end, to fetch the next page
+export const isNearEnd = (
+  { layoutMeasurement, contentOffset, contentSize }: NativeScrollEvent,
+  threshold: number = 300
+) => layoutMeasurement.height + contentOffset.y >= contentSize.height - threshold;
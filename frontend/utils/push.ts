@@ -0,0 +1,107 @@
+import Constants from 'expo-constants';
+import { OrderSummary, ProductUpdate, PushMessage } from '../types';
+
+const API_URL = Constants.expoConfig?.extra?.EXPO_PUBLIC_BACKEND_URL || process.env.EXPO_PUBLIC_BACKEND_URL || '';
+const PUSH_URL = `${API_URL.replace(/^http/, 'ws')}/api/push`;
+
+// The server pings every 25s; silence for longer means a dead connection
+const HEARTBEAT_TIMEOUT_MS = 60000;
+const MAX_RETRY_MS = 30000;
+
+type OrderListener = (order: OrderSummary) => void;
+type ProductListener = (product: ProductUpdate, lowStock: boolean) => void;
+
+// One socket per app, opened while any screen listens and shared by all
+let socket: WebSocket | null = null;
+let retryMs = 1000;
+let retryTimer: ReturnType<typeof setTimeout> | null = null;
+let heartbeatTimer: ReturnType<typeof setTimeout> | null = null;
+const orderListeners = new Set<OrderListener>();
+const productListeners = new Map<string, Set<ProductListener>>();
+
+const listening = () => orderListeners.size > 0 || productListeners.size > 0;
+
+const send = (message: object) => {
+  if (socket?.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify(message));
+  }
+};
+
+const resetHeartbeat = () => {
+  if (heartbeatTimer) clearTimeout(heartbeatTimer);
+  heartbeatTimer = setTimeout(() => socket?.close(), HEARTBEAT_TIMEOUT_MS);
+};
+
+const connect = () => {
+  if (socket || !listening()) return;
+  const ws = new WebSocket(PUSH_URL);
+  socket = ws;
+
+  ws.onopen = () => {
+    retryMs = 1000;
+    resetHeartbeat();
+    if (productListeners.size > 0) {
+      send({ type: 'watch', productIds: [...productListeners.keys()] });
+    }
+  };
+
+  ws.onmessage = (event) => {
+    resetHeartbeat();
+    const message: PushMessage = JSON.parse(event.data);
+    if (message.type === 'order') {
+      orderListeners.forEach((listener) => listener(message.order));
+    } else if (message.type === 'product') {
+      productListeners.get(message.product.id)?.forEach((listener) => listener(message.product, message.lowStock));
+    }
+  };
+
+  ws.onclose = () => {
+    if (heartbeatTimer) clearTimeout(heartbeatTimer);
+    socket = null;
+    if (listening() && !retryTimer) {
+      retryTimer = setTimeout(() => {
+        retryTimer = null;
+        connect();
+      }, retryMs);
+      retryMs = Math.min(retryMs * 2, MAX_RETRY_MS);
+    }
+  };
+};
+
+const disconnectIfIdle = () => {
+  if (!listening()) {
+    if (retryTimer) clearTimeout(retryTimer);
+    retryTimer = null;
+    socket?.close();
+  }
+};
+
+// Status changes of the user's orders; returns the unsubscribe function
+export const subscribeOrders = (listener: OrderListener) => {
+  orderListeners.add(listener);
+  connect();
+  return () => {
+    orderListeners.delete(listener);
+    disconnectIfIdle();
+  };
+};
+
+// Price changes and low stock of one product; the current state arrives first
+export const watchProduct = (productId: string, listener: ProductListener) => {
+  let listeners = productListeners.get(productId);
+  if (!listeners) {
+    listeners = new Set();
+    productListeners.set(productId, listeners);
+    send({ type: 'watch', productIds: [productId] });
+  }
+  listeners.add(listener);
+  connect();
+  return () => {
+    listeners!.delete(listener);
+    if (listeners!.size === 0) {
+      productListeners.delete(productId);
+      send({ type: 'unwatch', productIds: [productId] });
+    }
+    disconnectIfIdle();
+  };
+};
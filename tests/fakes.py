@@ -0,0 +1,61 @@
+# Just enough of a MongoDB collection for the repository tests
+
+
+def matches(doc, query):
+    # Null and missing values never satisfy a range operator, as in MongoDB
+    if "$or" in query:
+        return any(matches(doc, branch) for branch in query["$or"])
+    if "$and" in query:
+        return all(matches(doc, branch) for branch in query["$and"])
+    for field, condition in query.items():
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, bound in condition.items():
+            if op == "$ne":
+                if value == bound:
+                    return False
+            elif op == "$in":
+                if value not in bound:
+                    return False
+            elif value is None or not (value < bound if op == "$lt" else value > bound):
+                return False
+    return True
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            # Null and missing sort below every value
+            self.docs.sort(key=lambda doc: (doc.get(field) is not None, doc.get(field)), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class Collection:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.sessions = []
+
+    def find(self, query, projection=None, session=None):
+        self.sessions.append(session)
+        found = [doc for doc in self.docs if matches(doc, query)]
+        if projection:
+            wanted = {field for field, include in projection.items() if include == 1}
+            found = [{field: doc[field] for field in wanted if field in doc} for doc in found]
+        return Cursor(found)
+
+    async def find_one(self, query, projection=None, session=None):
+        docs = await self.find(query, projection, session).to_list(1)
+        return docs[0] if docs else None
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from admission import DEFAULT_RULES, RouteLimiter, Rule, TokenBucket, load_rules
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(burst=2, now=0.0)
+    assert bucket.take(rate=1, burst=2, now=0.0) == 0
+    assert bucket.take(rate=1, burst=2, now=0.0) == 0
+    assert bucket.take(rate=1, burst=2, now=0.0) == pytest.approx(1.0)
+    assert bucket.take(rate=1, burst=2, now=0.5) == pytest.approx(0.5)
+    assert bucket.take(rate=1, burst=2, now=1.0) == 0
+
+
+def test_rates_apply_per_user_and_per_ip():
+    limiter = RouteLimiter(Rule("r", "GET", "/x", user_rate=0.001, user_burst=2, ip_rate=0.001, ip_burst=3))
+    assert limiter.check_rate("alice", "1.1.1.1") == 0
+    assert limiter.check_rate("alice", "1.1.1.1") == 0
+    assert limiter.check_rate("alice", "1.1.1.1") > 0
+    # Another user from the same address still has the address's last token
+    assert limiter.check_rate("bob", "1.1.1.1") == 0
+    assert limiter.check_rate("carol", "1.1.1.1") > 0
+    assert limiter.check_rate("carol", "2.2.2.2") == 0
+    assert limiter.stats()["rateLimited"] == 2
+
+
+def test_bucket_table_is_bounded():
+    limiter = RouteLimiter(Rule("r", "GET", "/x", ip_rate=1, ip_burst=1), max_buckets=10)
+    for n in range(100):
+        limiter.check_rate(None, f"10.0.0.{n}")
+    assert len(limiter._buckets) == 10
+
+
+def test_waiters_get_released_slots_in_order_and_overflow_is_shed():
+    async def run():
+        limiter = RouteLimiter(Rule("r", "GET", "/x", concurrency=1, queue_size=2, queue_budget=1.0))
+        assert await limiter.acquire()
+        first = asyncio.ensure_future(limiter.acquire())
+        second = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        # Queue full
+        assert not await limiter.acquire()
+        limiter.release()
+        assert await first
+        assert not second.done()
+        limiter.release()
+        assert await second
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 0 and stats["waiting"] == 0
+    assert stats["admitted"] == 3 and stats["queued"] == 2 and stats["shed"] == 1
+
+
+def test_waiter_is_shed_after_queue_budget():
+    async def run():
+        limiter = RouteLimiter(Rule("r", "GET", "/x", concurrency=1, queue_size=5, queue_budget=0.01))
+        await limiter.acquire()
+        admitted = await limiter.acquire()
+        limiter.release()
+        return admitted, limiter.stats()
+
+    admitted, stats = asyncio.run(run())
+    assert not admitted
+    assert stats["active"] == 0 and stats["waiting"] == 0 and stats["shed"] == 1
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        limiter = RouteLimiter(Rule("r", "GET", "/x", concurrency=1, queue_size=5, queue_budget=1.0))
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_load_rules_applies_overrides_and_adds_rules():
+    rules = {rule.name: rule for rule in load_rules({
+        "ADMISSION_RULES": '{"search": {"concurrency": 4}, "cart": {"method": "POST", "route": "/api/cart/add"}}'
+    })}
+    assert rules["search"].concurrency == 4
+    assert rules["search"].user_rate == next(r for r in DEFAULT_RULES if r.name == "search").user_rate
+    assert rules["cart"].route == "/api/cart/add"
+    assert len(rules) == len(DEFAULT_RULES) + 1
+
+
+def test_load_rules_rejects_unknown_fields():
+    with pytest.raises(ValueError):
+        load_rules({"ADMISSION_RULES": '{"search": {"concurency": 4}}'})
+
+
+def test_checkout_is_limited_per_address_whatever_the_user_id():
+    rule = next(rule for rule in DEFAULT_RULES if rule.name == "create_order")
+    limiter = RouteLimiter(rule)
+    delays = [limiter.check_rate(f"user-{n}", "3.3.3.3") for n in range(int(rule.ip_burst) + 1)]
+    assert delays[:-1] == [0] * int(rule.ip_burst)
+    assert delays[-1] > 0
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import LRUCache, QueryCache
+
+
+class Loader:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, value):
+        async def load():
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            return value
+        return load
+
+
+def test_lru_cache_evicts_least_recently_used_and_expires():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache = QueryCache(max_bytes=1 << 20)
+        loader = Loader()
+        results = await asyncio.gather(*(cache.get("k", 1, loader("v")) for _ in range(50)))
+        return cache, loader, results
+
+    cache, loader, results = asyncio.run(run())
+    assert loader.calls == 1
+    assert results == [("v", 1)] * 50
+    assert cache.stats()["coalesced"] == 49
+
+
+def test_new_version_serves_stale_value_while_one_refresh_runs():
+    async def run():
+        cache = QueryCache(max_bytes=1 << 20, stale_ttl=5, min_refresh_interval=0)
+        loader = Loader()
+        await cache.get("k", 1, loader("old"))
+        stale = await asyncio.gather(*(cache.get("k", 2, loader("new")) for _ in range(10)))
+        await asyncio.sleep(0.05)
+        fresh = await cache.get("k", 2, loader("unused"))
+        return loader, stale, fresh
+
+    loader, stale, fresh = asyncio.run(run())
+    # The stale value keeps the version it was computed at
+    assert stale == [("old", 1)] * 10
+    assert fresh == ("new", 2)
+    assert loader.calls == 2
+
+
+def test_entry_of_an_old_version_is_not_served_after_stale_ttl():
+    async def run():
+        cache = QueryCache(max_bytes=1 << 20, stale_ttl=0)
+        loader = Loader(delay=0)
+        await cache.get("k", 1, loader("old"))
+        return await cache.get("k", 2, loader("new"))
+
+    assert asyncio.run(run()) == ("new", 2)
+
+
+def test_slower_load_of_older_version_does_not_overwrite_newer_result():
+    async def run():
+        cache = QueryCache(max_bytes=1 << 20, stale_ttl=0)
+        slow = asyncio.ensure_future(cache.get("k", 1, Loader(delay=0.05)("old")))
+        await asyncio.sleep(0.01)
+        await cache.get("k", 2, Loader(delay=0)("new"))
+        await slow
+        return await cache.get("k", 2, Loader()("unused"))
+
+    assert asyncio.run(run()) == ("new", 2)
+
+
+def test_load_errors_reach_the_caller_and_are_not_cached():
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def run():
+        cache = QueryCache(max_bytes=1 << 20)
+        with pytest.raises(RuntimeError):
+            await cache.get("k", 1, failing)
+        return cache, await cache.get("k", 1, Loader(delay=0)("ok"))
+
+    cache, result = asyncio.run(run())
+    assert result == ("ok", 1)
+    assert cache.stats()["loadErrors"] == 1
+
+
+def test_size_bound_evicts_least_recently_used():
+    async def run():
+        cache = QueryCache(max_bytes=3 * (100 + 256), sizeof=len)
+        for key in "abcd":
+            await cache.get(key, 1, Loader(delay=0)("x" * 100))
+        await cache.get("too-big", 1, Loader(delay=0)("x" * 10000))
+        return cache
+
+    cache = asyncio.run(run())
+    assert len(cache) == 3
+    assert cache.bytes <= cache.max_bytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_fresh_entry_expires_after_ttl():
+    async def run():
+        cache = QueryCache(max_bytes=1 << 20, ttl=0.01, stale_ttl=0)
+        loader = Loader(delay=0)
+        await cache.get("k", 1, loader("a"))
+        time.sleep(0.02)
+        return loader, await cache.get("k", 1, loader("b"))
+
+    loader, result = asyncio.run(run())
+    assert result == ("b", 1)
+    assert loader.calls == 2
@@ -0,0 +1,144 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from repositories import MongoCartRepository, add_item_pipeline, hydrate_cart
+
+
+def evaluate(expr, doc, this=None):
+    # The aggregation expressions add_item_pipeline uses
+    if isinstance(expr, str):
+        if expr == "$$this":
+            return this
+        if expr.startswith("$$this."):
+            return this.get(expr[len("$$this."):])
+        return doc.get(expr[1:]) if expr.startswith("$") else expr
+    if isinstance(expr, list):
+        return [evaluate(item, doc, this) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        return {key: evaluate(value, doc, this) for key, value in expr.items()}
+    op, args = next(iter(expr.items()))
+    if op == "$literal":
+        return args
+    if op == "$map":
+        return [evaluate(args["in"], doc, item) for item in evaluate(args["input"], doc, this)]
+    if op == "$cond":
+        condition, then, otherwise = args
+        return evaluate(then if evaluate(condition, doc, this) else otherwise, doc, this)
+    values = [evaluate(arg, doc, this) for arg in args]
+    if op == "$ifNull":
+        return values[0] if values[0] is not None else values[1]
+    if op == "$in":
+        return values[0] in values[1]
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$add":
+        return sum(values)
+    if op == "$concatArrays":
+        return [item for array in values for item in array]
+    raise NotImplementedError(op)
+
+
+def apply_pipeline(doc, pipeline):
+    doc = dict(doc)
+    for stage in pipeline:
+        doc.update({field: evaluate(expr, doc) for field, expr in stage["$set"].items()})
+    return doc
+
+
+def test_add_item_creates_the_cart_and_its_line():
+    cart = apply_pipeline({"userId": "u1"}, add_item_pipeline("p1", 2))
+    assert cart["items"] == [{"productId": "p1", "quantity": 2}]
+    assert cart["id"]
+
+
+def test_add_item_increments_an_existing_line_and_appends_new_ones():
+    items = [{"productId": "p1", "quantity": 2}, {"productId": "p2", "quantity": 1}]
+    cart = {"id": "c1", "userId": "u1", "items": items}
+    cart = apply_pipeline(cart, add_item_pipeline("p2", 3))
+    cart = apply_pipeline(cart, add_item_pipeline("p3", 1))
+    assert cart["id"] == "c1"
+    assert cart["items"] == [
+        {"productId": "p1", "quantity": 2},
+        {"productId": "p2", "quantity": 4},
+        {"productId": "p3", "quantity": 1},
+    ]
+
+
+def test_product_ids_are_not_read_as_field_paths():
+    cart = apply_pipeline({"userId": "u1"}, add_item_pipeline("$items", 1))
+    assert cart["items"] == [{"productId": "$items", "quantity": 1}]
+
+
+class Cart(BaseModel):
+    id: str = "new"
+    userId: str = "mock-user"
+    items: list = []
+
+
+class RecordingCarts:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        async def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return {}
+        return call
+
+
+def test_every_mutation_is_one_round_trip():
+    carts = RecordingCarts()
+    repo = MongoCartRepository(carts, Cart)
+
+    async def run():
+        await repo.get("u1")
+        await repo.add_item("u1", "p1", 1)
+        await repo.set_quantity("u1", "p1", 3)
+        await repo.set_quantity("u1", "p1", 0)
+        await repo.remove_item("u1", "p1")
+        await repo.clear("u1")
+
+    asyncio.run(run())
+    assert [name for name, _, _ in carts.calls] == [
+        "find_one_and_update", "find_one_and_update", "find_one_and_update",
+        "find_one_and_update", "update_one", "update_one",
+    ]
+    assert all(args[0] == {"userId": "u1"} for _, args, _ in carts.calls)
+    # A new cart gets the model defaults, with userId from the filter
+    assert carts.calls[0][1][1] == {"$setOnInsert": {"id": "new", "items": []}}
+    assert carts.calls[2][2]["array_filters"] == [{"item.productId": "p1"}]
+    assert carts.calls[3][1][1]["$pull"] == {"items": {"productId": "p1"}}
+
+
+def test_hydrated_cart_joins_lines_to_products_and_totals_what_can_be_bought():
+    cart = {
+        "id": "c1",
+        "userId": "u1",
+        "items": [
+            {"productId": "mug", "quantity": 3},
+            {"productId": "lamp", "quantity": 5},
+            {"productId": "gone", "quantity": 1},
+        ],
+        "products": [
+            {"id": "mug", "name": "Mug", "price": 4.1, "image": "mug.jpg", "stock": 10},
+            {"id": "lamp", "name": "Lamp", "price": 20.0, "image": "lamp.jpg", "stock": 2},
+        ],
+    }
+    view = hydrate_cart(cart)
+    mug, lamp, gone = view["items"]
+    assert mug == {
+        "productId": "mug", "quantity": 3, "name": "Mug", "price": 4.1, "image": "mug.jpg",
+        "stock": 10, "missing": False, "outOfStock": False, "subtotal": 12.3,
+    }
+    assert lamp["outOfStock"] and lamp["subtotal"] == 100.0
+    assert gone == {"productId": "gone", "quantity": 1, "missing": True, "outOfStock": False, "subtotal": 0.0}
+    # Out-of-stock and missing lines are shown but not counted
+    assert (view["total"], view["itemCount"]) == (12.3, 3)
+    assert "products" not in view and view["id"] == "c1"
+
+
+def test_hydrated_empty_cart():
+    assert hydrate_cart({"userId": "u1", "items": []}) == {"userId": "u1", "items": [], "itemCount": 0, "total": 0.0}
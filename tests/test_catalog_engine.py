@@ -0,0 +1,120 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from catalog_engine import SORT_FIELDS, InMemoryCatalog, sort_key
+from pagination import InvalidCursor
+from repositories import MongoProductRepository
+
+LIST_FIELDS = ("id", "name", "category", "price", "rating", "createdAt")
+CATEGORIES = ("Books", "Electronics", "Home")
+
+
+def make_products(count, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    products = []
+    for n in range(count):
+        products.append({
+            "id": f"p{n:04d}",
+            "name": f"Product {n}",
+            "category": rng.choice(CATEGORIES),
+            # Ties and missing values exercise the id tie-break and null ordering
+            "price": rng.choice([None, 5.0, 19.99, 19.99, round(rng.uniform(1, 500), 2)]),
+            "rating": rng.choice([None, 0.0, 3.5, 4.0, 4.5]),
+            "createdAt": start + timedelta(hours=rng.randrange(200)),
+            "stock": 10,
+        })
+    return products
+
+
+def make_catalog(products):
+    catalog = InMemoryCatalog(MongoProductRepository(None, {}), None, LIST_FIELDS)
+    catalog.load_documents([dict(product) for product in products])
+    return catalog
+
+
+def reference(products, sort_field, category=None, min_price=None, max_price=None, ids=None):
+    selected = []
+    for product in products:
+        price = product["price"]
+        if ids is not None and product["id"] not in ids:
+            continue
+        if category and product["category"] != category:
+            continue
+        if min_price is not None and (price is None or price < min_price):
+            continue
+        if max_price is not None and (price is None or price > max_price):
+            continue
+        selected.append(product)
+    selected.sort(key=lambda product: sort_key(product, sort_field), reverse=True)
+    return [product["id"] for product in selected]
+
+
+def page_through(catalog, limit, **filters):
+    async def run():
+        ids, cursor = [], None
+        while True:
+            docs, cursor = await catalog.find(cursor=cursor, limit=limit, **filters)
+            assert len(docs) <= limit
+            ids.extend(doc["id"] for doc in docs)
+            if cursor is None:
+                return ids
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("sort_field", SORT_FIELDS)
+@pytest.mark.parametrize("category", [None, "Electronics"])
+@pytest.mark.parametrize("prices", [(None, None), (10.0, None), (None, 19.99), (19.99, 19.99), (5.0, 100.0)])
+def test_pages_match_brute_force(sort_field, category, prices):
+    products = make_products(300)
+    catalog = make_catalog(products)
+    min_price, max_price = prices
+    expected = reference(products, sort_field, category, min_price, max_price)
+    for limit in (1, 7, 50):
+        assert page_through(
+            catalog, limit, sort_field=sort_field, category=category, min_price=min_price, max_price=max_price
+        ) == expected
+
+
+@pytest.mark.parametrize("sort_field", SORT_FIELDS)
+def test_pages_of_given_ids_match_brute_force(sort_field):
+    products = make_products(200)
+    catalog = make_catalog(products)
+    ids = [product["id"] for product in products[::3]] + ["missing"]
+    expected = reference(products, sort_field, "Books", 5.0, None, ids=set(ids))
+    assert page_through(catalog, 4, sort_field=sort_field, category="Books", min_price=5.0, ids=ids) == expected
+
+
+def test_list_documents_carry_only_list_fields():
+    catalog = make_catalog(make_products(5))
+    docs, _ = asyncio.run(catalog.find(limit=5))
+    assert all(set(doc) <= set(LIST_FIELDS) for doc in docs)
+    assert "stock" in asyncio.run(catalog.get(docs[0]["id"]))
+
+
+def test_upsert_and_remove_keep_listings_consistent():
+    products = make_products(120)
+    catalog = make_catalog(products)
+    rng = random.Random(3)
+    for product in rng.sample(products, 30):
+        product.update(price=round(rng.uniform(1, 500), 2), category=rng.choice(CATEGORIES))
+        catalog.upsert(dict(product))
+    for product in products[:10]:
+        catalog.remove(product["id"])
+    remaining = products[10:]
+    for sort_field in SORT_FIELDS:
+        for category in (None,) + CATEGORIES:
+            assert page_through(catalog, 9, sort_field=sort_field, category=category) == reference(
+                remaining, sort_field, category
+            )
+    assert asyncio.run(catalog.categories()) == sorted({product["category"] for product in remaining})
+
+
+def test_cursor_from_another_sort_is_rejected():
+    catalog = make_catalog(make_products(30))
+    _, cursor = asyncio.run(catalog.find(sort_field="price", limit=5))
+    with pytest.raises(InvalidCursor):
+        asyncio.run(catalog.find(sort_field="rating", cursor=cursor, limit=5))
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+from bson import Timestamp
+
+from changes import ChangeFeed, FeedReset, OrdersChanged, ProductsChanged, ReviewsChanged
+
+
+class FakeMeta:
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {}).update(update["$set"])
+
+
+def change(n, operation, collection, key=None, doc=None):
+    event = {"_id": {"_data": f"t{n}"}, "operationType": operation, "ns": {"db": "shop", "coll": collection},
+             "clusterTime": Timestamp(1700000000, n)}
+    if key is not None:
+        event["documentKey"] = {"_id": key}
+    if doc is not None:
+        event["fullDocument"] = doc
+    return event
+
+
+def feed_with_events():
+    feed = ChangeFeed(SimpleNamespace(name="shop", meta=FakeMeta()), save_interval=0)
+    events = []
+    for event_type in (ProductsChanged, ReviewsChanged, OrdersChanged, FeedReset):
+        feed.subscribe(event_type, events.append)
+    return feed, events
+
+
+def test_batch_is_published_as_one_event_per_type():
+    feed, events = feed_with_events()
+    batch = [
+        change(1, "insert", "products", "a", {"_id": "a", "id": "p1", "price": 5}),
+        change(2, "update", "products", "a", {"_id": "a", "id": "p1", "price": 6}),
+        change(3, "update", "products", "b", {"_id": "b", "id": "p2"}),
+        change(4, "delete", "products", "b"),
+        # Looked up after its delete: nothing to publish but the delete
+        change(5, "update", "products", "c"),
+        change(6, "delete", "products", "c"),
+        change(7, "insert", "reviews", "r1", {"productId": "p1"}),
+        change(8, "insert", "reviews", "r2", {"productId": "p1"}),
+        change(9, "delete", "reviews", "r3"),
+        change(10, "insert", "orders", "o1", {"_id": "o1", "total": 10}),
+    ]
+    asyncio.run(feed._publish_batch(batch))
+
+    products, reviews, orders = events
+    assert products.documents == ({"_id": "a", "id": "p1", "price": 6},) and products.deleted == ("b", "c")
+    assert reviews.product_ids == ("p1",)
+    assert orders.orders == ({"_id": "o1", "total": 10},)
+    assert products.at == reviews.at == orders.at == Timestamp(1700000000, 10)
+    assert feed.changes == 10 and feed.events == 3
+    assert feed.db.meta.docs["changefeed"]["token"] == {"_data": "t10"}
+
+
+def test_reinserted_product_is_not_reported_deleted():
+    feed, events = feed_with_events()
+    asyncio.run(feed._publish_batch([
+        change(1, "delete", "products", "a"),
+        change(2, "insert", "products", "a", {"_id": "a", "id": "p1"}),
+    ]))
+    [products] = events
+    assert products.ids == ["p1"] and products.deleted == ()
+
+
+def test_drop_publishes_a_reset_after_the_other_events():
+    feed, events = feed_with_events()
+    asyncio.run(feed._publish_batch([
+        change(1, "insert", "orders", "o1", {"_id": "o1"}),
+        change(2, "drop", "products"),
+    ]))
+    assert [type(event) for event in events] == [OrdersChanged, FeedReset]
+    assert events[1].reason == "drop on products"
+
+
+def test_failing_subscriber_does_not_stop_the_others():
+    feed, events = feed_with_events()
+
+    def broken(event):
+        raise RuntimeError("boom")
+
+    feed._subscribers[ReviewsChanged].insert(0, broken)
+    asyncio.run(feed._publish_batch([change(1, "insert", "reviews", "r1", {"productId": "p1"})]))
+    assert [event.product_ids for event in events] == [("p1",)]
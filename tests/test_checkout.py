@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from checkout import InsufficientStock, UnknownProducts, merge_lines, place_order
+
+
+def test_merge_lines_sums_quantities_per_product():
+    lines = [
+        {"productId": "a", "quantity": 2},
+        {"productId": "b", "quantity": "1"},
+        {"productId": "a", "quantity": 3},
+    ]
+    assert merge_lines(lines) == {"a": 5, "b": 1}
+
+
+@pytest.mark.parametrize("line", [
+    {"quantity": 1},
+    {"productId": "a", "quantity": 0},
+    {"productId": "a", "quantity": "x"},
+])
+def test_merge_lines_rejects_bad_lines(line):
+    with pytest.raises(ValueError):
+        merge_lines([line])
+
+
+class Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def with_transaction(self, run, write_concern=None):
+        return await run(self)
+
+
+class Client:
+    async def start_session(self):
+        return Session()
+
+
+class Products:
+    def __init__(self, docs):
+        self.docs = {doc["id"]: doc for doc in docs}
+
+    async def find(self, query, projection, session=None):
+        for product_id in query["id"]["$in"]:
+            if product_id in self.docs:
+                yield dict(self.docs[product_id])
+
+    async def bulk_write(self, operations, ordered=True, session=None):
+        modified = 0
+        for operation in operations:
+            doc = self.docs[operation._filter["id"]]
+            if doc["stock"] >= operation._filter["stock"]["$gte"]:
+                doc["stock"] += operation._doc["$inc"]["stock"]
+                modified += 1
+        return SimpleNamespace(modified_count=modified)
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def insert_one(self, doc, session=None):
+        self.calls.append(doc)
+
+    async def update_one(self, query, update, session=None):
+        self.calls.append((query, update))
+
+
+def make_db():
+    return SimpleNamespace(
+        products=Products([
+            {"id": "mug", "name": "Mug", "price": 4.1, "image": "mug.jpg", "stock": 5},
+            {"id": "lamp", "name": "Lamp", "price": 20.0, "image": "lamp.jpg", "stock": 1},
+        ]),
+        orders=Recorder(),
+        carts=Recorder(),
+        write_concern=None,
+    )
+
+
+def order():
+    return {"id": "o1", "userId": "u1", "status": "pending", "shippingAddress": {}}
+
+
+def test_order_is_priced_from_the_catalog_and_reserves_stock():
+    db = make_db()
+    placed = asyncio.run(place_order(Client(), db, order(), {"mug": 3, "lamp": 1}))
+    assert placed["total"] == 32.3
+    assert [(item["productId"], item["price"], item["quantity"]) for item in placed["items"]] == [
+        ("mug", 4.1, 3), ("lamp", 20.0, 1)
+    ]
+    assert (db.products.docs["mug"]["stock"], db.products.docs["lamp"]["stock"]) == (2, 0)
+    assert db.orders.calls == [placed]
+    assert db.carts.calls[0][0] == {"userId": "u1"} and db.carts.calls[0][1]["$set"]["items"] == []
+
+
+def test_short_and_unknown_lines_abort_the_order():
+    with pytest.raises(InsufficientStock) as short:
+        asyncio.run(place_order(Client(), make_db(), order(), {"mug": 1, "lamp": 2}))
+    assert short.value.product_ids == ["lamp"]
+    with pytest.raises(UnknownProducts) as unknown:
+        asyncio.run(place_order(Client(), make_db(), order(), {"mug": 1, "ghost": 1}))
+    assert unknown.value.product_ids == ["ghost"]
@@ -0,0 +1,41 @@
+import pytest
+from pymongo import WriteConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from database import DatabaseSettings, MIN_MAX_STALENESS
+
+BASE = {"MONGO_URL": "mongodb://db:27017", "DB_NAME": "shop"}
+
+
+def test_defaults_and_overrides_from_env():
+    defaults = DatabaseSettings.from_env(BASE)
+    assert (defaults.max_pool_size, defaults.catalog_read_preference) == (100, "secondaryPreferred")
+
+    settings = DatabaseSettings.from_env({**BASE, "MONGO_MAX_POOL_SIZE": "20", "MONGO_MIN_POOL_SIZE": "5",
+                                          "MONGO_CATALOG_READ_PREFERENCE": "primary"})
+    assert settings.client_options()["maxPoolSize"] == 20 and settings.client_options()["minPoolSize"] == 5
+    assert settings.catalog_options() == {"read_preference": Primary()}
+
+
+@pytest.mark.parametrize("overrides", [
+    {"MONGO_CATALOG_READ_PREFERENCE": "replica"},
+    {"MONGO_CATALOG_MAX_STALENESS_S": "30"},
+    {"MONGO_MIN_POOL_SIZE": "50", "MONGO_MAX_POOL_SIZE": "10"},
+])
+def test_invalid_settings_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        DatabaseSettings.from_env({**BASE, **overrides})
+
+
+def test_catalog_reads_are_bounded_by_staleness():
+    options = DatabaseSettings.from_env(BASE).catalog_options()
+    assert options["read_preference"] == SecondaryPreferred(max_staleness=MIN_MAX_STALENESS)
+    unbounded = DatabaseSettings.from_env({**BASE, "MONGO_CATALOG_MAX_STALENESS_S": "-1"}).catalog_options()
+    assert unbounded["read_preference"].max_staleness == -1
+
+
+def test_checkout_uses_the_primary_and_the_write_concern():
+    options = DatabaseSettings.from_env(BASE).checkout_options()
+    assert options == {"read_preference": Primary(), "write_concern": WriteConcern(w="majority", wtimeout=5000)}
+    numeric = DatabaseSettings.from_env({**BASE, "MONGO_WRITE_CONCERN": "2"}).checkout_options()
+    assert numeric["write_concern"] == WriteConcern(w=2, wtimeout=5000)
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+from bson import Timestamp
+from pymongo import ReturnDocument
+from starlette.requests import Request
+
+from etag import CatalogVersion, make_etag, not_modified
+
+
+def request(path="/api/products", query="", **headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_etag_depends_on_version_url_and_encoding():
+    etag = make_etag(1, request(query="sort=price&limit=20"))
+    assert etag == make_etag(1, request(query="limit=20&sort=price"))
+    assert etag != make_etag(2, request(query="sort=price&limit=20"))
+    assert etag != make_etag(1, request(query="sort=rating&limit=20"))
+    assert etag != make_etag(1, request(query="sort=price&limit=20", accept_encoding="gzip"))
+
+
+def test_not_modified_uses_weak_comparison():
+    etag = make_etag(1, request())
+    assert not_modified(request(), etag) is None
+    assert not_modified(request(if_none_match='"other"'), etag) is None
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = not_modified(request(if_none_match=header), etag)
+        assert response.status_code == 304 and response.headers["etag"] == etag
+
+
+class FakeMeta:
+    def __init__(self):
+        self.doc = None
+
+    async def find_one(self, query, projection=None):
+        return dict(self.doc) if self.doc else None
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        doc = self.doc or {"_id": "catalog", "version": 0, "changes": []}
+        doc["version"] += update["$inc"]["version"]
+        push = update["$push"]["changes"]
+        doc["changes"] = (doc["changes"] + push["$each"])[push["$slice"]:]
+        self.doc = doc
+        return dict(doc)
+
+    async def update_one(self, query, update, upsert=False):
+        self.doc = self.doc or {"_id": "catalog", "version": 0, "changes": []}
+        self.doc["changedAt"] = max(self.doc.get("changedAt") or update["$max"]["changedAt"],
+                                    update["$max"]["changedAt"])
+
+
+def test_workers_notice_each_others_writes_with_the_ids_written():
+    db = SimpleNamespace(meta=FakeMeta())
+    seen = []
+    ours = CatalogVersion(refresh_interval=0)
+    theirs = CatalogVersion(refresh_interval=0, on_change=seen.append)
+
+    async def run():
+        await theirs.get(db)
+        await ours.bump(db, ["p1"])
+        await ours.bump(db, ["p2", "p1"])
+        assert await theirs.get(db) == 2
+        await ours.bump(db)
+        await theirs.get(db)
+
+    asyncio.run(run())
+    assert seen == [["p1", "p2"], None]
+
+
+def test_key_is_the_same_on_every_worker():
+    db = SimpleNamespace(meta=FakeMeta())
+
+    async def run():
+        first, second = CatalogVersion(refresh_interval=0), CatalogVersion(refresh_interval=0)
+        await first.bump(db)
+        await first.record_change(db, Timestamp(100, 1))
+        return await first.key(db), await second.key(db)
+
+    first, second = asyncio.run(run())
+    assert first == second
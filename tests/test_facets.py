@@ -0,0 +1,48 @@
+from facets import PRICE_BOUNDARIES, RATING_BOUNDARIES, count_facets
+
+PRODUCTS = [
+    {"category": "Books", "price": 10.0, "rating": 4.5},
+    {"category": "Books", "price": 30.0, "rating": 3.0},
+    {"category": "Electronics", "price": 999.0, "rating": 5.0},
+    {"category": "Electronics", "price": 1500.0, "rating": None},
+    {"category": "Home", "price": None, "rating": 2.0},
+]
+
+
+def counts(buckets):
+    return {bucket["min"]: bucket["count"] for bucket in buckets}
+
+
+def test_unfiltered_counts():
+    facets = count_facets(PRODUCTS)
+    assert facets["total"] == 5
+    assert facets["categories"] == [
+        {"value": "Books", "count": 2},
+        {"value": "Electronics", "count": 2},
+        {"value": "Home", "count": 1},
+    ]
+    # A missing price counts as 0, anything from the last boundary up lands in it
+    assert counts(facets["price"]) == {0: 2, 25: 1, 50: 0, 100: 0, 250: 0, 500: 1, 1000: 1}
+    assert counts(facets["rating"]) == {0: 1, 1: 0, 2: 1, 3: 1, 4: 1, 5: 1}
+    assert [bucket["min"] for bucket in facets["price"]] == PRICE_BOUNDARIES
+    assert [bucket["min"] for bucket in facets["rating"]] == RATING_BOUNDARIES
+    assert facets["price"][-1]["max"] is None
+
+
+def test_each_facet_ignores_its_own_filter():
+    facets = count_facets(PRODUCTS, category="Books", min_price=20)
+    assert facets["total"] == 1
+    # Categories: price filter only
+    assert facets["categories"] == [{"value": "Books", "count": 1}, {"value": "Electronics", "count": 2}]
+    # Prices: category filter only
+    assert counts(facets["price"]) == {0: 1, 25: 1, 50: 0, 100: 0, 250: 0, 500: 0, 1000: 0}
+    # Ratings: both filters
+    assert counts(facets["rating"])[3] == 1
+    assert sum(counts(facets["rating"]).values()) == 1
+
+
+def test_empty_input():
+    facets = count_facets([])
+    assert facets["total"] == 0
+    assert facets["categories"] == []
+    assert sum(counts(facets["price"]).values()) == 0
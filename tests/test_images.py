@@ -0,0 +1,145 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+from images import (
+    FileOrigin,
+    HttpOrigin,
+    ImageVariants,
+    OriginError,
+    SourceNotAllowed,
+    VariantCache,
+    render_variant,
+)
+
+
+def png_bytes(width=800, height=600, color=(200, 30, 30)):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def origin_dir(tmp_path):
+    root = tmp_path / "origin"
+    root.mkdir()
+    (root / "red.png").write_bytes(png_bytes())
+    (root / "copy.png").write_bytes(png_bytes())
+    (root / "broken.png").write_bytes(png_bytes()[:200])
+    return root
+
+
+def make_variants(origin_dir, tmp_path, max_bytes=10 * 1024 * 1024):
+    cache = VariantCache(tmp_path / "cache", max_bytes=max_bytes)
+    cache.load()
+    return ImageVariants(FileOrigin(origin_dir), cache)
+
+
+def test_variant_is_resized_to_the_next_width_and_encoded(origin_dir, tmp_path):
+    variants = make_variants(origin_dir, tmp_path)
+    path = asyncio.run(variants.variant("https://img.test/red.png", 300, "webp"))
+    with Image.open(path) as image:
+        assert image.format == "WEBP"
+        assert image.size == (320, 240)
+
+
+def test_small_sources_are_not_upscaled(origin_dir, tmp_path):
+    variants = make_variants(origin_dir, tmp_path)
+    path = asyncio.run(variants.variant("https://img.test/red.png", 2000, "jpeg"))
+    with Image.open(path) as image:
+        assert image.format == "JPEG"
+        assert image.size == (800, 600)
+
+
+def test_concurrent_requests_share_one_fetch_and_later_ones_hit(origin_dir, tmp_path):
+    async def run():
+        variants = make_variants(origin_dir, tmp_path)
+        paths = await asyncio.gather(*(variants.variant("https://img.test/red.png", 320, "webp") for _ in range(20)))
+        again = await variants.variant("https://img.test/red.png", 320, "webp")
+        return variants, paths, again
+
+    variants, paths, again = asyncio.run(run())
+    assert len(set(paths)) == 1 and again == paths[0]
+    stats = variants.stats()
+    assert stats["originFetches"] == 1
+    assert stats["hits"] == 1
+
+
+def test_same_bytes_under_another_url_share_the_variant(origin_dir, tmp_path):
+    async def run():
+        variants = make_variants(origin_dir, tmp_path)
+        first = await variants.variant("https://img.test/red.png", 160, "webp")
+        second = await variants.variant("https://img.test/copy.png", 160, "webp")
+        return variants, first, second
+
+    variants, first, second = asyncio.run(run())
+    assert first == second
+    assert len(list((tmp_path / "cache" / "variants").glob("*/*"))) == 1
+
+
+def test_missing_and_broken_sources_raise_origin_error(origin_dir, tmp_path):
+    variants = make_variants(origin_dir, tmp_path)
+    with pytest.raises(OriginError):
+        asyncio.run(variants.variant("https://img.test/nope.png", 320, "webp"))
+    with pytest.raises(OriginError):
+        asyncio.run(variants.variant("https://img.test/broken.png", 320, "webp"))
+    assert variants.stats()["failures"] == 2
+
+
+def test_render_rejects_bytes_that_are_not_an_image():
+    with pytest.raises(OriginError):
+        render_variant(b"not an image", 320, "jpeg")
+
+
+def test_cache_stays_within_budget_including_refs(origin_dir, tmp_path):
+    # Room for a handful of blocks: every new query string adds a ref file
+    variants = make_variants(origin_dir, tmp_path, max_bytes=8 * 4096)
+
+    async def run():
+        for n in range(50):
+            await variants.variant(f"https://img.test/red.png?v={n}", 160, "webp")
+
+    asyncio.run(run())
+    cache = variants.cache
+    assert cache.bytes <= cache.max_bytes
+    assert len(list((tmp_path / "cache" / "refs").glob("*"))) < 50
+    assert cache.evictions > 0
+
+
+def test_load_indexes_files_left_by_a_previous_run(origin_dir, tmp_path):
+    asyncio.run(make_variants(origin_dir, tmp_path).variant("https://img.test/red.png", 320, "webp"))
+    cache = VariantCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024)
+    cache.load()
+    # One ref and one variant
+    assert len(cache) == 2
+
+
+def test_http_origin_checks_every_redirect_against_the_allowlist():
+    def handler(request):
+        if request.url.host == "img.test" and request.url.path == "/moved":
+            return httpx.Response(302, headers={"Location": "/red.png"})
+        if request.url.host == "img.test" and request.url.path == "/away":
+            return httpx.Response(302, headers={"Location": "http://internal.test/secret"})
+        if request.url.host == "img.test" and request.url.path == "/loop":
+            return httpx.Response(302, headers={"Location": "/loop"})
+        if request.url.host == "img.test":
+            return httpx.Response(200, content=b"image")
+        return httpx.Response(200, content=b"secret")
+
+    async def run():
+        origin = HttpOrigin(["img.test"], max_redirects=3, transport=httpx.MockTransport(handler))
+        try:
+            assert await origin.fetch("https://img.test/moved") == b"image"
+            with pytest.raises(SourceNotAllowed):
+                await origin.fetch("https://img.test/away")
+            with pytest.raises(SourceNotAllowed):
+                await origin.fetch("https://other.test/red.png")
+            with pytest.raises(OriginError):
+                await origin.fetch("https://img.test/loop")
+        finally:
+            await origin.close()
+
+    asyncio.run(run())
@@ -0,0 +1,169 @@
+import asyncio
+import io
+import json
+import os
+from types import SimpleNamespace
+
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+
+from importer import (
+    Checkpoint,
+    default_import_id,
+    import_products,
+    iter_lines,
+    parse_csv,
+    parse_ndjson,
+)
+
+
+class Item(BaseModel):
+    id: str
+    name: str
+    price: float
+    stock: int = 0
+
+
+class FakeImports:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+    async def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+
+class FakeProducts:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_many(self, documents, ordered=True):
+        errors = []
+        for index, document in enumerate(documents):
+            if document["id"] in self.docs:
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.docs[document["id"]] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+        return SimpleNamespace(inserted_ids=[document["id"] for document in documents])
+
+    async def bulk_write(self, operations, ordered=True):
+        upserted = modified = 0
+        for operation in operations:
+            product_id = operation._filter["id"]
+            update = operation._doc
+            if product_id in self.docs:
+                self.docs[product_id].update(update["$set"])
+                modified += 1
+            else:
+                self.docs[product_id] = {"id": product_id, **update.get("$setOnInsert", {}), **update["$set"]}
+                upserted += 1
+        return SimpleNamespace(upserted_count=upserted, modified_count=modified)
+
+
+def fake_db():
+    return SimpleNamespace(imports=FakeImports(), products=FakeProducts())
+
+
+async def chunks(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def ndjson(*records):
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def run_import(db, data, **kwargs):
+    rows = parse_ndjson(iter_lines(chunks(data)))
+    return asyncio.run(import_products(db, rows, Item, batch_size=2, writers=2, **kwargs))
+
+
+def test_iter_lines_reassembles_lines_split_across_chunks():
+    data = "﻿café,1\nthé,2\nlast".encode("utf-8")
+    lines = asyncio.run(collect(iter_lines(chunks(data, size=3))))
+    assert lines == ["café,1\n", "thé,2\n", "last"]
+
+
+def test_parse_csv_handles_quoted_newlines_and_bad_rows():
+    text = 'id,name,price\np1,"Mug\nlarge",5\np2,Cup\np3,,7\n'
+    rows = asyncio.run(collect(parse_csv(iter_lines(chunks(text.encode())))))
+    assert rows[0][:3] == (1, {"id": "p1", "name": "Mug\nlarge", "price": "5"}, None)
+    assert rows[1][1] is None and "Expected 3 columns" in rows[1][2]
+    # Empty cells are left out so model defaults apply
+    assert rows[2][1] == {"id": "p3", "price": "7"}
+
+
+def test_interrupted_import_resumes_after_the_checkpoint():
+    db = fake_db()
+    db.imports.docs["run"] = {"_id": "run", "committedRows": 2, "done": False}
+    data = ndjson(*({"id": f"p{n}", "name": f"P{n}", "price": n} for n in range(1, 5)))
+
+    stats = run_import(db, data, import_id="run")
+
+    assert (stats.skipped, stats.rows, stats.inserted) == (2, 2, 2)
+    assert sorted(db.products.docs) == ["p3", "p4"]
+    assert db.imports.docs["run"]["committedRows"] == 4 and db.imports.docs["run"]["done"]
+
+
+def test_finished_import_runs_again_in_full():
+    db = fake_db()
+    run_import(db, ndjson({"id": "p1", "name": "Mug", "price": 5}, {"id": "p2", "name": "Cup", "price": 3}),
+               import_id="run")
+
+    stats = run_import(db, ndjson({"id": "p1", "name": "Mug", "price": 6}, {"id": "p2", "name": "Cup", "price": 4}),
+                       import_id="run")
+
+    assert (stats.skipped, stats.rows, stats.updated) == (0, 2, 2)
+    assert [db.products.docs[pid]["price"] for pid in ("p1", "p2")] == [6, 4]
+
+
+def test_checkpoint_of_a_finished_import_is_reset():
+    db = fake_db()
+    db.imports.docs["run"] = {"_id": "run", "committedRows": 10, "done": True}
+    assert asyncio.run(Checkpoint(db, "run").load()) == 0
+    assert "run" not in db.imports.docs
+
+
+def test_default_import_id_changes_with_the_file(tmp_path):
+    path = tmp_path / "catalog.ndjson"
+    path.write_bytes(ndjson({"id": "p1", "name": "Mug", "price": 5}))
+    first = default_import_id(path)
+    assert default_import_id(path) == first
+    path.write_bytes(ndjson({"id": "p1", "name": "Mug", "price": 15}))
+    os.utime(path, ns=(0, 0))
+    assert default_import_id(path) != first
+
+
+def test_upsert_rejects_rows_without_an_id():
+    db = fake_db()
+    rejects = io.StringIO()
+    stats = run_import(db, ndjson({"name": "Mug", "price": 5}, {"id": "p2", "name": "Cup", "price": 3}),
+                       rejects=rejects)
+    assert (stats.rejected, stats.inserted) == (1, 1)
+    assert json.loads(rejects.getvalue())["error"] == "id: required in upsert mode"
+
+
+def test_on_batch_gets_only_the_rows_that_were_written():
+    db = fake_db()
+    db.products.docs["p1"] = {"id": "p1", "name": "Existing", "price": 1}
+    batches = []
+    stats = run_import(
+        db,
+        ndjson(*({"id": f"p{n}", "name": f"P{n}", "price": n} for n in range(1, 4))),
+        mode="insert",
+        on_batch=batches.append,
+    )
+    assert stats.duplicates == 1
+    assert sorted(p["id"] for batch in batches for p in batch) == ["p2", "p3"]
+    assert db.products.docs["p1"]["name"] == "Existing"
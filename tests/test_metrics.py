@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from metrics import CommandMetrics, Metrics, MetricsMiddleware, NO_ROUTE, UNMATCHED_ROUTE
+
+
+def command_event(name, command, reply=None, request_id=1, micros=2000):
+    return SimpleNamespace(
+        command_name=name, command=command, reply=reply or {}, duration_micros=micros,
+        connection_id=("db", 27017), request_id=request_id,
+    )
+
+
+def run_command(listener, name, command, reply, request_id=1):
+    listener.started(command_event(name, command, request_id=request_id))
+    listener.succeeded(command_event(name, command, reply, request_id=request_id))
+
+
+def make_app(metrics):
+    app = FastAPI()
+    listener = CommandMetrics(metrics)
+
+    @app.get("/api/products/{product_id}")
+    async def get_product(product_id: str):
+        run_command(listener, "find", {"find": "products"}, {"cursor": {"firstBatch": [{"id": product_id}]}})
+        return {"id": product_id}
+
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    return app
+
+
+def test_requests_are_labelled_by_route_template():
+    metrics = Metrics()
+    client = TestClient(make_app(metrics))
+    client.get("/api/products/p1")
+    client.get("/api/products/p2")
+    client.get("/nowhere")
+
+    assert metrics.requests[("GET", "/api/products/{product_id}")].count == 2
+    assert metrics.responses[("GET", "/api/products/{product_id}", "200")] == 2
+    assert metrics.responses[("GET", UNMATCHED_ROUTE, "404")] == 1
+    assert metrics.in_flight["/api/products/{product_id}"] == 0
+    # The command ran inside the request, so it counts towards its DB time
+    assert metrics.request_db[("GET", "/api/products/{product_id}")].sum == 0.004
+    assert metrics.command_docs[("/api/products/{product_id}", "find", "products")] == 2
+
+
+def test_commands_outside_requests_and_failures():
+    metrics = Metrics()
+    listener = CommandMetrics(metrics)
+    run_command(listener, "getMore", {"getMore": 1, "collection": "reviews"},
+                {"cursor": {"nextBatch": [{}, {}, {}]}})
+    run_command(listener, "update", {"update": "carts"}, {"n": 1}, request_id=2)
+    listener.started(command_event("insert", {"insert": "orders"}, request_id=3))
+    listener.failed(command_event("insert", {"insert": "orders"}, request_id=3))
+
+    assert metrics.command_docs[(NO_ROUTE, "getMore", "reviews")] == 3
+    assert metrics.command_docs[(NO_ROUTE, "update", "carts")] == 1
+    assert metrics.command_failures == {(NO_ROUTE, "insert", "orders"): 1}
+    assert listener._collections == {}
+
+
+def test_render_uses_cumulative_buckets_and_registered_stats():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.observe_request("GET", "/api/products", 200, 0.05, 0.01)
+    metrics.observe_request("GET", "/api/products", 200, 0.5, 0.01)
+    metrics.register_stats("cache", SimpleNamespace(stats=lambda: {"hitRatio": 0.75, "name": "products"}),
+                           cache="products")
+    text = metrics.render()
+
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/products",le="0.1"} 1' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/products",le="1.0"} 2' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/products",le="+Inf"} 2' in text
+    assert 'http_responses_total{method="GET",route="/api/products",status="200"} 2' in text
+    assert 'cache_hit_ratio{cache="products"} 0.75' in text
+    assert "cache_name" not in text
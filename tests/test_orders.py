@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from repositories import MongoOrderRepository
+from tests.fakes import Collection
+
+SUMMARY = {"_id": 0, "id": 1, "status": 1, "total": 1, "createdAt": 1}
+
+
+def make_repo(orders):
+    return MongoOrderRepository(None, SimpleNamespace(orders=Collection(orders)), SUMMARY)
+
+
+def orders():
+    # Three orders share a timestamp to exercise the id tie-break
+    return [
+        {"id": f"o{n}", "userId": "u1" if n % 4 else "u2", "status": "pending", "total": n,
+         "items": [{"productId": "p"}], "createdAt": datetime(2024, 1, 1 + min(n, 5))}
+        for n in range(12)
+    ]
+
+
+def test_summaries_page_newest_first_through_one_users_orders():
+    repo = make_repo(orders())
+
+    async def run():
+        ids, cursor = [], None
+        while True:
+            docs, cursor = await repo.list_summaries("u1", cursor, 2)
+            assert len(docs) <= 2
+            ids.extend(doc["id"] for doc in docs)
+            if cursor is None:
+                return ids, docs
+
+    ids, last_page = asyncio.run(run())
+    expected = sorted(
+        (order for order in orders() if order["userId"] == "u1"),
+        key=lambda order: (order["createdAt"], order["id"]),
+        reverse=True,
+    )
+    assert ids == [order["id"] for order in expected]
+    # Summaries carry only the projected fields
+    assert set(last_page[0]) == {"id", "status", "total", "createdAt"}
+
+
+def test_an_order_is_only_found_for_its_user():
+    repo = make_repo(orders())
+    assert asyncio.run(repo.get("u1", "o1"))["id"] == "o1"
+    assert asyncio.run(repo.get("u2", "o1")) is None
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    merge_filters,
+    page_in_memory,
+    sort_key,
+)
+from tests.fakes import matches
+
+
+def test_cursor_round_trips_datetimes_and_ids():
+    created = datetime(2024, 5, 6, 7, 8, 9, 123000)
+    cursor = encode_cursor("createdAt", {"id": "p1", "createdAt": created})
+    assert decode_cursor(cursor, "createdAt") == (created, "p1")
+
+
+def test_cursor_round_trips_missing_values():
+    cursor = encode_cursor("rating", {"id": "p1"})
+    assert decode_cursor(cursor, "rating") == (None, "p1")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor("price", {"id": "?&/+" * 10, "price": 1.5})
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "e30", encode_cursor("price", {"id": "p"})[:-3]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "price")
+
+
+def test_cursor_for_another_sort_is_rejected():
+    cursor = encode_cursor("price", {"id": "p1", "price": 3})
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, "rating")
+
+
+def test_keyset_filter_selects_strictly_after_the_cursor():
+    cursor = encode_cursor("price", {"id": "p1", "price": 3})
+    assert keyset_filter("price", cursor) == {
+        "$or": [{"price": {"$lt": 3}}, {"price": 3, "id": {"$lt": "p1"}}, {"price": None}]
+    }
+    assert keyset_filter("price", cursor, descending=False)["$or"][0] == {"price": {"$gt": 3}}
+    assert keyset_filter("price", None) == {}
+
+
+def test_merge_filters():
+    assert merge_filters({"a": 1}, {}) == {"a": 1}
+    assert merge_filters({}, {"b": 2}) == {"b": 2}
+    assert merge_filters({"a": 1}, {"b": 2}) == {"$and": [{"a": 1}, {"b": 2}]}
+
+
+def test_page_in_memory_walks_descending_with_missing_values_last():
+    docs = [{"id": f"p{n}", "price": price} for n, price in enumerate([3, None, 5, 3, None, 1, 5])]
+    expected = [doc["id"] for doc in sorted(docs, key=lambda doc: sort_key(doc, "price"), reverse=True)]
+    seen, cursor = [], None
+    while True:
+        page, cursor = page_in_memory(docs, "price", cursor, 2)
+        seen.extend(doc["id"] for doc in page)
+        if cursor is None:
+            break
+    assert seen == expected
+    assert seen[-2:] == ["p4", "p1"]
+
+
+def test_page_in_memory_rejects_a_cursor_for_another_sort():
+    cursor = encode_cursor("price", {"id": "p1", "price": 3})
+    with pytest.raises(InvalidCursor):
+        page_in_memory([], "rating", cursor, 10)
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_keyset_filter_pages_through_missing_values(descending):
+    docs = [{"id": f"p{n}", "price": price} for n, price in enumerate([3, None, 5, 3, None, 1, 5, None])]
+    del docs[4]["price"]
+    ordered = sorted(docs, key=lambda doc: sort_key(doc, "price"), reverse=descending)
+    for position, doc in enumerate(ordered):
+        query = keyset_filter("price", encode_cursor("price", doc), descending)
+        after = [d["id"] for d in ordered if matches(d, query)]
+        assert sorted(after) == sorted(d["id"] for d in ordered[position + 1:])
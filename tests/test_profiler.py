@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from profiler import SlowQueryProfiler, command_shape, normalize_shape, summarize_explain
+
+
+def event(name, command=None, micros=0, request_id=1):
+    return SimpleNamespace(
+        command_name=name, command=command, database_name="shop", duration_micros=micros,
+        connection_id=("db", 27017), request_id=request_id,
+    )
+
+
+def test_normalize_shape_keeps_structure_and_drops_values():
+    query = {"category": "Mugs", "price": {"$gte": 5, "$lte": 20}, "id": {"$in": ["p1", "p2"]},
+             "$or": [{"stock": 0}, {"hidden": True}]}
+    assert normalize_shape(query) == {"category": "?", "price": {"$gte": "?", "$lte": "?"}, "id": {"$in": "?"},
+                                      "$or": [{"stock": "?"}, {"hidden": "?"}]}
+    # $in lists of any length group together
+    assert normalize_shape({"id": {"$in": ["p1"]}}) == normalize_shape({"id": {"$in": []}})
+
+
+def test_command_shape_per_command():
+    assert command_shape("find", {"find": "products", "filter": {"category": "Mugs"}, "sort": {"price": 1}}) == {
+        "filter": {"category": "?"}, "sort": {"price": 1},
+    }
+    assert command_shape("aggregate", {"pipeline": [{"$match": {"productId": "p1"}}, {"$limit": 10}]}) == {
+        "pipeline": [{"$match": {"productId": "?"}}, {"$limit": "?"}],
+    }
+    assert command_shape("update", {"updates": [{"q": {"userId": "u1"}}, {"q": {"userId": "u2"}}]}) == {
+        "q": [{"userId": "?"}],
+    }
+
+
+def test_summarize_explain_flags_collection_scans():
+    explain = {"queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "COLLSCAN"}}},
+               "executionStats": {"totalDocsExamined": 1000, "nReturned": 10, "executionTimeMillis": 12}}
+    summary = summarize_explain(explain)
+    assert summary["collectionScan"] and summary["examinedPerReturned"] == 100.0
+
+
+def test_slow_commands_are_grouped_by_shape():
+    profiler = SlowQueryProfiler(threshold_ms=50)
+    for request_id, (category, micros) in enumerate([("Mugs", 80000), ("Cups", 120000), ("Pans", 1000)]):
+        command = {"find": "products", "filter": {"category": category}}
+        profiler.started(event("find", command, request_id=request_id))
+        profiler.succeeded(event("find", micros=micros, request_id=request_id))
+    profiler.started(event("insert", {"insert": "orders"}))
+
+    [entry] = profiler.report()
+    assert (entry["collection"], entry["count"], entry["totalMs"], entry["maxMs"]) == ("products", 2, 200.0, 120.0)
+    assert entry["shape"] == {"filter": {"category": "?"}}
+    # Non-explainable and finished commands are not kept around
+    assert profiler._commands == {}
@@ -0,0 +1,117 @@
+import asyncio
+
+import orjson
+from starlette.websockets import WebSocketDisconnect
+
+from changes import OrdersChanged, ProductsChanged
+from push import TRY_AGAIN_LATER, PushHub
+
+
+class FakeSocket:
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.closed = None
+        # Cleared to make the client stop reading
+        self.reading = asyncio.Event()
+        self.reading.set()
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, text):
+        await self.reading.wait()
+        self.sent.append(orjson.loads(text))
+
+    async def close(self, code):
+        self.closed = code
+        self.incoming.put_nowait(None)
+
+
+PRODUCTS = {"p1": {"id": "p1", "price": 10, "stock": 50}, "p2": {"id": "p2", "price": 3, "stock": 2}}
+
+
+async def snapshot(ids):
+    return {pid: PRODUCTS[pid] for pid in ids if pid in PRODUCTS}
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def connect(hub, user_id):
+    socket = FakeSocket()
+    task = asyncio.ensure_future(hub.serve(socket, user_id))
+    await settle()
+    return socket, task
+
+
+def test_watched_products_get_a_snapshot_then_relevant_changes():
+    async def run():
+        hub = PushHub(snapshot, low_stock=5)
+        socket, task = await connect(hub, "u1")
+        socket.incoming.put_nowait({"type": "watch", "productIds": ["p1", "p2", "p1", 7]})
+        await settle()
+        hub.on_products_changed(ProductsChanged((
+            {"id": "p1", "price": 10, "stock": 40},  # plentiful stock move: not pushed
+            {"id": "p2", "price": 3, "stock": 1},
+            {"id": "p3", "price": 1, "stock": 0},  # not watched
+        )))
+        await settle()
+        hub.on_products_changed(ProductsChanged(({"id": "p1", "price": 9, "stock": 40},)))
+        await settle()
+        socket.incoming.put_nowait(None)
+        await task
+        return socket.sent, hub.stats()
+
+    sent, stats = asyncio.run(run())
+    assert [(m["product"]["id"], m["product"]["price"], m["product"]["stock"], m["lowStock"]) for m in sent] == [
+        ("p1", 10, 50, False), ("p2", 3, 2, True), ("p2", 3, 1, True), ("p1", 9, 40, False),
+    ]
+    assert stats["connections"] == 0 and stats["topics"] == 0
+
+
+def test_order_updates_reach_only_their_user_and_coalesce():
+    async def run():
+        hub = PushHub(snapshot)
+        alice, alice_task = await connect(hub, "alice")
+        bob, bob_task = await connect(hub, "bob")
+        alice.reading.clear()
+        for status in ("pending", "paid", "shipped"):
+            hub.on_orders_changed(OrdersChanged(({"id": "o1", "userId": "alice", "status": status, "items": [1]},)))
+            await settle()
+        alice.reading.set()
+        await settle()
+        for socket in (alice, bob):
+            socket.incoming.put_nowait(None)
+        await asyncio.gather(alice_task, bob_task)
+        return alice.sent, bob.sent, hub.coalesced
+
+    alice, bob, coalesced = asyncio.run(run())
+    # The first message was already being sent; the two queued behind it collapse to the latest
+    assert [m["order"]["status"] for m in alice] == ["pending", "shipped"]
+    assert alice[0]["order"]["itemCount"] == 1
+    assert bob == [] and coalesced == 1
+
+
+def test_client_that_falls_behind_is_closed():
+    async def run():
+        hub = PushHub(snapshot, max_pending=2)
+        socket, task = await connect(hub, "u1")
+        socket.reading.clear()
+        for n in range(4):
+            hub.on_orders_changed(OrdersChanged(({"id": f"o{n}", "userId": "u1", "status": "paid"},)))
+        await settle()
+        await task
+        return socket.closed, hub.stats()
+
+    closed, stats = asyncio.run(run())
+    assert closed == TRY_AGAIN_LATER
+    assert stats["slowCloses"] == 1 and stats["connections"] == 0
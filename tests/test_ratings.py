@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+from ratings import EMPTY_AGGREGATE, STARS, add_review_update, recompute_rating_aggregates
+
+
+class FakeReviews:
+    def __init__(self, reviews):
+        self.reviews = reviews
+
+    async def aggregate(self, pipeline, allowDiskUse=False):
+        wanted = pipeline[0]["$match"].get("productId", {}).get("$in")
+        groups = {}
+        for review in self.reviews:
+            if wanted is not None and review["productId"] not in wanted:
+                continue
+            row = groups.setdefault(review["productId"], {
+                "_id": review["productId"], "ratingSum": 0, "reviewCount": 0, **{star: 0 for star in STARS}
+            })
+            row["ratingSum"] += review["rating"]
+            row["reviewCount"] += 1
+            row[str(review["rating"])] += 1
+        for row in groups.values():
+            yield row
+
+
+class FakeProducts:
+    def __init__(self, products):
+        self.products = products
+        self.writes = []
+
+    async def find(self, query, projection):
+        wanted = query.get("id", {}).get("$in")
+        for product in self.products:
+            if wanted is None or product["id"] in wanted:
+                yield {k: v for k, v in product.items() if projection.get(k)}
+
+    async def bulk_write(self, operations, ordered=True):
+        self.writes.extend(operations)
+        return SimpleNamespace(modified_count=len(operations))
+
+
+def recompute(products, reviews, product_ids=None):
+    db = SimpleNamespace(products=FakeProducts(products), reviews=FakeReviews(reviews))
+    updated = asyncio.run(recompute_rating_aggregates(db, product_ids, batch_size=2))
+    return updated, {op._filter["id"]: op for op in db.products.writes}
+
+
+PRODUCTS = [
+    # Reviewed
+    {"id": "a", "ratingSum": 4, "reviewCount": 1, "rating": 4.0, "ratingHistogram": {"4": 1}},
+    # All reviews deleted
+    {"id": "b", "ratingSum": 9, "reviewCount": 2, "rating": 4.5, "ratingHistogram": {"4": 1, "5": 1}},
+    # Drifted with no reviews
+    {"id": "c", "ratingSum": 3, "reviewCount": 0, "rating": 0, "ratingHistogram": {}},
+    # From before aggregates existed
+    {"id": "d", "rating": 4.2, "reviewCount": 12},
+    # Already empty, with a seeded rating
+    {"id": "e", **EMPTY_AGGREGATE, "rating": 4.5},
+    # Seeded rating, never aggregated
+    {"id": "f", "rating": 4.4, "reviewCount": 0},
+]
+REVIEWS = [{"productId": "a", "rating": 5}, {"productId": "a", "rating": 3}]
+
+
+def test_full_recompute_resets_every_product_without_reviews():
+    updated, writes = recompute(PRODUCTS, REVIEWS)
+    assert updated == 5
+    assert sorted(writes) == ["a", "b", "c", "d", "f"]
+    aggregate = writes["a"]._doc[0]["$set"]
+    assert (aggregate["ratingSum"], aggregate["reviewCount"]) == (8, 2)
+    assert aggregate["ratingHistogram"] == {"$literal": {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}}
+    for product_id in "bd":
+        assert writes[product_id]._doc == {"$set": {**EMPTY_AGGREGATE, "rating": 0}, "$inc": {"reviewVersion": 1}}
+    # No reviews were ever counted, so the seeded rating stays
+    for product_id in "cf":
+        assert writes[product_id]._doc == {"$set": EMPTY_AGGREGATE, "$inc": {"reviewVersion": 1}}
+
+
+def test_reset_only_applies_to_the_aggregate_that_was_read():
+    _, writes = recompute(PRODUCTS, REVIEWS)
+    assert writes["b"]._filter == {"id": "b", "reviewCount": 2, "ratingSum": 9}
+    assert writes["d"]._filter == {"id": "d", "reviewCount": 12, "ratingSum": None}
+
+
+def test_recompute_of_given_products_stays_in_scope():
+    updated, writes = recompute(PRODUCTS, REVIEWS, ["a", "b"])
+    assert updated == 2 and sorted(writes) == ["a", "b"]
+
+
+def test_review_update_seeds_a_missing_sum_from_the_current_average():
+    stages = add_review_update(4)
+    added = stages[0]["$set"]
+    assert added["ratingSum"] == {"$add": [
+        {"$ifNull": ["$ratingSum", {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$reviewCount", 0]}]}]},
+        4,
+    ]}
+    assert added["ratingHistogram.4"] == {"$add": [{"$ifNull": ["$ratingHistogram.4", 0]}, 1]}
+    # Every review changes the version its list is tagged with
+    assert added["reviewVersion"] == {"$add": [{"$ifNull": ["$reviewVersion", 0]}, 1]}
@@ -0,0 +1,13 @@
+import pytest
+
+from repositories import CartRepository, OrderRepository, ProductRepository, ReviewRepository
+
+
+@pytest.mark.parametrize("interface", [ProductRepository, ReviewRepository, CartRepository, OrderRepository])
+def test_incomplete_repository_fails_at_construction(interface):
+    class Incomplete(interface):
+        async def get(self, *args):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
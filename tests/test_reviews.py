@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+
+from ratings import add_review_update
+from repositories import MongoReviewRepository
+from tests.fakes import Collection
+
+PROJECTION = {"_id": 0, "id": 1, "productId": 1, "rating": 1, "createdAt": 1}
+
+
+class Writes:
+    def __init__(self):
+        self.calls = []
+
+    async def insert_one(self, doc):
+        self.calls.append(("insert_one", doc))
+
+    async def update_one(self, query, update):
+        self.calls.append(("update_one", query, update))
+
+
+def reviews():
+    return [
+        {"id": f"r{n:02d}", "productId": "p1" if n % 3 else "p2", "rating": 1 + n % 5,
+         "createdAt": datetime(2024, 1, 1 + n)}
+        for n in range(20)
+    ]
+
+
+def page_through(repo, sort_field, limit):
+    async def run():
+        ids, cursor = [], None
+        while True:
+            docs, cursor = await repo.list("p1", sort_field, cursor, limit)
+            ids.extend(doc["id"] for doc in docs)
+            if cursor is None:
+                return ids
+    return asyncio.run(run())
+
+
+def test_reviews_page_by_date_or_rating():
+    repo = MongoReviewRepository(Collection(reviews()), Writes(), Collection(), PROJECTION)
+    own = [review for review in reviews() if review["productId"] == "p1"]
+    for sort_field in ("createdAt", "rating"):
+        expected = sorted(own, key=lambda review: (review[sort_field], review["id"]), reverse=True)
+        for limit in (1, 4, 50):
+            assert page_through(repo, sort_field, limit) == [review["id"] for review in expected]
+
+
+def test_adding_a_review_folds_it_into_the_product():
+    writes, products = Writes(), Writes()
+    repo = MongoReviewRepository(Collection(), writes, products, PROJECTION)
+    asyncio.run(repo.add({"id": "r1", "productId": "p1", "rating": 4}))
+    assert writes.calls == [("insert_one", {"id": "r1", "productId": "p1", "rating": 4})]
+    assert products.calls == [("update_one", {"id": "p1"}, add_review_update(4))]
+
+
+def test_review_version_is_read_from_the_product():
+    products = Collection([{"id": "p1", "reviewVersion": 7}, {"id": "p2"}])
+    repo = MongoReviewRepository(Collection(), Writes(), products, PROJECTION)
+    assert [asyncio.run(repo.version(pid)) for pid in ("p1", "p2", "p3")] == [7, 0, 0]
@@ -0,0 +1,82 @@
+from search import SearchIndex, stem, tokenize
+
+PRODUCTS = [
+    {"id": "laptop", "name": "Premium Laptop", "description": "Fast processor and a stunning display",
+     "category": "Electronics", "price": 1299.99},
+    {"id": "headphones", "name": "Wireless Headphones", "description": "Noise cancelling, long battery life",
+     "category": "Electronics", "price": 199.99},
+    {"id": "bag", "name": "Laptop Bag", "description": "Padded bag for laptops up to 15 inches",
+     "category": "Accessories", "price": 49.99},
+    {"id": "mug", "name": "Coffee Mug", "description": "Ceramic mug", "category": "Home", "price": 12.0},
+]
+
+
+def make_index():
+    index = SearchIndex()
+    index.add_many(PRODUCTS)
+    return index
+
+
+def ids(matches):
+    return [doc_id for doc_id, _ in matches]
+
+
+def test_tokenize_normalizes_stems_and_drops_stopwords():
+    assert tokenize("The Cafés of Laptops") == ["cafe", "laptop"]
+    assert stem("batteries") == "battery"
+    assert tokenize(None) == []
+
+
+def test_plural_query_matches_singular_name():
+    assert set(ids(make_index().search("laptops"))) == {"laptop", "bag"}
+
+
+def test_name_matches_rank_above_description_matches():
+    index = SearchIndex()
+    index.add({"id": "rack", "name": "Mug Rack", "description": "Holds a ceramic mug", "price": 20.0})
+    index.add({"id": "cup", "name": "Ceramic Cup", "description": "Holds tea", "price": 8.0})
+    assert ids(index.search("ceramic")) == ["cup", "rack"]
+
+
+def test_description_only_match():
+    assert ids(make_index().search("noise")) == ["headphones"]
+
+
+def test_last_token_is_a_prefix():
+    assert ids(make_index().search("headph")) == ["headphones"]
+    assert ids(make_index().search("coffee m")) == ["mug"]
+
+
+def test_filters_apply_before_ranking():
+    index = make_index()
+    assert ids(index.search("laptop", category="Accessories")) == ["bag"]
+    assert ids(index.search("laptop", max_price=100)) == ["bag"]
+    assert ids(index.search("laptop", min_price=100)) == ["laptop"]
+
+
+def test_reindex_and_remove():
+    index = make_index()
+    index.add({**PRODUCTS[3], "name": "Travel Flask", "description": "Steel flask"})
+    assert ids(index.search("mug")) == []
+    assert ids(index.search("flask")) == ["mug"]
+    index.remove("mug")
+    assert ids(index.search("flask")) == []
+    assert len(index) == 3
+
+
+def test_no_match_and_stopword_only_queries():
+    index = make_index()
+    assert index.search("zebra") == []
+    assert index.search("the and of") == []
+
+
+def test_documents_carry_the_fields_to_sort_and_facet_matches():
+    index = make_index()
+    index.add({**PRODUCTS[1], "rating": 4.5})
+    docs = index.documents(ids(index.search("laptop")) + ["missing"])
+    assert {doc["id"]: doc["category"] for doc in docs} == {"laptop": "Electronics", "bag": "Accessories"}
+    assert index.documents(["headphones"]) == [
+        {"id": "headphones", "category": "Electronics", "price": 199.99, "rating": 4.5, "createdAt": None}
+    ]
+    index.remove("headphones")
+    assert index.documents(["headphones"]) == []
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+
+from models import Product
+from serialization import list_body, model_projection, trusted_dicts
+
+NOW = datetime(2024, 5, 6, 7, 8, 9, 123456)
+
+
+def full_product(**fields):
+    return {**Product(name="Mug", description="Ceramic", price=4.5, category="Home", image="mug.jpg",
+                      createdAt=NOW).dict(), **fields}
+
+
+def test_projection_selects_exactly_the_model_fields():
+    projection = model_projection(Product)
+    assert projection.pop("_id") == 0
+    assert set(projection) == set(Product.model_fields) and set(projection.values()) == {1}
+
+
+def test_complete_documents_pass_through_untouched():
+    doc = full_product()
+    assert trusted_dicts([doc], Product)[0] is doc
+
+
+def test_partial_documents_get_model_defaults():
+    doc = full_product()
+    del doc["stock"], doc["reviewCount"]
+    assert trusted_dicts([doc], Product)[0] == {**doc, "stock": 100, "reviewCount": 0}
+
+
+def test_list_body_matches_the_model_encoding():
+    docs = [full_product(id="p1"), full_product(id="p2", price=10)]
+    expected = [json.loads(Product(**doc).model_dump_json()) for doc in docs]
+    assert json.loads(list_body(docs, Product)) == expected